@@ -0,0 +1,78 @@
+"""
+Benchmark of cache size and hit latency with and without body dedup.
+
+Caches `--entries` responses whose bodies are drawn from `--distinct`
+different listings of `--items` items, as when many parameter sets of an
+endpoint return the same page, then reads every entry back from disk.
+Reports the bytes the backend holds, the dedup ratio and the mean disk hit
+latency.
+
+    python benchmarks/cache_dedup.py --entries 2000 --distinct 20
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from swagcli.cache import Cache
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+URL = "https://api.example.com/items"
+
+
+def _run(directory, dedup, entries, distinct, items):
+    cache = Cache(
+        CacheConfig(
+            storage_path=directory,
+            ttl=3600,
+            max_size=entries * 2,
+            max_bytes=1 << 40,
+            memory_entries=0,
+            dedup=dedup,
+        )
+    )
+    bodies = [
+        {"items": [{"id": i, "page": page, "name": "item"} for i in range(items)]}
+        for page in range(distinct)
+    ]
+    start = time.perf_counter()
+    for i in range(entries):
+        response = APIResponse(
+            status_code=200, data=bodies[i % distinct], headers={}, elapsed=0
+        )
+        cache.set("GET", URL, response, params={"query": i})
+    set_time = (time.perf_counter() - start) / entries
+
+    start = time.perf_counter()
+    for i in range(entries):
+        cache.get("GET", URL, params={"query": i})
+    get_time = (time.perf_counter() - start) / entries
+    stats = cache.stats()
+    cache.close()
+    return stats, set_time, get_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--items", type=int, default=500, help="items per body")
+    args = parser.parse_args()
+
+    print(f"{args.entries} entries, {args.distinct} distinct bodies:")
+    for dedup in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            stats, set_time, get_time = _run(
+                Path(tmp), dedup, args.entries, args.distinct, args.items
+            )
+        print(
+            f"  dedup {'on' if dedup else 'off':>3}: "
+            f"{stats['bytes'] / 1e6:7.2f} MB, ratio {stats['dedup_ratio']:5.1f}, "
+            f"set {set_time * 1e6:6.0f} us, disk hit {get_time * 1e6:6.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
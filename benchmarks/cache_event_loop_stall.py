@@ -0,0 +1,129 @@
+"""
+Benchmark of event loop stalls caused by cache I/O in APIClient.
+
+Serves `--requests` JSON bodies of `--size` KiB from a server thread and
+fetches them with `--concurrency` concurrent GETs, twice: the first pass
+misses and writes every response to the disk cache, the second reads them
+back (the memory tier is disabled, so every hit reaches the disk). A ticker
+task sleeping 1 ms at a time records how late the loop wakes it, which is
+how long other tasks would have been held up. "inline" runs the cache calls
+on the event loop, as before AsyncCache; "offload" runs them on its I/O
+thread.
+
+    python benchmarks/cache_event_loop_stall.py --requests 500 --size 64
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+from swagcli.client import APIClient
+from swagcli.config import Config
+
+TICK = 0.001
+
+
+def _serve(size, ready):
+    body = {"items": [{"id": i, "name": "x" * 90} for i in range(size * 10)]}
+
+    async def item(request):
+        return web.json_response({"id": request.match_info["id"], **body})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/items/{id}", item)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ready.append(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(run(),), daemon=True).start()
+
+
+async def _ticker(lateness, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lateness.append(time.perf_counter() - start - TICK)
+
+
+async def _pass(client, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get(i):
+        async with semaphore:
+            await client.get(f"/items/{i}")
+
+    lateness, stop = [], asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(lateness, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(get(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, lateness
+
+
+async def _run(port, directory, offload_io, requests, concurrency):
+    config = Config(
+        base_url=f"http://127.0.0.1:{port}",
+        headless=True,
+        cache={
+            "storage_path": directory,
+            "memory_entries": 0,
+            "max_size": requests * 2,
+            "max_bytes": 1 << 40,
+            "offload_io": offload_io,
+        },
+    )
+    async with APIClient(config) as client:
+        results = [
+            await _pass(client, requests, concurrency) for _ in ("misses", "hits")
+        ]
+    client.cache.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--size", type=int, default=64, help="body size in KiB")
+    args = parser.parse_args()
+
+    ready = []
+    _serve(args.size, ready)
+    while not ready:
+        time.sleep(0.01)
+
+    print(
+        f"{args.requests} GETs of ~{args.size} KiB, {args.concurrency} concurrent, "
+        f"loop lateness of a {TICK * 1e3:.0f} ms ticker:"
+    )
+    for offload_io in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            results = asyncio.run(
+                _run(ready[0], Path(tmp), offload_io, args.requests, args.concurrency)
+            )
+        mode = "offload" if offload_io else "inline"
+        for name, (elapsed, lateness) in zip(("misses", "hits"), results):
+            lateness.sort()
+            p99 = lateness[int(len(lateness) * 0.99)]
+            print(
+                f"  {mode:>7} {name:>6}: {elapsed:6.2f} s, "
+                f"stall max {lateness[-1] * 1e3:6.1f} ms, "
+                f"p99 {p99 * 1e3:5.1f} ms, "
+                f"median {statistics.median(lateness) * 1e3:5.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
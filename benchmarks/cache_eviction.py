@@ -0,0 +1,76 @@
+"""
+Benchmark of cache get/set latency while the cache fills up.
+
+Writes `--fill` times `max_size` entries into a cache limited to `max_size`
+entries, reading a random earlier key after every write, and prints the mean
+latency per tenth of the run for each eviction policy. Once the cache is
+full every write may evict, so the later rows show the eviction cost.
+
+    python benchmarks/cache_eviction.py --max-size 2000 --fill 3
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from swagcli.cache import Cache
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+
+def _run(policy, max_size, writes):
+    response = APIResponse(
+        status_code=200,
+        data={"items": [{"id": i, "name": f"item-{i}"} for i in range(20)]},
+        headers={"Content-Type": "application/json"},
+        elapsed=0.01,
+    )
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = Cache(
+            CacheConfig(
+                storage_path=Path(tmp),
+                max_size=max_size,
+                eviction_policy=policy,
+                memory_entries=0,  # measure the disk tier
+            )
+        )
+        step = writes // 10
+        for start in range(0, writes, step):
+            set_time = get_time = 0.0
+            for i in range(start, start + step):
+                begin = time.perf_counter()
+                cache.set("GET", f"https://api.example.com/{i}", response)
+                middle = time.perf_counter()
+                cache.get("GET", f"https://api.example.com/{random.randrange(i + 1)}")
+                get_time += time.perf_counter() - middle
+                set_time += middle - begin
+            stats = cache.stats()
+            rows.append(
+                (start + step, set_time / step, get_time / step, stats["entries"])
+            )
+        evictions = cache.stats()["evictions"]
+        cache.close()
+    return rows, evictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-size", type=int, default=2000)
+    parser.add_argument("--fill", type=int, default=3)
+    args = parser.parse_args()
+
+    for policy in ("lru", "lfu", "ttl"):
+        rows, evictions = _run(policy, args.max_size, args.max_size * args.fill)
+        print(f"{policy}: {evictions} evictions")
+        for written, set_time, get_time, entries in rows:
+            print(
+                f"  {written:7d} written, {entries:6d} entries: "
+                f"set {set_time * 1e6:7.1f} us, get {get_time * 1e6:7.1f} us"
+            )
+
+
+if __name__ == "__main__":
+    main()
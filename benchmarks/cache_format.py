@@ -0,0 +1,105 @@
+"""
+Benchmark of cache disk usage and hit latency per entry format.
+
+Stores the same JSON responses in the pickled `(timestamp, model_dump())`
+format used before cache records, and as records without compression, with
+gzip and, when the zstandard package is installed, with zstd. Hits are read
+from disk, the memory tier is disabled.
+
+    python benchmarks/cache_format.py --items 10 1000 20000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import diskcache
+
+from swagcli.cache import Cache
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+KEYS = 50
+
+
+def _response(items):
+    return APIResponse(
+        status_code=200,
+        data={
+            "items": [
+                {"id": i, "name": f"item-{i}", "tags": ["a", "b"], "active": True}
+                for i in range(items)
+            ]
+        },
+        headers={"Content-Type": "application/json", "ETag": '"v1"'},
+        elapsed=0.01,
+    )
+
+
+def _disk_usage(directory):
+    return sum(f.stat().st_size for f in directory.rglob("*") if f.is_file())
+
+
+def _pickled(directory, response, reads):
+    cache = diskcache.Cache(directory)
+    for i in range(KEYS):
+        cache.set(i, (time.time(), response.model_dump()))
+    start = time.perf_counter()
+    for i in range(reads):
+        APIResponse(**cache.get(i % KEYS)[1])
+    latency = (time.perf_counter() - start) / reads
+    cache.close()
+    return _disk_usage(directory), latency
+
+
+def _records(directory, response, reads, compression):
+    cache = Cache(
+        CacheConfig(
+            storage_path=directory,
+            compression=compression,
+            compression_threshold=1024,
+            memory_entries=0,
+            # no access time updates on hits, like the pickled cache
+            eviction_policy="ttl",
+        )
+    )
+    for i in range(KEYS):
+        cache.set("GET", f"https://api.example.com/{i}", response)
+    start = time.perf_counter()
+    for i in range(reads):
+        cache.get("GET", f"https://api.example.com/{i % KEYS}").data
+    latency = (time.perf_counter() - start) / reads
+    cache.close()
+    return _disk_usage(directory), latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 1000, 20000])
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    formats = ["none", "gzip"] + (["zstd"] if zstandard else [])
+    for items in args.items:
+        response = _response(items)
+        print(f"{items} items per body, {KEYS} entries:")
+        with tempfile.TemporaryDirectory() as tmp:
+            size, latency = _pickled(Path(tmp), response, args.reads)
+        print(f"  {'pickle':>12}: {size / 1024:9.0f} KiB, {latency * 1e6:9.1f} us/hit")
+        for compression in formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                size, latency = _records(Path(tmp), response, args.reads, compression)
+            print(
+                f"  {'record ' + compression:>12}: {size / 1024:9.0f} KiB, "
+                f"{latency * 1e6:9.1f} us/hit"
+            )
+
+
+if __name__ == "__main__":
+    main()
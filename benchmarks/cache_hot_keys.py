@@ -0,0 +1,60 @@
+"""
+Benchmark of cache hit latency for a small set of hot keys.
+
+Reads the same keys repeatedly from a cache with the in-process memory tier
+and from one with `memory_entries=0`, where every hit is read from diskcache
+and rebuilt into an APIResponse.
+
+    python benchmarks/cache_hot_keys.py --keys 20 --items 100
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from swagcli.cache import Cache
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+
+def _latency(cache, urls, reads):
+    start = time.perf_counter()
+    for i in range(reads):
+        assert cache.get("GET", urls[i % len(urls)]) is not None
+    return (time.perf_counter() - start) / reads * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=20)
+    parser.add_argument("--items", type=int, default=100, help="items per body")
+    parser.add_argument("--reads", type=int, default=20000)
+    args = parser.parse_args()
+
+    response = APIResponse(
+        status_code=200,
+        data={"items": [{"id": i, "name": f"item-{i}"} for i in range(args.items)]},
+        headers={"Content-Type": "application/json"},
+        elapsed=0.01,
+    )
+    urls = [f"https://api.example.com/items/{i}" for i in range(args.keys)]
+    for name, memory_entries in (("disk only", 0), ("memory + disk", 256)):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = Cache(
+                CacheConfig(storage_path=Path(tmp), memory_entries=memory_entries)
+            )
+            for url in urls:
+                cache.set("GET", url, response)
+            latency = _latency(cache, urls, args.reads)
+            stats = cache.stats()
+            print(
+                f"{name:>14}: {latency:8.2f} us per hit, "
+                f"memory hit rate {stats['memory_hit_rate']:.2f}, "
+                f"disk hit rate {stats['disk_hit_rate']:.2f}"
+            )
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of hit latency and peak RSS for large cached response bodies.
+
+Caches a `--size` MB body that was too large to decode (a ResponseBody) and
+reads it back `--reads` times in a fresh process, either hashing the whole
+body or reading its first KiB. "copy" reads the value out of diskcache as
+bytes, like the cache did before bodies were mapped. "mapped" goes through
+`Cache.get`, which returns a ResponseBody over a memory map of the cache
+file. Pages of a mapped file count towards RSS once touched, but they are
+the page cache's, shared and reclaimable, not copies.
+
+    python benchmarks/cache_large_values.py --size 100 --reads 20
+"""
+
+import argparse
+import hashlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from swagcli.body import ResponseBody
+from swagcli.cache import Cache
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+URL = "https://api.example.com/export"
+
+
+def _cache(directory):
+    return Cache(
+        CacheConfig(
+            storage_path=directory,
+            ttl=3600,
+            max_bytes=1 << 40,
+            memory_entries=0,
+            dedup=False,
+        )
+    )
+
+
+def _fill(directory, size):
+    body = ResponseBody(-1, "application/octet-stream")
+    chunk = bytes(range(256)) * 4096
+    for _ in range(size // len(chunk)):
+        body._write(chunk)
+    cache = _cache(directory)
+    cache.set(
+        "GET", URL, APIResponse(status_code=200, data=body, headers={}, elapsed=0)
+    )
+    cache.close()
+    body.close()
+
+
+def _read(directory, mode, workload, reads):
+    cache = _cache(directory)
+    key = cache.key_for("GET", URL)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(reads):
+        if mode == "copy":
+            value = cache.backend.cache.get(key)
+        else:
+            body = cache.get("GET", URL).data
+            value = body.mmap()
+        if workload == "hash":
+            hashlib.sha256(value).hexdigest()
+        else:
+            bytes(value[:1024])
+        if mode == "mapped":
+            body.close()
+    latency = (time.perf_counter() - start) / reads
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print(f"{latency * 1e3:.2f} {peak / 1024:.1f}")  # ms, MiB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100, help="body size in MB")
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--mode", choices=["copy", "mapped"], help=argparse.SUPPRESS)
+    parser.add_argument("--workload", choices=["hash", "head"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _read(args.path, args.mode, args.workload, args.reads)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _fill(Path(tmp), args.size * 1024 * 1024)
+        print(f"{args.size} MB body, {args.reads} hits per process:")
+        for workload in ("hash", "head"):
+            for mode in ("copy", "mapped"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--mode", mode, "--path", tmp]
+                    + ["--workload", workload, "--reads", str(args.reads)],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                latency, peak = output.split()
+                print(
+                    f"  {workload} {mode:>6}: {latency:>8} ms per hit, "
+                    f"peak RSS +{peak} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of request throughput with and without per-request rendering.
+
+Runs the same requests against a local server with the rich spinner rendered
+for every request, in headless mode, and in headless mode with one aggregated
+batch display. The console renders to /dev/null as if it were a terminal so
+the rendering cost is included. The server runs in a separate process.
+
+    python benchmarks/headless_throughput.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+from rich.console import Console
+
+from swagcli.client import APIClient
+from swagcli.config import Config
+
+
+async def _item(request):
+    return web.json_response({"id": 1, "name": "item"})
+
+
+def _serve(port):
+    app = web.Application()
+    app.router.add_get("/item", _item)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _client(base_url, cache_dir, headless):
+    client = APIClient(
+        Config(
+            base_url=base_url,
+            headless=headless,
+            cache={"enabled": False, "storage_path": cache_dir},
+        )
+    )
+    client.console = Console(file=open(os.devnull, "w"), force_terminal=True)
+    return client
+
+
+async def _sequential(client, count):
+    for _ in range(count):
+        await client.get("/item", use_cache=False)
+
+
+async def _batched(client, count, concurrency=50):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.get("/item", use_cache=False)
+
+    with client.batch(total=count):
+        await asyncio.gather(*(one() for _ in range(count)))
+
+
+async def _measure(name, client, run, count):
+    async with client:
+        start_cpu, start_wall = time.process_time(), time.perf_counter()
+        await run(client, count)
+        cpu = time.process_time() - start_cpu
+        wall = time.perf_counter() - start_wall
+    print(f"{name:>28}: {count / wall:8.1f} req/s, {cpu / count * 1e6:7.1f} CPU us/req")
+
+
+async def _run(base_url, cache_dir, count):
+    await _measure(
+        "rendered, sequential", _client(base_url, cache_dir, False), _sequential, count
+    )
+    await _measure(
+        "headless, sequential", _client(base_url, cache_dir, True), _sequential, count
+    )
+    # the batch display is rendered, per-request spinners are not
+    await _measure(
+        "batch display, concurrent",
+        _client(base_url, cache_dir, False),
+        _batched,
+        count,
+    )
+    await _measure(
+        "headless, concurrent", _client(base_url, cache_dir, True), _batched, count
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_run(f"http://127.0.0.1:{port}", Path(tmp), args.requests))
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
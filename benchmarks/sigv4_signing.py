@@ -0,0 +1,47 @@
+"""
+Benchmark of AWS Signature Version 4 signing throughput.
+
+Signs the same kind of request repeatedly with the cached signing key and
+with the key derived on every request, which is what AWSAuth did before the
+cache, and reports requests signed per second.
+
+    python benchmarks/sigv4_signing.py --seconds 2
+"""
+
+import argparse
+import time
+
+from swagcli.auth import AWSAuth
+
+
+def _rate(auth, seconds, cached):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if not cached:
+            auth._signing_keys.clear()
+        auth.get_headers(
+            "GET",
+            "/bucket/some object.json",
+            query_params={"versionId": "3", "response-content-type": "text/plain"},
+            headers={"Range": "bytes=0-1023"},
+            host="bucket.s3.us-west-2.amazonaws.com",
+        )
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    auth = AWSAuth("AKIDEXAMPLE", "secret", "us-west-2", "s3")
+    uncached = _rate(auth, args.seconds, cached=False)
+    cached = _rate(auth, args.seconds, cached=True)
+    print(f"derived per request: {uncached:10.0f} req/s")
+    print(f"cached signing key:  {cached:10.0f} req/s ({cached / uncached:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of client CPU time per GB uploaded.
+
+Compares the aiofiles read-then-send upload path of the file handler plugin
+with the sendfile, mmap and read modes of swagcli.transfer.FileBodyPayload.
+The receiving server runs in a separate process so only the client's CPU time
+is measured.
+
+    python benchmarks/upload_cpu.py --size-mb 1024 --rounds 3
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+from swagcli.plugins.file_handler import FileStreamPayload
+from swagcli.transfer import FileBodyPayload
+
+CHUNK_SIZE = 1024 * 1024
+
+
+async def _discard(request):
+    size = 0
+    async for chunk in request.content.iter_any():
+        size += len(chunk)
+    return web.json_response({"size": size})
+
+
+def _serve(port):
+    app = web.Application()
+    app.router.add_put("/upload", _discard)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _payloads(path):
+    return {
+        "aiofiles": lambda: (FileStreamPayload(path, chunk_size=CHUNK_SIZE), None),
+        "sendfile": lambda: (FileBodyPayload(path, chunk_size=CHUNK_SIZE), None),
+        # chunked transfer encoding rules out sendfile
+        "mmap": lambda: (FileBodyPayload(path, chunk_size=CHUNK_SIZE), True),
+        "read": lambda: (
+            FileBodyPayload(path, chunk_size=CHUNK_SIZE, zero_copy=False),
+            None,
+        ),
+    }
+
+
+async def _run(url, path, rounds):
+    size_gb = path.stat().st_size / 1024**3
+    async with aiohttp.ClientSession() as session:
+        for name, make in _payloads(path).items():
+            cpu = wall = 0.0
+            for _ in range(rounds):
+                body, chunked = make()
+                start_cpu, start_wall = time.process_time(), time.perf_counter()
+                async with session.put(url, data=body, chunked=chunked) as response:
+                    await response.read()
+                cpu += time.process_time() - start_cpu
+                wall += time.perf_counter() - start_wall
+            print(
+                f"{name:>9}: {cpu / rounds / size_gb:6.3f} CPU s/GB, "
+                f"{size_gb * rounds / wall:6.2f} GB/s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "upload.bin"
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        asyncio.run(_run(f"http://127.0.0.1:{port}/upload", path, args.rounds))
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
-from .cli import Swagcli
-from .client import APIClient
-from .commands import create_cli
-from .models import APIResponse, SwaggerDefinition
+import importlib
+
+# Re-exports are resolved lazily so that light entry points such as
+# swagcli.daemon do not pay for importing click, aiohttp, rich and pydantic
+_exports = {
+    "Swagcli": ".cli",
+    "APIClient": ".client",
+    "create_cli": ".commands",
+    "APIResponse": ".models",
+    "SwaggerDefinition": ".models",
+}
 
 __version__ = "0.2.0"
 __all__ = ["create_cli", "APIClient", "SwaggerDefinition", "APIResponse", "Swagcli"]
+
+
+def __getattr__(name):
+    if name in _exports:
+        return getattr(importlib.import_module(_exports[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,14 +3,31 @@ import base64
 import hashlib
 import hmac
 import json
+import os
 import secrets
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
-
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import quote, unquote
+
+import aiofiles
 import aiohttp
 import jwt
-from pydantic import BaseModel, SecretStr
+import yarl
+from pydantic import BaseModel, ConfigDict, Field, SecretStr
+
+from .tokencache import TokenCache
 
 
 class AuthConfig(BaseModel):
@@ -26,6 +43,134 @@ class AuthConfig(BaseModel):
     scope: Optional[str] = None
 
 
+class CredentialProvider:
+    """Supplies the auth headers of every request made by APIClient.
+
+    `payload_hash` is the hex SHA-256 of the request body, UNSIGNED_PAYLOAD
+    for bodies that are streamed, or None without a body.
+    """
+
+    async def headers(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        payload_hash: Optional[str] = None,
+    ) -> Dict[str, str]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        return None
+
+
+class StaticCredentials(CredentialProvider):
+    """Headers that never change, computed once (API keys, basic auth)."""
+
+    def __init__(self, headers: Dict[str, str]) -> None:
+        self._headers = dict(headers)
+
+    async def headers(self, method, url, params=None, payload_hash=None):
+        return dict(self._headers)
+
+
+TokenFetcher = Callable[[], Awaitable[Tuple[str, Optional[float]]]]
+
+
+class RefreshingCredentials(CredentialProvider):
+    """Bearer token from `fetch`, which returns the token and its lifetime in
+    seconds (None if it does not expire).
+
+    Refreshes are single-flight: concurrent requests that find no valid token
+    wait on one fetch. `refresh_margin` seconds before expiry the token is
+    refreshed in the background, so requests keep using the current token
+    instead of waiting for the new one.
+    """
+
+    def __init__(
+        self,
+        fetch: TokenFetcher,
+        refresh_margin: float = 60.0,
+        header: str = "Authorization",
+        scheme: str = "Bearer",
+    ) -> None:
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.header = header
+        self.scheme = scheme
+        self.token: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def headers(self, method, url, params=None, payload_hash=None):
+        if self.token is None or (
+            self.expires_at is not None and time.monotonic() >= self.expires_at
+        ):
+            await asyncio.shield(self._refresh())
+        return {self.header: f"{self.scheme} {self.token}"}
+
+    def _refresh(self) -> asyncio.Future:
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+        return self._refreshing
+
+    async def _fetch(self) -> None:
+        try:
+            token, expires_in = await self.fetch()
+        finally:
+            self._refreshing = None
+        self.token = token
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if expires_in is None:
+            self.expires_at = None
+            return
+        self.expires_at = time.monotonic() + expires_in
+        if expires_in > 0:
+            # Short lived tokens are refreshed half way through their lifetime
+            margin = min(self.refresh_margin, expires_in / 2)
+            self._timer = asyncio.get_running_loop().call_later(
+                expires_in - margin, self._refresh_in_background
+            )
+
+    def _refresh_in_background(self) -> None:
+        self._timer = None
+        # A failure is retried by the first request after expiry
+        self._refresh().add_done_callback(
+            lambda future: future.cancelled() or future.exception()
+        )
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._refreshing is not None:
+            self._refreshing.cancel()
+
+
+class SigningCredentials(CredentialProvider):
+    """Headers derived from each request, e.g. AWS signatures."""
+
+    def __init__(self, sign: Callable[..., Dict[str, str]]) -> None:
+        self.sign = sign
+
+    async def headers(self, method, url, params=None, payload_hash=None):
+        request_url = yarl.URL(url)
+        host = request_url.host
+        if not request_url.is_default_port():
+            host = f"{host}:{request_url.port}"
+        kwargs = {"host": host}
+        if payload_hash is not None:
+            kwargs["payload_hash"] = payload_hash
+        return self.sign(
+            method,
+            request_url.raw_path,
+            {**request_url.query, **(params or {})},
+            **kwargs,
+        )
+
+
 class BasicAuth:
     def __init__(self, username: str, password: SecretStr) -> None:
         self.username = username
@@ -54,11 +199,14 @@ class OAuth2Auth:
         client_id: str,
         client_secret: SecretStr,
         scope: Optional[str] = None,
+        token_cache: Optional[TokenCache] = None,
     ) -> None:
         self.token_url = token_url
         self.client_id = client_id
         self.client_secret = client_secret
         self.scope = scope
+        # Shares tokens with other processes, see swagcli.tokencache
+        self.token_cache = token_cache
         self._token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
 
@@ -70,29 +218,57 @@ class OAuth2Auth:
         return {"Authorization": f"Bearer {self._token}"}
 
     def _refresh_token(self) -> None:
-        async def get_token() -> str:
-            async with aiohttp.ClientSession() as session:
-                data = {
-                    "grant_type": "client_credentials",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret.get_secret_value(),
-                }
-                if self.scope:
-                    data["scope"] = self.scope
-
-                async with session.post(self.token_url, data=data) as response:
-                    token_data = await response.json()
-                    self._token = token_data["access_token"]
-                    if "expires_in" in token_data:
-                        self._token_expiry = datetime.now() + timedelta(
-                            seconds=token_data["expires_in"]
-                        )
-                    return self._token
-
-        self._token = asyncio.run(get_token())
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.fetch_token())
+            return
+        raise RuntimeError(
+            "OAuth2Auth.get_headers cannot block a running event loop, "
+            "use credential_provider(auth) with APIClient instead"
+        )
+
+    async def fetch_token(self) -> Tuple[str, Optional[float]]:
+        if self.token_cache is None:
+            token, expires_in = await self._request_token()
+        else:
+            key = TokenCache.key(
+                token_url=self.token_url, client_id=self.client_id, scope=self.scope
+            )
+            token, expires_in = await self.token_cache.get_or_fetch(
+                key, self._request_token
+            )
+        self._token = token
+        if expires_in is not None:
+            self._token_expiry = datetime.now() + timedelta(seconds=expires_in)
+        return token, expires_in
+
+    async def _request_token(self) -> Tuple[str, Optional[float]]:
+        async with aiohttp.ClientSession() as session:
+            data = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret.get_secret_value(),
+            }
+            if self.scope:
+                data["scope"] = self.scope
+
+            async with session.post(
+                self.token_url, data=data, raise_for_status=True
+            ) as response:
+                token_data = await response.json()
+        return token_data["access_token"], token_data.get("expires_in")
 
 
 class JWTAuth:
+    """Signs JWTs with a shared secret or private key.
+
+    `get_headers` reuses the signed token of a claims set until
+    `refresh_margin` seconds before its `exp`, keeping at most `cache_size`
+    tokens. Concurrent callers that miss the cache share one signing
+    operation (`cache_size=0` signs every time).
+    """
+
     def __init__(
         self,
         secret: Union[str, SecretStr],
@@ -100,6 +276,8 @@ class JWTAuth:
         expires_in: int = 3600,
         issuer: str = None,
         audience: str = None,
+        cache_size: int = 128,
+        refresh_margin: float = 30.0,
     ) -> None:
         if isinstance(secret, SecretStr):
             self.secret = secret
@@ -109,6 +287,14 @@ class JWTAuth:
         self.expires_in = expires_in
         self.issuer = issuer
         self.audience = audience
+        self.cache_size = cache_size
+        self.refresh_margin = refresh_margin
+        # claims key -> (token, reuse until), least recently used first
+        self._tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._tokens_lock = threading.Lock()
+        # Held while signing, so threads missing the cache sign once
+        self._lock = threading.Lock()
+        self._signing: Dict[str, asyncio.Future] = {}
 
     def generate_token(self, claims: Optional[Dict[str, Any]] = None) -> str:
         now = datetime.utcnow()
@@ -135,21 +321,164 @@ class JWTAuth:
         )
 
     def get_headers(self, payload: Dict[str, Any]) -> Dict[str, str]:
-        token = jwt.encode(
-            payload,
-            self.secret.get_secret_value(),
-            algorithm=self.algorithm,
-        )
+        return {"Authorization": f"Bearer {self.token_for(payload)}"}
+
+    async def get_headers_async(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        """Like get_headers, but signs in a worker thread so RS/ES signing
+        does not block the event loop"""
+        key = self._cache_key(payload)
+        token = self._cached(key)
+        if token is None:
+            future = self._signing.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().run_in_executor(
+                    None, self.token_for, payload
+                )
+                self._signing[key] = future
+                future.add_done_callback(lambda _: self._signing.pop(key, None))
+            token = await asyncio.shield(future)
         return {"Authorization": f"Bearer {token}"}
 
+    def token_for(self, payload: Dict[str, Any]) -> str:
+        key = self._cache_key(payload)
+        token = self._cached(key)
+        if token is not None:
+            return token
+        with self._lock:
+            # Another thread may have signed it while we waited
+            token = self._cached(key)
+            if token is None:
+                token = jwt.encode(
+                    payload,
+                    self.secret.get_secret_value(),
+                    algorithm=self.algorithm,
+                )
+                self._store(key, token, payload.get("exp"))
+        return token
+
+    @staticmethod
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        return json.dumps(payload, sort_keys=True, default=str)
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._tokens_lock:
+            entry = self._tokens.get(key)
+            if entry is None:
+                return None
+            token, reuse_until = entry
+            if time.time() >= reuse_until:
+                del self._tokens[key]
+                return None
+            self._tokens.move_to_end(key)
+            return token
+
+    def _store(self, key: str, token: str, exp: Any) -> None:
+        if self.cache_size <= 0:
+            return
+        if isinstance(exp, datetime):
+            exp = exp.replace(tzinfo=exp.tzinfo or timezone.utc).timestamp()
+        reuse_until = float("inf") if exp is None else exp - self.refresh_margin
+        with self._tokens_lock:
+            self._tokens[key] = (token, reuse_until)
+            while len(self._tokens) > self.cache_size:
+                self._tokens.popitem(last=False)
+
+
+AWS_ALGORITHM = "AWS4-HMAC-SHA256"
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+STREAMING_PAYLOAD = "STREAMING-AWS4-HMAC-SHA256-PAYLOAD"
+
+
+def _uri_encode(value: str, safe: str = "") -> str:
+    # RFC 3986 unreserved characters stay as they are
+    return quote(value, safe="-_.~" + safe)
+
+
+async def hash_file(
+    path: Union[str, "os.PathLike[str]"], chunk_size: int = 1 << 20
+) -> str:
+    """SHA-256 of a file, read in chunks so it can be signed without
+    buffering it."""
+    digest = hashlib.sha256()
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ChunkSigner:
+    """Frames and signs the chunks of an `aws-chunked` request body.
+
+    Every chunk signature chains to the previous one, starting from the seed
+    signature of the request headers. The body must end with an empty chunk.
+    """
+
+    def __init__(
+        self, signing_key: bytes, amz_date: str, scope: str, seed_signature: str
+    ) -> None:
+        self.signing_key = signing_key
+        self.amz_date = amz_date
+        self.scope = scope
+        self.previous = seed_signature
+
+    def frame(self, chunk: bytes) -> bytes:
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256-PAYLOAD",
+                self.amz_date,
+                self.scope,
+                self.previous,
+                EMPTY_SHA256,
+                hashlib.sha256(chunk).hexdigest(),
+            ]
+        )
+        self.previous = hmac.new(
+            self.signing_key, string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+        return (
+            f"{len(chunk):x};chunk-signature={self.previous}\r\n".encode()
+            + chunk
+            + b"\r\n"
+        )
+
+    @staticmethod
+    def encoded_length(decoded_length: int, chunk_size: int) -> int:
+        """Content-Length of the framed body"""
+
+        def framed(size: int) -> int:
+            return len(f"{size:x}") + len(";chunk-signature=") + 64 + 4 + size
+
+        full, rest = divmod(decoded_length, chunk_size)
+        return full * framed(chunk_size) + (framed(rest) if rest else 0) + framed(0)
+
+    async def stream(
+        self, path: Union[str, "os.PathLike[str]"], chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        """Framed body of a file, usable as aiohttp request data"""
+        async with aiofiles.open(path, "rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield self.frame(chunk)
+        yield self.frame(b"")
+
 
 class AWSAuth:
+    """AWS Signature Version 4.
+
+    The derived signing key is cached per date, region and service. The
+    payload is signed from `body` or a precomputed `payload_hash` (see
+    `hash_file` for bodies streamed from disk), sent as `UNSIGNED-PAYLOAD`
+    with `payload_signing="unsigned"`, or signed chunk by chunk with
+    `streaming_headers`.
+    """
+
     def __init__(
         self,
         access_key: str,
         secret_key: Union[str, SecretStr],
         region: str,
         service: str,
+        payload_signing: str = "signed",  # signed, unsigned
     ) -> None:
         self.access_key = access_key
         if isinstance(secret_key, SecretStr):
@@ -158,75 +487,177 @@ class AWSAuth:
             self.secret_key = SecretStr(secret_key)
         self.region = region
         self.service = service
+        self.payload_signing = payload_signing
+        self._signing_keys: Dict[Tuple[str, str, str, str], bytes] = {}
+
+    def signing_key(self, date_stamp: str) -> bytes:
+        secret = self.secret_key.get_secret_value()
+        key = (secret, date_stamp, self.region, self.service)
+        signing_key = self._signing_keys.get(key)
+        if signing_key is None:
+
+            def sign(key: bytes, msg: str) -> bytes:
+                return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+            k_date = sign(f"AWS4{secret}".encode(), date_stamp)
+            k_region = sign(k_date, self.region)
+            k_service = sign(k_region, self.service)
+            signing_key = sign(k_service, "aws4_request")
+            if len(self._signing_keys) >= 16:
+                self._signing_keys.clear()
+            self._signing_keys[key] = signing_key
+        return signing_key
+
+    def canonical_uri(self, path: str) -> str:
+        encoded = _uri_encode(unquote(path or "/"), safe="/")
+        if self.service != "s3":
+            # Every service but S3 expects the path to be encoded twice
+            encoded = _uri_encode(encoded, safe="/")
+        return encoded
+
+    @staticmethod
+    def canonical_query(query_params: Optional[Dict[str, Any]]) -> str:
+        if not query_params:
+            return ""
+        return "&".join(
+            f"{k}={v}"
+            for k, v in sorted(
+                (_uri_encode(str(k)), _uri_encode(str(v)))
+                for k, v in query_params.items()
+            )
+        )
 
     def get_headers(
         self,
         method: str,
         path: str,
         query_params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[Union[bytes, str]] = None,
+        payload_hash: Optional[str] = None,
+        host: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
         **kwargs,
     ) -> Dict[str, str]:
-        # AWS Signature Version 4
-        now = datetime.utcnow()
-        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
-        date_stamp = now.strftime("%Y%m%d")
-
-        # Canonical request
-        canonical_uri = path
-        canonical_querystring = ""
-        if query_params:
-            canonical_querystring = "&".join(
-                f"{k}={v}" for k, v in sorted(query_params.items())
-            )
-
-        host = f"{self.service}.{self.region}.amazonaws.com"
-        canonical_headers = f"host:{host}\nx-amz-date:{amz_date}\n"
+        headers, _ = self._sign(
+            method,
+            path,
+            query_params,
+            headers,
+            body,
+            payload_hash,
+            host,
+            timestamp,
+        )
+        return headers
 
-        signed_headers = "host;x-amz-date"
+    def streaming_headers(
+        self,
+        method: str,
+        path: str,
+        decoded_length: int,
+        chunk_size: int = 64 * 1024,
+        query_params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        host: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Tuple[Dict[str, str], ChunkSigner]:
+        """Headers for an `aws-chunked` body of `decoded_length` bytes and the
+        ChunkSigner that frames it"""
+        headers = {
+            **(headers or {}),
+            "Content-Encoding": "aws-chunked",
+            "Content-Length": str(
+                ChunkSigner.encoded_length(decoded_length, chunk_size)
+            ),
+            "x-amz-decoded-content-length": str(decoded_length),
+        }
+        signed, signer = self._sign(
+            method,
+            path,
+            query_params,
+            headers,
+            None,
+            STREAMING_PAYLOAD,
+            host,
+            timestamp,
+        )
+        return {**headers, **signed}, signer
 
-        payload_hash = hashlib.sha256("".encode()).hexdigest()
+    def _sign(
+        self,
+        method: str,
+        path: str,
+        query_params: Optional[Dict[str, str]],
+        headers: Optional[Dict[str, str]],
+        body: Optional[Union[bytes, str]],
+        payload_hash: Optional[str],
+        host: Optional[str],
+        timestamp: Optional[datetime],
+    ) -> Tuple[Dict[str, str], ChunkSigner]:
+        now = timestamp or datetime.utcnow()
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+        host = host or f"{self.service}.{self.region}.amazonaws.com"
+
+        if payload_hash is None:
+            if self.payload_signing == "unsigned":
+                payload_hash = UNSIGNED_PAYLOAD
+            elif body is None:
+                payload_hash = EMPTY_SHA256
+            else:
+                if isinstance(body, str):
+                    body = body.encode()
+                payload_hash = hashlib.sha256(body).hexdigest()
+
+        signed = {
+            k.lower(): " ".join(str(v).split()) for k, v in (headers or {}).items()
+        }
+        signed.update(
+            {
+                "host": host,
+                "x-amz-content-sha256": payload_hash,
+                "x-amz-date": amz_date,
+            }
+        )
+        names = sorted(signed)
+        canonical_headers = "".join(f"{name}:{signed[name]}\n" for name in names)
+        signed_headers = ";".join(names)
 
         canonical_request = "\n".join(
             [
-                method,
-                canonical_uri,
-                canonical_querystring,
+                method.upper(),
+                self.canonical_uri(path),
+                self.canonical_query(query_params),
                 canonical_headers,
                 signed_headers,
                 payload_hash,
             ]
         )
 
-        # String to sign
-        algorithm = "AWS4-HMAC-SHA256"
         credential_scope = f"{date_stamp}/{self.region}/{self.service}/aws4_request"
         string_to_sign = "\n".join(
             [
-                algorithm,
+                AWS_ALGORITHM,
                 amz_date,
                 credential_scope,
                 hashlib.sha256(canonical_request.encode()).hexdigest(),
             ]
         )
-
-        # Calculate signature
-        def sign(key: bytes, msg: str) -> bytes:
-            return hmac.new(key, msg.encode(), hashlib.sha256).digest()
-
-        k_date = sign(f"AWS4{self.secret_key.get_secret_value()}".encode(), date_stamp)
-        k_region = sign(k_date, self.region)
-        k_service = sign(k_region, self.service)
-        k_signing = sign(k_service, "aws4_request")
+        signing_key = self.signing_key(date_stamp)
         signature = hmac.new(
-            k_signing, string_to_sign.encode(), hashlib.sha256
+            signing_key, string_to_sign.encode(), hashlib.sha256
         ).hexdigest()
 
-        # Return headers
-        return {
-            "Authorization": f"{algorithm} Credential={self.access_key}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature}",
-            "X-Amz-Date": amz_date,
-            "host": host,
-        }
+        return (
+            {
+                "Authorization": f"{AWS_ALGORITHM} Credential={self.access_key}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature}",
+                "X-Amz-Date": amz_date,
+                "X-Amz-Content-Sha256": payload_hash,
+                "host": host,
+            },
+            ChunkSigner(signing_key, amz_date, credential_scope, signature),
+        )
 
     def get_auth_headers(self, *args, **kwargs) -> Dict[str, str]:
         return self.get_headers(*args, **kwargs)
@@ -256,6 +687,7 @@ class OAuth2PKCEAuth(BaseModel):
 
     def _generate_code_challenge(self) -> str:
         """Generate a code challenge from the verifier."""
+        assert self.code_verifier is not None
         sha256_hash = hashlib.sha256(self.code_verifier.encode()).digest()
         return base64.urlsafe_b64encode(sha256_hash).decode().rstrip("=")
 
@@ -279,6 +711,7 @@ class OAuth2PKCEAuth(BaseModel):
 
     def get_token_request_data(self, code: str) -> Dict[str, str]:
         """Get the data for the token request."""
+        assert self.code_verifier is not None
         return {
             "client_id": self.client_id,
             "code": code,
@@ -289,18 +722,28 @@ class OAuth2PKCEAuth(BaseModel):
 
 
 class AzureADAuth(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     client_id: str
     client_secret: SecretStr
     tenant_id: str
     scope: str = "https://graph.microsoft.com/.default"
     token_endpoint: Optional[str] = None
+    # Shares tokens with other processes, see swagcli.tokencache
+    token_cache: Optional[TokenCache] = Field(default=None, exclude=True)
 
     def __init__(self, **data):
         super().__init__(**data)
         if not self.token_endpoint:
-            self.token_endpoint = (
-                f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
-            )
+            self.token_endpoint = self.token_url
+
+    @property
+    def token_url(self) -> str:
+        """`token_endpoint`, or the tenant's v2.0 endpoint when it is unset"""
+        return (
+            self.token_endpoint
+            or f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
+        )
 
     def get_token_request_data(self) -> Dict[str, str]:
         """Get the data for the token request."""
@@ -316,9 +759,58 @@ class AzureADAuth(BaseModel):
         return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
     async def get_token(self, session: aiohttp.ClientSession) -> str:
-        """Get a new access token."""
+        """Get an access token, from the token cache if one is configured."""
+        token, _ = await self._cached_token(lambda: self._request_token(session))
+        return token
+
+    async def fetch_token(self) -> Tuple[str, Optional[float]]:
+        """Get an access token and its lifetime in seconds."""
+
+        async def request() -> Tuple[str, Optional[float]]:
+            async with aiohttp.ClientSession() as session:
+                return await self._request_token(session)
+
+        return await self._cached_token(request)
+
+    async def _cached_token(
+        self, request: Callable[[], Awaitable[Tuple[str, Optional[float]]]]
+    ) -> Tuple[str, Optional[float]]:
+        if self.token_cache is None:
+            return await request()
+        key = TokenCache.key(
+            token_url=self.token_url,
+            client_id=self.client_id,
+            tenant=self.tenant_id,
+            scope=self.scope,
+        )
+        return await self.token_cache.get_or_fetch(key, request)
+
+    async def _request_token(
+        self, session: aiohttp.ClientSession
+    ) -> Tuple[str, Optional[float]]:
         async with session.post(
-            self.token_endpoint, data=self.get_token_request_data()
+            self.token_url,
+            data=self.get_token_request_data(),
+            raise_for_status=True,
         ) as response:
             data = await response.json()
-            return data["access_token"]
+            return data["access_token"], data.get("expires_in")
+
+
+def credential_provider(auth: Any, refresh_margin: float = 60.0) -> CredentialProvider:
+    """Wraps one of the auth classes above in a CredentialProvider."""
+    if isinstance(auth, CredentialProvider):
+        return auth
+    if isinstance(auth, (BasicAuth, ApiKeyAuth)):
+        return StaticCredentials(auth.get_headers())
+    if isinstance(auth, (OAuth2Auth, AzureADAuth)):
+        return RefreshingCredentials(auth.fetch_token, refresh_margin)
+    if isinstance(auth, JWTAuth):
+
+        async def sign() -> Tuple[str, Optional[float]]:
+            return auth.generate_token(), auth.expires_in
+
+        return RefreshingCredentials(sign, refresh_margin)
+    if isinstance(auth, AWSAuth):
+        return SigningCredentials(auth.get_headers)
+    raise ValueError(f"Unsupported auth: {type(auth).__name__}")
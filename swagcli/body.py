@@ -0,0 +1,108 @@
+import asyncio
+import json
+import mmap
+import tempfile
+from typing import IO, Any, Optional, Union
+
+
+class ResponseBody:
+    """Response body that is buffered in memory up to `memory_limit` bytes and
+    spilled to an anonymous temporary file above it.
+
+    Nothing is decoded up front: `json()` parses on first access, `open()`
+    gives a file-like object and `mmap()` a read-only mapping, so a large
+    response can be processed without holding a copy of it in memory.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int,
+        content_type: Optional[str] = None,
+        charset: Optional[str] = None,
+    ) -> None:
+        self.memory_limit = memory_limit
+        self.content_type = content_type
+        self.charset = charset
+        self.size = 0
+        self._file: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=memory_limit)
+        self._offset = 0
+        self._json: Any = None
+        self._parsed = False
+
+    @classmethod
+    def mapped(
+        cls,
+        file: IO[bytes],
+        offset: int,
+        size: int,
+        content_type: Optional[str] = None,
+        charset: Optional[str] = None,
+    ) -> "ResponseBody":
+        """Body stored in `file` from `offset` to the end, such as a cached
+        body. It is read and mapped where it is, never copied."""
+        body = cls(-1, content_type, charset)
+        body._file.close()
+        body._file = file
+        body._offset = offset
+        body.size = size
+        return body
+
+    @classmethod
+    async def read(
+        cls, response: Any, memory_limit: int, chunk_size: int
+    ) -> "ResponseBody":
+        body = cls(
+            memory_limit,
+            content_type=response.content_type,
+            charset=response.charset,
+        )
+        loop = asyncio.get_running_loop()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            if body.spilled or body.size + len(chunk) > memory_limit:
+                # Once on disk, keep the writes off the event loop
+                await loop.run_in_executor(None, body._write, chunk)
+            else:
+                body._write(chunk)
+        return body
+
+    def _write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    @property
+    def spilled(self) -> bool:
+        return self.size > self.memory_limit
+
+    def open(self) -> IO[bytes]:
+        """Returns the underlying file positioned at the start of the body"""
+        self._file.seek(self._offset)
+        return self._file
+
+    def read_bytes(self) -> bytes:
+        return self.open().read()
+
+    def text(self, encoding: Optional[str] = None) -> str:
+        return self.read_bytes().decode(encoding or self.charset or "utf-8")
+
+    def json(self) -> Any:
+        if not self._parsed:
+            self._json = json.loads(self.read_bytes())
+            self._parsed = True
+        return self._json
+
+    def mmap(self) -> Union[mmap.mmap, memoryview]:
+        """Read-only mapping of a spilled body, a view of the buffer otherwise"""
+        if not self.spilled:
+            return self._file._file.getbuffer()  # type: ignore[attr-defined]
+        mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._offset:
+            # mmap offsets must be multiples of the allocation granularity
+            return memoryview(mapping)[self._offset :]
+        return mapping
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __repr__(self) -> str:
+        where = "on disk" if self.spilled else "in memory"
+        return f"<ResponseBody {self.size} bytes {where}, {self.content_type}>"
@@ -1,28 +1,551 @@
+import asyncio
+import copy
+import gzip
 import hashlib
+import io
 import json
+import mmap
+import struct
+import threading
 import time
-from pathlib import Path
-from typing import Any, Dict, Optional
-
-import diskcache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import IO, Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
 
+from .body import ResponseBody
+from .cachebackend import CacheBackend, cache_backend
 from .config import CacheConfig
 from .models import APIResponse
 
+try:
+    import zstandard
+except ImportError:  # optional, pip install swagcli[zstd]
+    zstandard = None
+
+
+def _header(headers: Dict[str, str], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def cache_control(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Directives of the Cache-Control header, e.g. {"max-age": "60",
+    "private": None}"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (_header(headers, "Cache-Control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') if value else None
+    return directives
+
+
+def _seconds(value: Optional[str], default: float) -> float:
+    return int(value) if value is not None and value.isdigit() else default
+
+
+# Headers that describe the connection or the transfer rather than the
+# response, or that must not be replayed from a cache
+_UNCACHED_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "transfer-encoding",
+    "content-encoding",
+    "content-length",
+    "set-cookie",
+    "trailer",
+    "upgrade",
+}
+
+
+def _cacheable_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _UNCACHED_HEADERS}
+
+
+def resource(url: str) -> str:
+    """The resource of `url` that its cache entries are indexed by: scheme
+    and host in lower case and the path without query or trailing slash,
+    e.g. "https://api.example.com/items/3" """
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+_MAGIC = b"SWC1"
+_PREFIX = struct.Struct("!4sI")  # magic, header length
+_CODECS = {"none": 0, "gzip": 1, "zstd": 2}
+
+
+def _compress(body: bytes, codec: int) -> bytes:
+    if codec == _CODECS["gzip"]:
+        return gzip.compress(body, compresslevel=6)
+    if codec == _CODECS["zstd"]:
+        return zstandard.ZstdCompressor().compress(body)
+    return body
+
+
+def _decompress(body: Union[bytes, memoryview], codec: int) -> bytes:
+    if codec == _CODECS["gzip"]:
+        return gzip.decompress(body)
+    if codec == _CODECS["zstd"]:
+        return zstandard.ZstdDecompressor().decompress(body)
+    return bytes(body)
+
+
+def _digest(chunks: Iterable[Union[bytes, memoryview]], codec: int) -> str:
+    """Content address of a stored body, compression included: gzip output
+    differs between runs, so the hash is of the uncompressed bytes"""
+    digest = hashlib.sha256(bytes([codec]))
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _mapped(file: IO[bytes]) -> Optional[mmap.mmap]:
+    """A read-only map of a cache file, None and closed if it is empty"""
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        file.close()
+        return None
+
+
+class _Chain:
+    """Reader over byte strings and files, one after the other, for streaming
+    a record into a backend without joining it in memory"""
+
+    def __init__(self, *parts: Union[bytes, memoryview, IO[bytes]]) -> None:
+        self._parts = list(parts)
+
+    def read(self, size: int = -1) -> bytes:
+        while self._parts:
+            part = self._parts[0]
+            if isinstance(part, (bytes, memoryview)):
+                if len(part):
+                    length = len(part) if size < 0 else size
+                    self._parts[0] = part[length:]
+                    return bytes(part[:length])
+            else:
+                chunk = part.read(size)
+                if chunk:
+                    return chunk
+            self._parts.pop(0)
+        return b""
+
+
+class CacheRecord:
+    """A response as stored in the cache: a prefix, a small JSON header with
+    the status, cacheable headers and timestamps, then the response body.
+
+    JSON and text bodies are encoded and compressed above a size threshold.
+    Bodies that were too large to decode (a ResponseBody) are streamed in
+    and out as they are.
+
+    Decoding a record only parses the header, the body is decompressed and
+    parsed when `response()` is called. Records stored as files are read
+    through a read-only memory map, and raw bodies are returned as a
+    ResponseBody over the cache file, so they are never copied.
+
+    Bodies of `dedup_threshold` bytes and more get a `digest` of their
+    content. Stored with `encode(external=True)` the record is only the
+    header, naming the digest, and the body is stored as a blob that
+    `attach` points a decoded record at.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: Dict[str, str],
+        elapsed: float,
+        kind: str,
+        body: Union[bytes, memoryview, IO[bytes]],
+        codec: int = 0,
+        stored_at: float = 0.0,
+        fresh_until: float = 0.0,
+        size: Optional[int] = None,
+        content_type: Optional[str] = None,
+        charset: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.elapsed = elapsed
+        self.kind = kind  # "json", "text" or "raw"
+        self.body = body
+        self.codec = codec
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.size = size  # of raw bodies
+        self.content_type = content_type
+        self.charset = charset
+        self.digest = digest
+        # The cache file of a decoded record and the offset of the body in it
+        self.file: Optional[IO[bytes]] = None
+        self.offset = 0
+
+    @classmethod
+    def from_response(
+        cls,
+        response: APIResponse,
+        compression: str = "none",
+        threshold: int = 0,
+        dedup_threshold: Optional[int] = None,
+    ) -> "CacheRecord":
+        """`dedup_threshold` None computes no digest"""
+        headers = _cacheable_headers(response.headers)
+        if isinstance(response.data, ResponseBody):
+            digest = None
+            if dedup_threshold is not None and response.data.size >= dedup_threshold:
+                reader = response.data.open()
+                digest = _digest(iter(lambda: reader.read(1024 * 1024), b""), 0)
+            return cls(
+                response.status_code,
+                headers,
+                response.elapsed,
+                "raw",
+                response.data.open(),
+                size=response.data.size,
+                content_type=response.data.content_type,
+                charset=response.data.charset,
+                digest=digest,
+            )
+        if isinstance(response.data, str):
+            kind, body = "text", response.data.encode()
+        else:
+            kind = "json"
+            body = json.dumps(response.data, separators=(",", ":")).encode()
+        codec = _CODECS[compression] if len(body) > threshold else 0
+        if codec == _CODECS["zstd"] and zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        digest = None
+        if dedup_threshold is not None and len(body) >= dedup_threshold:
+            digest = _digest([body], codec)
+        return cls(
+            response.status_code,
+            headers,
+            response.elapsed,
+            kind,
+            _compress(body, codec),
+            codec,
+            digest=digest,
+        )
+
+    @classmethod
+    def decode(
+        cls, value: Union[bytes, memoryview, mmap.mmap]
+    ) -> Optional["CacheRecord"]:
+        """The record, None if `value` is not a record. The body is a view of
+        `value`, empty if the record names a blob holding it."""
+        view = memoryview(value)
+        if view[: len(_MAGIC)] != _MAGIC:
+            return None
+        _, length = _PREFIX.unpack_from(view)
+        start = _PREFIX.size + length
+        header = json.loads(bytes(view[_PREFIX.size : start]))
+        record = cls(body=view[start:], **header)
+        record.offset = start
+        return record
+
+    @classmethod
+    def read(cls, value: Any) -> Optional["CacheRecord"]:
+        """The record in `value` as returned by CacheBackend.get, bytes or
+        an open cache file"""
+        if isinstance(value, bytes):
+            return cls.decode(value)
+        if not isinstance(value, io.BufferedReader):  # written by an older version
+            return None
+        mapping = _mapped(value)
+        if mapping is None:
+            return None
+        record = cls.decode(mapping)
+        if record is not None and record.kind == "raw":
+            record.file = value
+        else:
+            value.close()
+        return record
+
+    def attach(self, blob: Any) -> bool:
+        """Point the body of a record stored without it at `blob`, as
+        returned by CacheBackend.get_blob. False if the blob is gone."""
+        if isinstance(blob, bytes):
+            self.body = memoryview(blob)
+        elif isinstance(blob, io.BufferedReader):
+            mapping = _mapped(blob)
+            if mapping is None:
+                return False
+            self.body = memoryview(mapping)
+            if self.kind == "raw":
+                self.file = blob
+            else:
+                blob.close()
+        else:
+            return False
+        self.offset = 0
+        return True
+
+    def _header(self, external: bool = False) -> bytes:
+        header = {
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "elapsed": self.elapsed,
+            "kind": self.kind,
+            "codec": self.codec,
+            "stored_at": self.stored_at,
+            "fresh_until": self.fresh_until,
+        }
+        if self.kind == "raw":
+            header.update(
+                size=self.size, content_type=self.content_type, charset=self.charset
+            )
+        if external:
+            header["digest"] = self.digest
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        return _PREFIX.pack(_MAGIC, len(encoded)) + encoded
+
+    def detach(self) -> None:
+        """Copy a body that is a view of a mapped cache file into memory,
+        which unmaps the file and releases its descriptor"""
+        if not self.streamed and not isinstance(self.body, bytes):
+            self.body = bytes(self.body)  # type: ignore[arg-type]
+
+    @property
+    def streamed(self) -> bool:
+        """Whether the record is written with reader() rather than encode()"""
+        return self.kind == "raw"
+
+    def encode(self, external: bool = False) -> bytes:
+        """The record, only its header if the body is stored as a blob"""
+        if external:
+            return self._header(external=True)
+        return self._header() + bytes(self.body)  # type: ignore[arg-type]
+
+    def reader(self) -> _Chain:
+        return _Chain(self._header(), self.body)
+
+    def response(self) -> APIResponse:
+        data: Any
+        if self.kind == "raw":
+            if self.file is not None:
+                data = ResponseBody.mapped(
+                    self.file,
+                    self.offset,
+                    self.size or 0,
+                    self.content_type,
+                    self.charset,
+                )
+            else:  # small enough to be kept in the database
+                data = ResponseBody(-1, self.content_type, self.charset)
+                data._write(bytes(self.body))  # type: ignore[arg-type]
+        else:
+            body = _decompress(self.body, self.codec)  # type: ignore[arg-type]
+            data = json.loads(body) if self.kind == "json" else body.decode()
+        return APIResponse.model_construct(
+            status_code=self.status_code,
+            data=data,
+            headers=dict(self.headers),
+            elapsed=self.elapsed,
+            timings={},
+        )
+
+
+class CacheEntry:
+    """A cached response, fresh until `fresh_until` and revalidated with its
+    ETag or Last-Modified afterwards.
+
+    A stale response may still be served while it is refreshed in the
+    background until `revalidate_until`, and when the backend fails until
+    `error_until`. The response is decoded from its record on first access.
+    """
+
+    def __init__(
+        self,
+        record: CacheRecord,
+        revalidate_until: Optional[float] = None,
+        error_until: Optional[float] = None,
+    ):
+        self.record = record
+        self.revalidate_until = revalidate_until or record.fresh_until
+        self.error_until = error_until or record.fresh_until
+        self._response: Optional[APIResponse] = None
+
+    @property
+    def response(self) -> APIResponse:
+        return self.decode()
+
+    def decode(self) -> APIResponse:
+        """The response, decoded from the record unless it already was"""
+        if self._response is None:
+            self._response = self.record.response()
+        return self._response
+
+    def copy(self) -> "CacheEntry":
+        """An entry over the same record that decodes its own response, so
+        callers modifying one response do not affect the others"""
+        return CacheEntry(self.record, self.revalidate_until, self.error_until)
+
+    @property
+    def stored_at(self) -> float:
+        return self.record.stored_at
+
+    @property
+    def fresh_until(self) -> float:
+        return self.record.fresh_until
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    @property
+    def etag(self) -> Optional[str]:
+        return _header(self.record.headers, "ETag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return _header(self.record.headers, "Last-Modified")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class MemoryTier:
+    """In-process LRU of entries, bounded by entry count and by the size of
+    their encoded records.
+
+    Entries keep the expiry time of the disk entry they mirror, so an entry
+    is never served from memory after the disk tier would have dropped it.
+    Thread-safe: AsyncCache reads it on the event loop while its I/O thread
+    promotes disk hits into it.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, CacheEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return entry[2].copy()
+
+    def set(self, key: str, entry: CacheEntry, expires_at: float, size: int) -> None:
+        with self._lock:
+            self._pop(key)
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return
+            self._entries[key] = (expires_at, size, entry)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
 
 class Cache:
-    def __init__(self, config: CacheConfig):
+    """Response cache with an in-process LRU in front of a CacheBackend,
+    diskcache by default.
+
+    Writes go to both tiers. Reads are served from memory when possible and
+    disk hits are promoted to memory. The memory tier keeps encoded records,
+    each hit decodes a response of its own.
+
+    With `http_semantics` the freshness of a response comes from its
+    Cache-Control and Expires headers. Stale entries with an ETag or
+    Last-Modified are kept for `stale_ttl` seconds so that `lookup` can
+    return them for revalidation. The stale-while-revalidate and
+    stale-if-error windows come from the config and, with `http_semantics`,
+    from the Cache-Control directives of the same names.
+
+    The backend holds at most `max_size` entries and `max_bytes` bytes.
+    When a write exceeds either limit, expired entries are removed and then
+    entries are evicted in `eviction_policy` order down to 90% of the
+    limits, so evictions happen in batches rather than on every write.
+    Entries in the memory tier are evicted last: their disk access times
+    and counts miss the hits served from memory.
+
+    Entries are tagged with their resource (see `resource`), and the
+    backend's tag index doubles as a path index: `invalidate` finds the
+    entries of a resource and of every resource below it with range scans,
+    so it costs O(affected entries) however large the cache is.
+
+    With `dedup`, and a backend that supports it, bodies of
+    `dedup_threshold` bytes and more are stored once per content as blobs
+    that entries reference, and a disk hit reads the entry and its blob.
+    Entries whose blob is gone are misses.
+    """
+
+    def __init__(self, config: CacheConfig, backend: Optional[CacheBackend] = None):
+        """`backend` replaces the one selected by `config.backend`"""
         self.config = config
-        self.cache = diskcache.Cache(config.storage_path)
-        self.config.storage_path.mkdir(parents=True, exist_ok=True)
+        self.backend = backend if backend is not None else cache_backend(config)
+        self.memory = MemoryTier(config.memory_entries, config.memory_bytes)
+        # With offload_io the counters are updated from the loop and the I/O
+        # thread alike
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Counted by APIClient through the record_* methods
+        self.background_refreshes = 0
+        self.stale_if_error_hits = 0
 
-    def _get_cache_key(
+    def key_for(
         self,
         method: str,
         url: str,
         params: Optional[Dict] = None,
         data: Optional[Dict] = None,
     ) -> str:
+        """The key a request is stored under"""
         key_parts = [method, url]
         if params:
             key_parts.append(json.dumps(params, sort_keys=True))
@@ -30,33 +553,147 @@ class Cache:
             key_parts.append(json.dumps(data, sort_keys=True))
         return hashlib.sha256("|".join(key_parts).encode()).hexdigest()
 
-    def get(
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_background_refresh(self) -> None:
+        self._count("background_refreshes")
+
+    def record_stale_if_error(self) -> None:
+        self._count("stale_if_error_hits")
+
+    def _lifetime(self, headers: Dict[str, str], now: float) -> Optional[float]:
+        """Seconds the response stays fresh, None if it must not be stored"""
+        if not self.config.http_semantics:
+            return self.config.ttl
+        directives = cache_control(headers)
+        if "no-store" in directives:
+            return None
+        if "private" in directives and self.config.shared:
+            return None
+        if "no-cache" in directives:
+            return 0
+        max_age = directives.get("max-age")
+        if max_age is not None and max_age.isdigit():
+            return int(max_age) - _seconds(_header(headers, "Age"), 0)
+        expires = _header(headers, "Expires")
+        if expires is not None:
+            # An invalid date, such as "0", means already expired
+            expires_at = _http_date(expires) or 0
+            date = _http_date(_header(headers, "Date")) or now
+            return expires_at - date
+        return self.config.ttl
+
+    def lookup(
         self,
         method: str,
         url: str,
         params: Optional[Dict] = None,
         data: Optional[Dict] = None,
-    ) -> Optional[APIResponse]:
+    ) -> Optional[CacheEntry]:
+        """The cached entry, fresh or stale, or None"""
         if not self.config.enabled:
             return None
 
-        cache_key = self._get_cache_key(method, url, params, data)
-        cached_data = self.cache.get(cache_key)
+        cache_key = self.key_for(method, url, params, data)
+        entry = self._memory_lookup(cache_key)
+        if entry is not None:
+            return entry
 
-        if cached_data is None:
+        value = self.backend.get(cache_key)
+        if value is None:
+            self._count("misses")
             return None
 
-        timestamp, data = cached_data
-        if time.time() - timestamp > self.config.ttl:
-            self.cache.delete(cache_key)
+        record = CacheRecord.read(value)
+        if record is None:
+            self.backend.delete([cache_key])
+            self._count("misses")
             return None
-
-        # Reconstruct APIResponse from dict
-        if isinstance(data, dict) and all(
-            k in data for k in ("status_code", "data", "headers", "elapsed")
+        if record.digest is not None and not record.attach(
+            self.backend.get_blob(record.digest)
         ):
-            return APIResponse(**data)
-        return None
+            # Another process replaced the entry and released its blob
+            # since `get`, deleting it here would drop the new one
+            self._count("misses")
+            return None
+
+        entry, expires_at = self._entry(record)
+        if time.time() > expires_at:
+            self.backend.delete([cache_key])
+            self._count("misses")
+            return None
+
+        if not record.streamed:
+            # Kept like a record that was just set: an encoded copy of the
+            # body, not a map of the file holding a descriptor per entry
+            record.detach()
+            self.memory.set(
+                cache_key, entry, expires_at, record.offset + len(record.body)
+            )
+        if entry.fresh:
+            self._count("disk_hits")
+        else:
+            self._count("stale_hits")
+        return entry
+
+    def peek(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        data: Optional[Dict] = None,
+    ) -> Optional[CacheEntry]:
+        """The entry if the memory tier holds it, without touching the
+        backend. A None is not counted as a miss, `lookup` follows up."""
+        if not self.config.enabled:
+            return None
+        return self._memory_lookup(self.key_for(method, url, params, data))
+
+    def _memory_lookup(self, cache_key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(cache_key)
+        if entry is not None:
+            if entry.fresh:
+                self._count("memory_hits")
+            else:
+                self._count("stale_hits")
+        return entry
+
+    def _entry(self, record: CacheRecord) -> Tuple[CacheEntry, float]:
+        """The entry and when it is dropped. Stale entries are kept for the
+        stale-while-revalidate and stale-if-error windows, and with
+        http_semantics for revalidation if they have validators."""
+        stale_while_revalidate = self.config.stale_while_revalidate
+        stale_if_error = self.config.stale_if_error
+        if self.config.http_semantics:
+            directives = cache_control(record.headers)
+            stale_while_revalidate = _seconds(
+                directives.get("stale-while-revalidate"), stale_while_revalidate
+            )
+            stale_if_error = _seconds(directives.get("stale-if-error"), stale_if_error)
+        fresh_until = record.fresh_until
+        entry = CacheEntry(
+            record,
+            fresh_until + stale_while_revalidate,
+            fresh_until + stale_if_error,
+        )
+        keep = max(stale_while_revalidate, stale_if_error)
+        if self.config.http_semantics and (entry.etag or entry.last_modified):
+            keep = max(keep, self.config.stale_ttl)
+        return entry, fresh_until + keep
+
+    def get(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        data: Optional[Dict] = None,
+    ) -> Optional[APIResponse]:
+        entry = self.lookup(method, url, params, data)
+        if entry is None or not entry.fresh:
+            return None
+        return entry.response
 
     def set(
         self,
@@ -69,14 +706,279 @@ class Cache:
         if not self.config.enabled:
             return
 
-        cache_key = self._get_cache_key(method, url, params, request_data)
-        # Store as dict using model_dump() for Pydantic v2 compatibility
-        self.cache.set(
-            cache_key, (time.time(), api_response.model_dump()), expire=self.config.ttl
+        cache_key = self.key_for(method, url, params, request_data)
+        self._store(
+            cache_key,
+            CacheRecord.from_response(
+                api_response,
+                self.config.compression,
+                self.config.compression_threshold,
+                (
+                    self.config.dedup_threshold
+                    if self.config.dedup and self.backend.dedup
+                    else None
+                ),
+            ),
+            resource(url),
         )
 
+    def _store(self, cache_key: str, record: CacheRecord, tag: str) -> None:
+        timestamp = time.time()
+        lifetime = self._lifetime(record.headers, timestamp)
+        if lifetime is None:
+            self.memory.delete(cache_key)
+            self.backend.delete([cache_key])
+            return
+        record.stored_at = timestamp
+        record.fresh_until = timestamp + lifetime
+        entry, expires_at = self._entry(record)
+        if expires_at <= timestamp:
+            return
+        blob = None
+        if record.digest is not None and self.config.dedup and self.backend.dedup:
+            blob = (record.digest, record.body)
+        if record.streamed:
+            # Raw bodies are copied from their file into a cache file, and
+            # never kept in the memory tier
+            self.memory.delete(cache_key)
+            value: Any = record.encode(external=True) if blob else record.reader()
+            self.backend.set(cache_key, value, expires_at - timestamp, tag, blob)
+        else:
+            value = record.encode(external=blob is not None)
+            self.backend.set(cache_key, value, expires_at - timestamp, tag, blob)
+            size = len(value) + (len(record.body) if blob else 0)  # type: ignore[arg-type]
+            self.memory.set(cache_key, entry, expires_at, size)
+        self._evict()
+
+    def _evict(self) -> None:
+        count, size = self.backend.usage()
+        if count <= self.config.max_size and size <= self.config.max_bytes:
+            return
+        self._count("expirations", self.backend.expire())
+        count, size = self.backend.usage()
+        excess_count = count - int(self.config.max_size * 0.9)
+        excess_bytes = size - int(self.config.max_bytes * 0.9)
+
+        victims, hot = [], []
+        order = self.backend.eviction_order()
+        for key, entry_size in order:
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            if key in self.memory:
+                hot.append((key, entry_size))
+                continue
+            victims.append(key)
+            excess_count -= 1
+            excess_bytes -= entry_size
+        order.close()  # type: ignore[attr-defined]
+        for key, entry_size in hot:
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            victims.append(key)
+            excess_count -= 1
+            excess_bytes -= entry_size
+
+        self.backend.delete(victims)
+        for key in victims:
+            self.memory.delete(key)
+        self._count("evictions", len(victims))
+
+    def revalidate(
+        self,
+        method: str,
+        url: str,
+        entry: CacheEntry,
+        not_modified: APIResponse,
+        params: Optional[Dict] = None,
+        request_data: Optional[Dict] = None,
+    ) -> APIResponse:
+        """Refresh `entry` from a 304 response and return the cached response
+        with the updated headers"""
+        self._count("revalidations")
+        updated = _cacheable_headers(not_modified.headers)
+        headers = {
+            k: v for k, v in entry.record.headers.items() if _header(updated, k) is None
+        }
+        headers.update(updated)
+        # The body is kept as it is, without decoding it
+        record = copy.copy(entry.record)
+        record.headers = headers
+        record.elapsed = not_modified.elapsed
+        if self.config.enabled:
+            self._store(
+                self.key_for(method, url, params, request_data),
+                record,
+                resource(url),
+            )
+        response = CacheEntry(record).response
+        response.revalidated = True
+        return response
+
+    def invalidate(self, urls: Iterable[str]) -> int:
+        """Drop the entries of the resources of `urls`, of the resources
+        below them and of their parent collections, e.g. for /items/3 the
+        entries of /items/3?fields=name, /items/3/tags and /items but not
+        /items/4. Returns the number of entries dropped."""
+        if not self.config.enabled:
+            return 0
+        tags = {resource(url) for url in urls}
+        parents = {tag.rsplit("/", 1)[0] for tag in tags if urlsplit(tag).path}
+        keys = set(self.backend.tagged(tags | parents, tags))
+        for key in keys:
+            self.memory.delete(key)
+        dropped = self.backend.delete(list(keys))
+        self._count("invalidations", dropped)
+        return dropped
+
     def clear(self) -> None:
-        self.cache.clear()
+        self.memory.clear()
+        self.backend.clear()
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts and rates per tier, rates are relative to all lookups,
+        the size of the backend, and how much dedup saves: `dedup_ratio` is
+        the size of the blobs' references over their size"""
+        with self._stats_lock:
+            counts = {
+                counter: getattr(self, counter)
+                for counter in (
+                    "memory_hits",
+                    "disk_hits",
+                    "stale_hits",
+                    "misses",
+                    "revalidations",
+                    "background_refreshes",
+                    "stale_if_error_hits",
+                    "evictions",
+                    "expirations",
+                    "invalidations",
+                )
+            }
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        lookups = hits + counts["stale_hits"] + counts["misses"]
+        entries, size = self.backend.usage()
+        blobs, blob_bytes, referenced = self.backend.blob_usage()
+        return {
+            "lookups": lookups,
+            **counts,
+            "memory_hit_rate": counts["memory_hits"] / lookups if lookups else 0.0,
+            "disk_hit_rate": counts["disk_hits"] / lookups if lookups else 0.0,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "entries": entries,
+            "bytes": size,
+            "blobs": blobs,
+            "blob_bytes": blob_bytes,
+            "dedup_ratio": referenced / blob_bytes if blob_bytes else 1.0,
+        }
 
     def __del__(self):
-        self.cache.close()
+        if hasattr(self, "backend"):  # not if the backend failed to open
+            self.close()
+
+
+_T = TypeVar("_T")
+
+
+class AsyncCache:
+    """Cache interface for the event loop.
+
+    Memory-tier hits are served inline. Everything that reaches the backend,
+    SQLite queries, cache file reads and writes, Redis round trips and the
+    decoding of disk hits, runs on one dedicated thread, so a slow disk
+    delays the requests waiting on the cache rather than every task on the
+    loop. One thread keeps the backend calls in submission order, a lookup
+    queued after a write sees it. With `offload_io` off the calls run
+    inline as before.
+    """
+
+    def __init__(self, cache: Cache) -> None:
+        self.cache = cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, function: Callable[..., _T], *args: Any) -> _T:
+        if not self.cache.config.offload_io:
+            return function(*args)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="swagcli-cache"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    async def lookup(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        data: Optional[Dict] = None,
+    ) -> Optional[CacheEntry]:
+        """See Cache.lookup"""
+        entry = self.cache.peek(method, url, params, data)
+        if entry is not None or not self.cache.config.enabled:
+            return entry
+        return await self._run(self._lookup, method, url, params, data)
+
+    def _lookup(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict],
+        data: Optional[Dict],
+    ) -> Optional[CacheEntry]:
+        entry = self.cache.lookup(method, url, params, data)
+        if entry is not None:
+            entry.decode()  # on the I/O thread rather than on the loop
+        return entry
+
+    async def set(
+        self,
+        method: str,
+        url: str,
+        api_response: APIResponse,
+        params: Optional[Dict] = None,
+        request_data: Optional[Dict] = None,
+    ) -> None:
+        """See Cache.set"""
+        if self.cache.config.enabled:
+            await self._run(
+                self.cache.set, method, url, api_response, params, request_data
+            )
+
+    async def revalidate(
+        self,
+        method: str,
+        url: str,
+        entry: CacheEntry,
+        not_modified: APIResponse,
+        params: Optional[Dict] = None,
+        request_data: Optional[Dict] = None,
+    ) -> APIResponse:
+        """See Cache.revalidate"""
+        return await self._run(
+            self.cache.revalidate,
+            method,
+            url,
+            entry,
+            not_modified,
+            params,
+            request_data,
+        )
+
+    async def invalidate(self, urls: Iterable[str]) -> int:
+        """See Cache.invalidate"""
+        if not self.cache.config.enabled:
+            return 0
+        return await self._run(self.cache.invalidate, list(urls))
+
+    async def close(self) -> None:
+        """Wait for the I/O thread to finish, a later call starts a new one.
+        The wait runs off the event loop, queued writes can take a while."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, executor.shutdown)
@@ -0,0 +1,553 @@
+"""
+Storage backends of the response cache.
+
+`Cache` keeps its encoded records in a CacheBackend. DiskBackend stores
+them with diskcache on the local machine. RedisBackend stores them in a
+Redis-protocol server, so that processes and machines share one cache.
+Backends store values under string keys, each with an expiry and a tag
+(the resource of the entry). They also find keys by tag, either exactly or
+by prefix, and list keys in eviction order. Eviction itself is decided by
+`Cache`. Backends with `dedup` also store bodies as blobs addressed by
+their content hash, once however many entries reference them.
+"""
+
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import unquote, urlsplit
+
+import diskcache
+
+from .config import CacheConfig
+
+Value = Union[bytes, IO[bytes]]
+# A body and the digest it is stored under, the body is bytes, a view or a
+# reader that is streamed in
+Blob = Tuple[str, Union[bytes, memoryview, IO[bytes]]]
+
+
+class CacheBackend(ABC):
+    """Storage of cache values, bytes or readable binary files."""
+
+    # Whether `set` takes a blob, and `get_blob` and `blob_usage` work
+    dedup = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Value]:
+        """The value, bytes or an open file for large values, None if
+        missing or expired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        value: Value,
+        expire: float,
+        tag: str,
+        blob: Optional[Blob] = None,
+    ) -> None:
+        """Store `value`, bytes or a reader that is streamed in, for
+        `expire` seconds. The entry references `blob`, whose body is only
+        stored if no other entry references its digest; the blob is dropped
+        with the last entry referencing it."""
+        raise NotImplementedError
+
+    def get_blob(self, digest: str) -> Optional[Value]:
+        """The body stored under `digest`, like `get`"""
+        raise NotImplementedError
+
+    def blob_usage(self) -> Tuple[int, int, int]:
+        """Number of blobs, their total size and the total size of the
+        references to them, i.e. what storing a copy per entry would take"""
+        return 0, 0, 0
+
+    @abstractmethod
+    def delete(self, keys: Sequence[str]) -> int:
+        """Remove `keys`, returns how many were stored"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def tagged(self, tags: Iterable[str], prefixes: Iterable[str]) -> List[str]:
+        """Keys tagged with one of `tags` or with a tag below one of
+        `prefixes`, i.e. starting with "<prefix>/" """
+        raise NotImplementedError
+
+    @abstractmethod
+    def usage(self) -> Tuple[int, int]:
+        """Number of entries and their total size in bytes"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def expire(self) -> int:
+        """Remove expired entries, returns how many"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def eviction_order(self) -> Iterator[Tuple[str, int]]:
+        """Keys and sizes of all entries, first to evict first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return None
+
+
+# diskcache eviction policy that keeps the columns we order by up to date,
+# and that order, oldest victims first
+_EVICTION_POLICIES = {
+    "lru": ("least-recently-used", "access_time"),
+    "lfu": ("least-frequently-used", "access_count, access_time"),
+    "ttl": ("none", "expire_time IS NULL, expire_time"),
+}
+
+
+class _SizedDisk(diskcache.Disk):
+    """Reports the size of values stored inside the database too, so that
+    diskcache's running "size" total covers every entry, not only the ones
+    stored as files"""
+
+    def store(self, value: Any, read: bool, key: Any = diskcache.core.UNKNOWN):
+        size, mode, filename, db_value = super().store(value, read, key)
+        if filename is None and isinstance(db_value, (bytes, memoryview, str)):
+            size = len(db_value)
+        return size, mode, filename, db_value
+
+
+# Blob reference counts, and the blob each entry references, in tables
+# next to diskcache's own
+_BLOB_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS SwagcliBlob ("
+    " digest TEXT PRIMARY KEY, size INTEGER NOT NULL, refs INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS SwagcliBlobRef ("
+    " key TEXT PRIMARY KEY, digest TEXT NOT NULL)",
+)
+_BLOB_PREFIX = "blob:"
+
+
+class DiskBackend(CacheBackend):
+    """diskcache under `config.storage_path`.
+
+    Values of 32 KiB and more, and every streamed value, are stored as
+    files and returned open. diskcache's tag index serves `tagged` with
+    range scans, and `eviction_policy` picks the column that orders
+    evictions.
+
+    Blobs are diskcache values too, untagged and without expiry, under
+    "blob:<digest>". Two tables in the same database count their
+    references, and are updated in the transaction that writes or deletes
+    the entries, so processes sharing the directory keep them in sync.
+    Entries report their share of the blob they reference as part of their
+    size, so evicting every entry of a blob frees it.
+    """
+
+    dedup = True
+
+    def __init__(self, config: CacheConfig) -> None:
+        policy, self._eviction_order = _EVICTION_POLICIES[config.eviction_policy]
+        # Culling is left to Cache, which also counts it
+        self.cache = diskcache.Cache(
+            config.storage_path,
+            disk=_SizedDisk,
+            eviction_policy=policy,
+            cull_limit=0,
+            tag_index=True,
+        )
+        for statement in _BLOB_SCHEMA:
+            self.cache._sql(statement)
+
+    def get(self, key):
+        return self.cache.get(key, read=True)
+
+    def set(self, key, value, expire, tag, blob=None):
+        with self.cache.transact():
+            self._reference(key, blob)
+            self._put(key, value, expire=expire, tag=tag)
+
+    def _put(self, key: str, value: Any, **kwargs: Any) -> None:
+        if isinstance(value, (bytes, memoryview)):
+            self.cache.set(key, bytes(value), **kwargs)
+        else:
+            self.cache.set(key, value, read=True, **kwargs)
+
+    def _reference(self, key: str, blob: Optional[Blob]) -> None:
+        """Point `key` at `blob`, or at no blob, storing and releasing blobs
+        as their reference counts change"""
+        row = self.cache._sql(
+            "SELECT digest FROM SwagcliBlobRef WHERE key = ?", (key,)
+        ).fetchone()
+        old = row[0] if row else None
+        digest = blob[0] if blob else None
+        if digest == old:
+            return
+        if blob is not None:
+            updated = self.cache._sql(
+                "UPDATE SwagcliBlob SET refs = refs + 1 WHERE digest = ?", (digest,)
+            ).rowcount
+            if not updated:
+                self._put(_BLOB_PREFIX + blob[0], blob[1])
+                (size,) = self.cache._sql(
+                    "SELECT size FROM Cache WHERE key = ?", (_BLOB_PREFIX + blob[0],)
+                ).fetchone()
+                self.cache._sql(
+                    "INSERT INTO SwagcliBlob VALUES (?, ?, 1)", (digest, size)
+                )
+            self.cache._sql(
+                "INSERT OR REPLACE INTO SwagcliBlobRef VALUES (?, ?)", (key, digest)
+            )
+        else:
+            self.cache._sql("DELETE FROM SwagcliBlobRef WHERE key = ?", (key,))
+        if old is not None:
+            self._release([old])
+
+    def _release(self, digests: Iterable[str]) -> None:
+        """Drop one reference per item of `digests`, and the blobs that are
+        no longer referenced"""
+        released: Dict[str, int] = {}
+        for digest in digests:
+            released[digest] = released.get(digest, 0) + 1
+        for digest, count in released.items():
+            self.cache._sql(
+                "UPDATE SwagcliBlob SET refs = refs - ? WHERE digest = ?",
+                (count, digest),
+            )
+            row = self.cache._sql(
+                "SELECT refs FROM SwagcliBlob WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is not None and row[0] <= 0:
+                self.cache._sql("DELETE FROM SwagcliBlob WHERE digest = ?", (digest,))
+                self.cache.delete(_BLOB_PREFIX + digest)
+
+    def _unreference(self, keys: Sequence[str]) -> None:
+        digests = []
+        for key in keys:
+            row = self.cache._sql(
+                "SELECT digest FROM SwagcliBlobRef WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.cache._sql("DELETE FROM SwagcliBlobRef WHERE key = ?", (key,))
+                digests.append(row[0])
+        self._release(digests)
+
+    def get_blob(self, digest):
+        return self.cache.get(_BLOB_PREFIX + digest, read=True)
+
+    def blob_usage(self):
+        count, size, referenced = self.cache._sql(
+            "SELECT COUNT(*), TOTAL(size), TOTAL(size * refs) FROM SwagcliBlob"
+        ).fetchone()
+        return count, int(size), int(referenced)
+
+    def delete(self, keys):
+        with self.cache.transact():
+            self._unreference(keys)
+            return sum(self.cache.delete(key) for key in keys)
+
+    def tagged(self, tags, prefixes):
+        keys = []
+        # diskcache has no public query API, the columns are its schema
+        for tag in tags:
+            cursor = self.cache._sql("SELECT key FROM Cache WHERE tag = ?", (tag,))
+            keys.extend(key for (key,) in cursor)
+        for prefix in prefixes:
+            # "0" sorts right after "/", so the range holds the tags below
+            cursor = self.cache._sql(
+                "SELECT key FROM Cache WHERE tag > ? AND tag < ?",
+                (prefix + "/", prefix + "0"),
+            )
+            keys.extend(key for (key,) in cursor)
+        return keys
+
+    def usage(self):
+        # Counters diskcache keeps updated, the size includes the blobs
+        (blobs,) = self.cache._sql("SELECT COUNT(*) FROM SwagcliBlob").fetchone()
+        return self.cache.reset("count") - blobs, self.cache.reset("size")
+
+    def expire(self):
+        with self.cache.transact():
+            cursor = self.cache._sql(
+                "SELECT SwagcliBlobRef.key FROM SwagcliBlobRef"
+                " JOIN Cache ON Cache.key = SwagcliBlobRef.key"
+                " WHERE expire_time < ?",
+                (time.time(),),
+            )
+            self._unreference([key for (key,) in cursor.fetchall()])
+        return self.cache.expire()
+
+    def eviction_order(self):
+        cursor = self.cache._sql(
+            "SELECT Cache.key, Cache.size"
+            " + COALESCE(SwagcliBlob.size / SwagcliBlob.refs, 0) FROM Cache"
+            " LEFT JOIN SwagcliBlobRef ON SwagcliBlobRef.key = Cache.key"
+            " LEFT JOIN SwagcliBlob ON SwagcliBlob.digest = SwagcliBlobRef.digest"
+            f" WHERE Cache.key NOT LIKE '{_BLOB_PREFIX}%'"
+            f" ORDER BY {self._eviction_order}"
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def clear(self):
+        # One transaction, so no other process sees entries without blobs
+        with self.cache.transact():
+            self.cache.clear()
+            self.cache._sql("DELETE FROM SwagcliBlobRef")
+            self.cache._sql("DELETE FROM SwagcliBlob")
+
+    def close(self):
+        self.cache.close()
+
+
+class RedisError(Exception):
+    """Error reply of a Redis-protocol server"""
+
+
+class RedisConnection:
+    """Minimal client of the Redis protocol (RESP2) on one connection.
+
+    `pipeline` writes a batch of commands at once and then reads all their
+    replies, so a batch costs one round trip. The connection is opened
+    lazily, authenticated and switched to the database of the url
+    (`redis://[[user]:password@]host[:port][/db]`), and shared by threads
+    one pipeline at a time.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"Unsupported Redis url: {url}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file: Optional[IO[bytes]] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._file = sock, sock.makefile("rb")
+        setup: List[Sequence[Any]] = []
+        if self.password:
+            auth = [self.username] if self.username else []
+            setup.append(["AUTH", *auth, self.password])
+        if self.db:
+            setup.append(["SELECT", self.db])
+        if setup:
+            self._execute(setup)
+
+    @staticmethod
+    def _encode(commands: Sequence[Sequence[Any]]) -> bytes:
+        parts = []
+        for command in commands:
+            parts.append(b"*%d\r\n" % len(command))
+            for arg in command:
+                if isinstance(arg, str):
+                    arg = arg.encode()
+                elif not isinstance(arg, (bytes, bytearray, memoryview)):
+                    arg = str(arg).encode()
+                parts.append(b"$%d\r\n" % len(arg))
+                parts.append(arg)
+                parts.append(b"\r\n")
+        return b"".join(parts)
+
+    def _reply(self) -> Any:
+        line = self._file.readline()  # type: ignore[union-attr]
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the Redis server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            if int(rest) < 0:
+                return None
+            return self._file.read(int(rest) + 2)[:-2]  # type: ignore[union-attr]
+        if kind == b"*":
+            if int(rest) < 0:
+                return None
+            return [self._reply() for _ in range(int(rest))]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def _execute(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        self._sock.sendall(self._encode(commands))  # type: ignore[union-attr]
+        # Read every reply before raising, so the next pipeline starts in sync
+        replies = [self._reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Replies to `commands`, sent in one batch"""
+        if not commands:
+            return []
+        with self._lock:
+            # A reused connection may have been closed by the server while
+            # idle, retry once on a new one
+            reused = self._sock is not None
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._execute(commands)
+            except OSError:
+                self.close()
+                if not reused:
+                    raise
+            self._connect()
+            return self._execute(commands)
+
+    def execute(self, *command: Any) -> Any:
+        return self.pipeline([command])[0]
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._file.close()  # type: ignore[union-attr]
+            self._sock.close()
+        self._sock = self._file = None
+
+
+class RedisBackend(CacheBackend):
+    """Values in a Redis-protocol server under `config.redis_namespace`.
+
+    Each value is a string key that expires on its own. Next to it the
+    namespace keeps a hash of entry sizes and tags, a sorted set of
+    "<tag> <key>" members that is range scanned by tag, a sorted set of
+    keys by expiry time, and a running byte total. Writes send all their
+    commands in one pipeline after reading the old entry, and deletes
+    are batched. The server's eviction order is by expiry, whatever the
+    `eviction_policy`, because recency or frequency would cost a write per
+    hit. Streamed values are read into memory before they are sent. The
+    size total is kept by clients, so it may drift when several processes
+    write the same key at the same time. For the same reason there is no
+    dedup: reference counts would drift too, and a blob dropped while still
+    referenced would lose entries.
+    """
+
+    def __init__(self, config: CacheConfig) -> None:
+        self.redis = RedisConnection(config.redis_url, config.redis_timeout)
+        ns = config.redis_namespace
+        self._meta = f"{ns}:meta"
+        self._tags = f"{ns}:tags"
+        self._expiry = f"{ns}:expiry"
+        self._bytes = f"{ns}:bytes"
+        self._prefix = f"{ns}:v:"
+
+    def get(self, key):
+        return self.redis.execute("GET", self._prefix + key)
+
+    def set(self, key, value, expire, tag, blob=None):
+        if not isinstance(value, bytes):
+            value = b"".join(iter(lambda: value.read(1024 * 1024), b""))
+        old = self.redis.execute("HGET", self._meta, key)
+        commands: List[Sequence[Any]] = []
+        if old is not None:
+            old_size, old_tag = old.decode().split(" ", 1)
+            commands.append(["ZREM", self._tags, f"{old_tag} {key}"])
+            commands.append(["INCRBY", self._bytes, -int(old_size)])
+        commands += [
+            ["SET", self._prefix + key, value, "PX", max(1, int(expire * 1000))],
+            ["HSET", self._meta, key, f"{len(value)} {tag}"],
+            ["ZADD", self._tags, 0, f"{tag} {key}"],
+            ["ZADD", self._expiry, time.time() + expire, key],
+            ["INCRBY", self._bytes, len(value)],
+        ]
+        self.redis.pipeline(commands)
+
+    def delete(self, keys):
+        keys = list(keys)
+        if not keys:
+            return 0
+        metas = self.redis.execute("HMGET", self._meta, *keys)
+        stored = [(key, meta.decode()) for key, meta in zip(keys, metas) if meta]
+        commands: List[Sequence[Any]] = [["DEL", *(self._prefix + key for key in keys)]]
+        if stored:
+            size = sum(int(meta.split(" ", 1)[0]) for _, meta in stored)
+            members = [f"{meta.split(' ', 1)[1]} {key}" for key, meta in stored]
+            commands += [
+                ["HDEL", self._meta, *(key for key, _ in stored)],
+                ["ZREM", self._tags, *members],
+                ["ZREM", self._expiry, *(key for key, _ in stored)],
+                ["INCRBY", self._bytes, -size],
+            ]
+        self.redis.pipeline(commands)
+        return len(stored)
+
+    def tagged(self, tags, prefixes):
+        # " " and "!" bound the members of a tag, "/" and "0" those below it
+        commands = [
+            ["ZRANGEBYLEX", self._tags, f"[{tag} ", f"({tag}!"] for tag in tags
+        ] + [
+            ["ZRANGEBYLEX", self._tags, f"[{prefix}/", f"({prefix}0"]
+            for prefix in prefixes
+        ]
+        return [
+            member.decode().rsplit(" ", 1)[1]
+            for members in self.redis.pipeline(commands)
+            for member in members
+        ]
+
+    def usage(self):
+        count, size = self.redis.pipeline([["HLEN", self._meta], ["GET", self._bytes]])
+        return count, int(size or 0)
+
+    def expire(self):
+        expired = self.redis.execute("ZRANGEBYSCORE", self._expiry, "-inf", time.time())
+        return self.delete([key.decode() for key in expired])
+
+    def eviction_order(self):
+        start = 0
+        while True:
+            keys = self.redis.execute("ZRANGE", self._expiry, start, start + 255)
+            if not keys:
+                return
+            keys = [key.decode() for key in keys]
+            metas = self.redis.execute("HMGET", self._meta, *keys)
+            for key, meta in zip(keys, metas):
+                if meta:
+                    yield key, int(meta.decode().split(" ", 1)[0])
+            start += len(keys)
+
+    def clear(self):
+        keys = [key.decode() for key in self.redis.execute("HKEYS", self._meta)]
+        for start in range(0, len(keys), 1000):
+            batch = keys[start : start + 1000]
+            self.redis.execute("DEL", *(self._prefix + key for key in batch))
+        self.redis.execute("DEL", self._meta, self._tags, self._expiry, self._bytes)
+
+    def close(self):
+        self.redis.close()
+
+
+def cache_backend(config: CacheConfig) -> CacheBackend:
+    """The backend selected by `config.backend`"""
+    if config.backend == "redis":
+        return RedisBackend(config)
+    return DiskBackend(config)
@@ -2,8 +2,11 @@
 This is where all the magic happens
 """
 
+import asyncio
 import json
+import os
 import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
@@ -14,12 +17,16 @@ from rich.console import Console
 from rich.panel import Panel
 from typer import Option
 
+from . import daemon
 from .client import APIClient
 from .commandstore import CommandStore
 from .config import Config
 from .models import APIResponse
+from .warm import load_targets, select_targets, warm_cache
 
 app = typer.Typer()
+cache_app = typer.Typer(help="Manage the response cache.")
+app.add_typer(cache_app, name="cache")
 console = Console()
 
 
@@ -37,8 +44,14 @@ class Swagcli:
         self.default_headers = {}
         self.default_data = {}
         self.config_url = url
+        # a daemon only serves calls of a Swagcli built the same way
+        self.fingerprint = daemon.config_fingerprint(url, kwargs)
         self.config = {}
         self.command_store = CommandStore()
+        self.prog_name = kwargs.get("prog_name", None)
+        # reused across requests so keep-alive connections stay warm, this
+        # matters most when running as a daemon
+        self.session = requests.Session()
 
     def _get_config(self):
         if self.config:
@@ -64,8 +77,7 @@ class Swagcli:
             kwargs["auth"] = auth
 
         req = requests.Request(method, url, **kwargs)
-        session = requests.Session()
-        response = session.send(session.prepare_request(req))
+        response = self.session.send(self.session.prepare_request(req))
         return response
 
     @staticmethod
@@ -343,18 +355,42 @@ class Swagcli:
             click.echo(f"Unable to connect to the server: {err}")
         return {"success": False}
 
-    def _start(self):
+    def _build(self):
         for node in self.command_store.iterate():
             if self.command_store.is_root(node):
                 Swagcli._create_root_function(node)
             else:
                 self._create_function(node)
-        self.command_store.root.cmdfunc()  # pylint: disable=not-callable
+
+    def _start(self):
+        self._build()
+        self.command_store.root.cmdfunc(  # pylint: disable=not-callable
+            prog_name=self.prog_name
+        )
+
+    def serve(self, socket_path=None):
+        """
+        Loads the config once and serves commands over a Unix domain socket
+        until shut down, see swagcli.daemon
+        """
+        self._parse_paths()
+        self._build()
+        daemon.SwagcliDaemon(self, socket_path).serve_forever()
 
     def run(self):
         """
-        Start of the program, invokes the click commands
+        Start of the program, invokes the click commands. The invocation is
+        forwarded to a warm daemon when one is serving the same config url,
+        setting SWAGCLI_DAEMON=1 makes this process become that daemon
         """
+        if os.environ.get(daemon.SERVE_ENV):
+            self.serve()
+            return
+        result = daemon.forward(
+            self.config_url, sys.argv[1:], fingerprint=self.fingerprint
+        )
+        if result is not None:
+            daemon.exit_with(result)
         self._parse_paths()
         self._start()
 
@@ -448,6 +484,70 @@ def validate(
         raise typer.Exit(1)
 
 
+@cache_app.command()
+def warm(
+    operations: Optional[Path] = Option(
+        None, help="JSON file listing GET paths and their parameter sets"
+    ),
+    spec: Optional[str] = Option(
+        None, help="Swagger config URL to select GET operations from"
+    ),
+    tag: List[str] = Option([], help="Select operations with this tag"),
+    path_pattern: Optional[str] = Option(
+        None, help="Select operations whose URL matches this regex"
+    ),
+    concurrency: int = Option(8, help="Maximum requests in flight"),
+    rate: float = Option(0.0, help="Maximum requests per second, 0 for none"),
+    base_url: Optional[str] = Option(None, help="Overrides the config base URL"),
+    config_path: Optional[Path] = Option(None, help="Path to config file"),
+) -> None:
+    """Fetch GET operations into the response cache ahead of time."""
+    config = Config.load(config_path)
+    if base_url:
+        config.base_url = base_url
+
+    try:
+        targets = []
+        skipped: List[str] = []
+        if operations:
+            with open(operations) as f:
+                targets += load_targets(json.load(f))
+        if spec:
+            swagcli = Swagcli(spec)
+            swagcli._parse_paths()
+            selected, skipped = select_targets(
+                swagcli.command_store, config.base_url, tag, path_pattern
+            )
+            targets += selected
+        if not operations and not spec:
+            raise ValueError("Pass --operations, --spec or both")
+
+        async def run() -> Dict[str, Any]:
+            async with APIClient(config) as client:
+                return await warm_cache(client, targets, concurrency, rate)
+
+        report = asyncio.run(run())
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1) from e
+
+    for url in skipped:
+        console.print(f"[yellow]Skipped:[/yellow] {url}")
+    for failure in report["failures"]:
+        console.print(f"[red]Failed:[/red] {failure['path']}: {failure['error']}")
+    console.print(
+        Panel(
+            f"{report['operations']} operations, {report['hits']} hits, "
+            f"{report['misses']} misses ({report['revalidated']} revalidated), "
+            f"{report['errors']} errors\n"
+            f"{report['bytes']} bytes fetched in {report['elapsed']:.2f}s",
+            title="Cache warm-up",
+        )
+    )
+    if report["errors"]:
+        raise typer.Exit(1)
+
+
 def main() -> typer.Typer:
     """Main entry point for the CLI."""
     return app
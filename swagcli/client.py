@@ -1,38 +1,101 @@
 import asyncio
+import contextlib
+import hashlib
+import inspect
+import json
+import re
 import time
-from typing import Any, Dict, Optional, Union
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Union
+from urllib.parse import urljoin
 
 import aiohttp
 from rich.console import Console
 from rich.progress import Progress
 
-from .cache import Cache
+from .auth import (
+    UNSIGNED_PAYLOAD,
+    CredentialProvider,
+    StaticCredentials,
+    credential_provider,
+)
+from .body import ResponseBody
+from .cache import AsyncCache, Cache, CacheEntry
+from .concurrency import AdaptiveLimiter, Slot
 from .config import Config
+from .dns import CachingResolver, create_connector, timing_trace
 from .models import APIResponse
 from .plugins import plugin_manager
+from .progress import BatchProgress
+from .transfer import (
+    FileBody,
+    FileBodyPayload,
+    MultipartProtocol,
+    download_file,
+    download_segmented,
+    upload_multipart,
+)
+
+# Methods whose success changes the resource, see Cache.invalidate
+UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Content types aiohttp's response.json() accepts
+JSON_CONTENT_TYPE = re.compile(r"^application/(?:[\w.+-]+?\+)?json")
 
 
 class APIClient:
     def __init__(
         self,
         config: Config,
+        auth: Optional[Any] = None,
     ) -> None:
+        """`auth` is a CredentialProvider or one of the swagcli.auth classes,
+        it replaces the static credentials of `config.auth`."""
         self.config = config
         self.base_url = config.base_url.rstrip("/")
         self.cache = Cache(config.cache)
+        # Backend I/O off the event loop, see AsyncCache
+        self.cache_io = AsyncCache(self.cache)
         self.session: Optional[aiohttp.ClientSession] = None
+        self.resolver: Optional[CachingResolver] = None
         self.console = Console()
+        self.headless = (
+            config.headless
+            if config.headless is not None
+            else not self.console.is_terminal
+        )
+        self._batch: Optional[BatchProgress] = None
+        self.auth: CredentialProvider = (
+            credential_provider(auth)
+            if auth is not None
+            else StaticCredentials(self._get_auth_headers())
+        )
+        self.limiter: Optional[AdaptiveLimiter] = None
+        if config.concurrency.enabled:
+            self.limiter = AdaptiveLimiter(config.concurrency)
+        # Background refreshes of stale cache entries, by cache key
+        self._refreshes: Dict[str, "asyncio.Task[APIResponse]"] = {}
 
     async def __aenter__(self) -> "APIClient":
+        self.resolver = CachingResolver(self.config.dns)
         self.session = aiohttp.ClientSession(
+            connector=create_connector(self.config.dns, self.resolver),
             timeout=aiohttp.ClientTimeout(total=self.config.timeout),
             raise_for_status=True,
+            trace_configs=[timing_trace()],
         )
         return self
 
     async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        # Let refreshes finish so the next process finds the updated entries
+        await asyncio.gather(*list(self._refreshes.values()), return_exceptions=True)
         if self.session:
             await self.session.close()
+        if self.resolver:
+            await self.resolver.close()
+        await self.auth.close()
+        # Refreshes are done, this waits for the writes they queued
+        await self.cache_io.close()
 
     def _get_auth_headers(self) -> Dict[str, str]:
         headers: Dict[str, str] = {}
@@ -60,6 +123,42 @@ class APIClient:
 
         return headers
 
+    async def _request_headers(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        payload_hash: Optional[str] = None,
+    ) -> Dict[str, str]:
+        request_headers = await self.auth.headers(
+            method, url, params, payload_hash=payload_hash
+        )
+        if headers:
+            request_headers.update(headers)
+        return request_headers
+
+    @staticmethod
+    def _decode_json(response: Any, body: ResponseBody) -> Any:
+        """Parses a buffered body like the Content-Length path of `_send`:
+        unexpected content types raise ContentTypeError as aiohttp's
+        response.json() does, while an empty body is "" rather than None,
+        which APIResponse.data cannot hold, as for 304 responses."""
+        if not JSON_CONTENT_TYPE.match(body.content_type or ""):
+            raise aiohttp.ContentTypeError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=(
+                    "Attempt to decode JSON with unexpected mimetype: "
+                    f"{body.content_type}"
+                ),
+                headers=response.headers,
+            )
+        if not body.read_bytes().strip():
+            return ""
+        return body.json()
+
     def _headers_to_dict(self, headers: Any) -> Dict[str, str]:
         # Handle real CIMultiDictProxy
         if hasattr(headers, "items") and not asyncio.iscoroutinefunction(headers.items):
@@ -74,7 +173,40 @@ class APIClient:
         else:
             return {}
 
-    async def _make_request(
+    @contextlib.contextmanager
+    def batch(
+        self,
+        total: Optional[int] = None,
+        description: str = "Requests",
+        render: bool = True,
+    ) -> Iterator[BatchProgress]:
+        """Replace per-request rendering with one aggregated progress display
+        (completed count, rate and error rate) for the requests made inside.
+        """
+        batch = BatchProgress(
+            self.console, total, description, render=render and not self.headless
+        )
+        self._batch = batch
+        try:
+            with batch:
+                yield batch
+        finally:
+            self._batch = None
+
+    async def _make_request(self, method: str, path: str, **kwargs: Any) -> APIResponse:
+        if self._batch is None:
+            return await self._request(method, path, **kwargs)
+
+        batch = self._batch
+        try:
+            response = await self._request(method, path, **kwargs)
+        except Exception:
+            batch.advance(error=True)
+            raise
+        batch.advance(error=response.status_code >= 400)
+        return response
+
+    async def _request(
         self,
         method: str,
         path: str,
@@ -83,25 +215,165 @@ class APIClient:
         headers: Optional[Dict[str, str]] = None,
         show_progress: bool = False,
         use_cache: bool = True,
+        body: Optional[FileBody] = None,
+        memory_limit: Optional[int] = None,
+        background: bool = False,
     ) -> APIResponse:
         if not self.session:
             raise RuntimeError(
                 "Client session not initialized. Use async with context."
             )
 
+        if body is not None and data:
+            raise ValueError("A request has either a file body or JSON data")
+
         url = f"{self.base_url}{path}"
         start_time = time.time()
+        if memory_limit is None:
+            memory_limit = self._memory_limit(method, path)
 
-        # Check cache first
+        # Check cache first, stale entries are revalidated with their ETag or
+        # Last-Modified
+        cache_entry = None
         if use_cache and method.upper() == "GET":
-            cached_response = self.cache.get(method, url, params)
-            if cached_response:
-                return cached_response
+            cache_entry = await self.cache_io.lookup(method, url, params)
+            if cache_entry is not None and not background:
+                if cache_entry.fresh:
+                    return cache_entry.response
+                if time.time() < cache_entry.revalidate_until and self._refresh(
+                    method, path, url, params, headers, memory_limit
+                ):
+                    return cache_entry.response
+            if cache_entry is not None:
+                headers = {**cache_entry.conditional_headers(), **(headers or {})}
+
+        try:
+            return await self._fetch(
+                method,
+                url,
+                params,
+                data,
+                headers,
+                show_progress,
+                use_cache,
+                body,
+                memory_limit,
+                start_time,
+                cache_entry,
+                render=not background,
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if (
+                cache_entry is not None
+                and not background
+                and time.time() < cache_entry.error_until
+            ):
+                self.cache.record_stale_if_error()
+                return cache_entry.response
+            raise
+
+    async def prefetch(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        throttle: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> Optional[APIResponse]:
+        """Fetch a GET response into the cache unless a fresh one is cached.
+
+        Returns the fetched response, None on a cache hit. Stale entries are
+        revalidated rather than served, nothing is rendered. `throttle` is
+        awaited before a request is sent, hits do not wait for it.
+        """
+        if not self.session:
+            raise RuntimeError(
+                "Client session not initialized. Use async with context."
+            )
+
+        url = f"{self.base_url}{path}"
+        cache_entry = await self.cache_io.lookup("GET", url, params)
+        if cache_entry is not None:
+            if cache_entry.fresh:
+                return None
+            headers = {**cache_entry.conditional_headers(), **(headers or {})}
+        if throttle is not None:
+            await throttle()
+        return await self._fetch(
+            "GET",
+            url,
+            params,
+            None,
+            headers,
+            False,
+            True,
+            None,
+            self._memory_limit("GET", path),
+            time.time(),
+            cache_entry,
+            render=False,
+        )
+
+    def _refresh(
+        self,
+        method: str,
+        path: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        memory_limit: Optional[int],
+    ) -> bool:
+        """Refresh a stale cache entry in the background, one request per
+        entry. False if `cache.max_refreshes` refreshes are already running."""
+        key = self.cache.key_for(method, url, params)
+        if key in self._refreshes:
+            return True
+        if len(self._refreshes) >= self.config.cache.max_refreshes:
+            return False
+
+        def done(task: "asyncio.Task[APIResponse]") -> None:
+            self._refreshes.pop(key, None)
+            # A failed refresh leaves the stale entry in place
+            if not task.cancelled():
+                task.exception()
+
+        task = asyncio.ensure_future(
+            self._request(
+                method,
+                path,
+                params=params,
+                headers=headers,
+                memory_limit=memory_limit,
+                background=True,
+            )
+        )
+        task.add_done_callback(done)
+        self._refreshes[key] = task
+        self.cache.record_background_refresh()
+        return True
 
+    async def _fetch(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        data: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        show_progress: bool,
+        use_cache: bool,
+        body: Optional[FileBody],
+        memory_limit: Optional[int],
+        start_time: float,
+        cache_entry: Optional[CacheEntry],
+        render: bool = True,
+    ) -> APIResponse:
         # Execute pre-request hooks
         hook_results = plugin_manager.execute_plugin_hook(
             "on_request", method, url, params, data
         )
+        hook_results = [
+            await result if inspect.isawaitable(result) else result
+            for result in hook_results
+        ]
 
         # Process hook results
         files = None
@@ -109,164 +381,343 @@ class APIClient:
             if isinstance(result, dict) and "files" in result:
                 files = result["files"]
 
-        # Prepare headers
-        request_headers = self._get_auth_headers()
-        if headers:
-            request_headers.update(headers)
+        # Each attempt sends an open file from where the first one started
+        body_offset = None
+        if body is not None and not isinstance(body, (str, Path)):
+            body_offset = body.tell()
+        # Signers hash the exact bytes sent, so JSON is encoded here rather
+        # than by aiohttp. File and form bodies are streamed and sent unsigned.
+        payload, payload_hash = None, None
+        if body is not None or files:
+            payload_hash = UNSIGNED_PAYLOAD
+        elif data is not None:
+            payload = json.dumps(data).encode()
+            payload_hash = hashlib.sha256(payload).hexdigest()
 
         for attempt in range(self.config.max_retries):
             try:
-                if show_progress:
-                    with Progress():
-                        if files:
-                            # Handle file upload
-                            form_data = aiohttp.FormData()
-                            if data:
-                                for key, value in data.items():
-                                    if key not in files:
-                                        form_data.add_field(key, value)
-
-                            for key, (filename, content, content_type) in files.items():
-                                form_data.add_field(
-                                    key,
-                                    content,
-                                    filename=filename,
-                                    content_type=content_type,
-                                )
-
-                            async with self.session.request(
-                                method,
-                                url,
-                                params=params,
-                                data=form_data,
-                                headers=request_headers,
-                                ssl=self.config.verify_ssl,
-                            ) as response:
-                                response_data = await response.json()
-                                elapsed = time.time() - start_time
-
-                                api_response = APIResponse(
-                                    status_code=getattr(
-                                        response,
-                                        "status",
-                                        getattr(response, "status_code", 200),
-                                    ),
-                                    data=response_data,
-                                    headers=self._headers_to_dict(response.headers),
-                                    elapsed=elapsed,
-                                )
-                        else:
-                            # Regular request
-                            async with self.session.request(
-                                method,
-                                url,
-                                params=params,
-                                json=data,
-                                headers=request_headers,
-                                ssl=self.config.verify_ssl,
-                            ) as response:
-                                response_data = await response.json()
-                                elapsed = time.time() - start_time
-
-                                api_response = APIResponse(
-                                    status_code=getattr(
-                                        response,
-                                        "status",
-                                        getattr(response, "status_code", 200),
-                                    ),
-                                    data=response_data,
-                                    headers=self._headers_to_dict(response.headers),
-                                    elapsed=elapsed,
-                                )
-                                # Cache successful GET responses
-                                if (
-                                    method == "GET"
-                                    and use_cache
-                                    and response.status == 200
-                                ):
-                                    self.cache.set(method, url, api_response, params)
-                else:
-                    with self.console.status("Making request..."):
-                        if files:
-                            # Handle file upload
-                            form_data = aiohttp.FormData()
-                            if data:
-                                for key, value in data.items():
-                                    if key not in files:
-                                        form_data.add_field(key, value)
-
-                            for key, (filename, content, content_type) in files.items():
-                                form_data.add_field(
-                                    key,
-                                    content,
-                                    filename=filename,
-                                    content_type=content_type,
-                                )
-
-                            async with self.session.request(
-                                method,
-                                url,
-                                params=params,
-                                data=form_data,
-                                headers=request_headers,
-                                ssl=self.config.verify_ssl,
-                            ) as response:
-                                response_data = await response.json()
-                                elapsed = time.time() - start_time
-
-                                api_response = APIResponse(
-                                    status_code=getattr(
-                                        response,
-                                        "status",
-                                        getattr(response, "status_code", 200),
-                                    ),
-                                    data=response_data,
-                                    headers=self._headers_to_dict(response.headers),
-                                    elapsed=elapsed,
-                                )
-                        else:
-                            # Regular request
-                            async with self.session.request(
-                                method,
-                                url,
-                                params=params,
-                                json=data,
-                                headers=request_headers,
-                                ssl=self.config.verify_ssl,
-                            ) as response:
-                                response_data = await response.json()
-                                elapsed = time.time() - start_time
-
-                                api_response = APIResponse(
-                                    status_code=getattr(
-                                        response,
-                                        "status",
-                                        getattr(response, "status_code", 200),
-                                    ),
-                                    data=response_data,
-                                    headers=self._headers_to_dict(response.headers),
-                                    elapsed=elapsed,
-                                )
-                                # Cache successful GET responses
-                                if (
-                                    method == "GET"
-                                    and use_cache
-                                    and response.status == 200
-                                ):
-                                    self.cache.set(method, url, api_response, params)
-
-                    # Execute post-response hooks
-                    plugin_manager.execute_plugin_hook(
-                        "on_response", api_response.model_dump()
+                # Per attempt, so a retry picks up refreshed credentials
+                request_headers = await self._request_headers(
+                    method, url, params, headers, payload_hash
+                )
+                with self._render(show_progress, render):
+                    async with Slot(self.limiter) as slot:
+                        api_response = await self._send(
+                            method,
+                            url,
+                            params,
+                            data,
+                            files,
+                            request_headers,
+                            start_time,
+                            body,
+                            memory_limit,
+                            body_offset,
+                            payload,
+                        )
+                        slot.status = api_response.status_code
+
+                if api_response.status_code == 304 and cache_entry is not None:
+                    api_response = await self.cache_io.revalidate(
+                        method, url, cache_entry, api_response, params
+                    )
+                # Cache successful GET responses
+                elif (
+                    method == "GET"
+                    and use_cache
+                    and not files
+                    and api_response.status_code == 200
+                ):
+                    await self.cache_io.set(method, url, api_response, params)
+                # Writes make the cached reads of the resource stale, and of
+                # the resources named by Location and Content-Location
+                elif (
+                    method in UNSAFE_METHODS
+                    and api_response.status_code < 400
+                    and self.config.cache.invalidate_on_write
+                ):
+                    await self.cache_io.invalidate(
+                        [url]
+                        + [
+                            urljoin(url, api_response.headers[name])
+                            for name in ("Location", "Content-Location")
+                            if name in api_response.headers
+                        ]
                     )
 
-                    return api_response
-            except aiohttp.ClientError as e:
+                # Execute post-response hooks
+                for result in plugin_manager.execute_plugin_hook(
+                    "on_response", api_response.model_dump()
+                ):
+                    if inspect.isawaitable(result):
+                        await result
+
+                return api_response
+            except aiohttp.ClientError:
                 if attempt == self.config.max_retries - 1:
                     raise
                 await asyncio.sleep(2**attempt)  # Exponential backoff
         raise RuntimeError("Failed to make request after all retries")
 
+    def _memory_limit(self, method: str, path: str) -> int:
+        limits = self.config.response.operation_limits
+        for key in (f"{method.upper()} {path}", path):
+            if key in limits:
+                return limits[key]
+        return self.config.response.memory_limit
+
+    def _render(self, show_progress: bool, render: bool = True) -> Any:
+        if not render or self.headless or self._batch is not None:
+            return contextlib.nullcontext()
+        if show_progress:
+            return Progress()
+        return self.console.status("Making request...")
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        data: Optional[Dict[str, Any]],
+        files: Optional[Dict[str, Any]],
+        request_headers: Dict[str, str],
+        start_time: float,
+        file_body: Optional[FileBody] = None,
+        memory_limit: Optional[int] = None,
+        body_offset: Optional[int] = None,
+        payload: Optional[bytes] = None,
+    ) -> APIResponse:
+        """`payload` is `data` encoded as JSON"""
+        body: Dict[str, Any] = {}
+        if file_body is not None:
+            body["data"] = FileBodyPayload(
+                file_body,
+                chunk_size=self.config.transfer.chunk_size,
+                zero_copy=self.config.transfer.zero_copy,
+                content_type=request_headers.get(
+                    "Content-Type", "application/octet-stream"
+                ),
+                offset=body_offset,
+            )
+        elif files:
+            # Handle file upload
+            form_data = aiohttp.FormData()
+            if data:
+                for key, value in data.items():
+                    if key not in files:
+                        form_data.add_field(key, value)
+
+            for key, (filename, content, content_type) in files.items():
+                form_data.add_field(
+                    key,
+                    content,
+                    filename=filename,
+                    content_type=content_type,
+                )
+            body["data"] = form_data
+        elif payload is not None:
+            body["data"] = payload
+            request_headers = {"Content-Type": "application/json", **request_headers}
+        else:
+            body["json"] = data
+
+        timings: Dict[str, float] = {}
+        async with self.session.request(
+            method,
+            url,
+            params=params,
+            headers=request_headers,
+            ssl=self.config.verify_ssl,
+            trace_request_ctx=timings,
+            **body,
+        ) as response:
+            status = getattr(response, "status", getattr(response, "status_code", 200))
+            length = response.content_length
+            if status == 304:
+                response_data: Any = ""  # Not Modified has no body
+            elif memory_limit is not None and (
+                length is None or (isinstance(length, int) and length > memory_limit)
+            ):
+                # Unknown or large size, stream it and only keep it in memory
+                # if it turns out to be small
+                response_body = await ResponseBody.read(
+                    response, memory_limit, self.config.transfer.chunk_size
+                )
+                response_data = response_body
+                if not response_body.spilled:
+                    with contextlib.closing(response_body):
+                        response_data = self._decode_json(response, response_body)
+            else:
+                response_data = await response.json()
+                if response_data is None:  # empty body, see _decode_json
+                    response_data = ""
+            elapsed = time.time() - start_time
+
+            return APIResponse(
+                status_code=status,
+                data=response_data,
+                headers=self._headers_to_dict(response.headers),
+                elapsed=elapsed,
+                timings=timings,
+            )
+
+    async def download(
+        self,
+        path: str,
+        destination: Union[str, Path],
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        resume: bool = True,
+    ) -> APIResponse:
+        """Stream a binary response straight to `destination`.
+
+        Interrupted attempts leave a `.part` file behind which is resumed with
+        a Range request by the next attempt or the next call.
+        """
+        if not self.session:
+            raise RuntimeError(
+                "Client session not initialized. Use async with context."
+            )
+
+        url = f"{self.base_url}{path}"
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        start_time = time.time()
+
+        for attempt in range(self.config.max_retries):
+            try:
+                request_headers = await self._request_headers(
+                    "GET", url, params, headers
+                )
+                async with Slot(self.limiter) as slot:
+                    result = await download_file(
+                        self.session,
+                        url,
+                        destination,
+                        chunk_size=self.config.transfer.chunk_size,
+                        # Keep resuming after a failed attempt even if the
+                        # caller asked for a fresh download
+                        resume=resume or attempt > 0,
+                        params=params,
+                        headers=request_headers,
+                        ssl=self.config.verify_ssl,
+                        # The total timeout would cap the size of a download,
+                        # only fail on a stalled connection
+                        timeout=aiohttp.ClientTimeout(
+                            total=None, sock_read=self.config.timeout
+                        ),
+                    )
+                    slot.status = result["status"]
+                return APIResponse(
+                    status_code=result["status"],
+                    data={
+                        "file_path": str(destination),
+                        "size": result["size"],
+                        "resumed_from": result["resumed_from"],
+                    },
+                    headers={},
+                    elapsed=time.time() - start_time,
+                )
+            except aiohttp.ClientError:
+                if attempt == self.config.max_retries - 1:
+                    raise
+                await asyncio.sleep(2**attempt)  # Exponential backoff
+        raise RuntimeError("Failed to download after all retries")
+
+    async def download_segmented(
+        self,
+        path: str,
+        destination: Union[str, Path],
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        segments: Optional[int] = None,
+    ) -> APIResponse:
+        """Download `path` as concurrent byte ranges.
+
+        The size and range support are probed with HEAD. Without them the
+        download falls back to a single resumable stream. The segment count
+        defaults to one per `transfer.min_segment_size` bytes, capped at
+        `transfer.max_segments`. Failed segments are retried on their own.
+        """
+        if not self.session:
+            raise RuntimeError(
+                "Client session not initialized. Use async with context."
+            )
+
+        url = f"{self.base_url}{path}"
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        start_time = time.time()
+
+        result = await download_segmented(
+            self.session,
+            url,
+            destination,
+            chunk_size=self.config.transfer.chunk_size,
+            min_segment_size=self.config.transfer.min_segment_size,
+            max_segments=self.config.transfer.max_segments,
+            max_retries=self.config.max_retries,
+            segments=segments,
+            # Each request is signed on its own
+            sign=self.auth.headers,
+            params=params,
+            headers=headers,
+            ssl=self.config.verify_ssl,
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=self.config.timeout),
+        )
+        if result["segments"] is None:
+            return await self.download(path, destination, params, headers)
+
+        return APIResponse(
+            status_code=206,
+            data={
+                "file_path": str(destination),
+                "size": result["size"],
+                "segments": result["segments"],
+            },
+            headers={},
+            elapsed=time.time() - start_time,
+        )
+
+    async def upload_multipart(
+        self,
+        path: str,
+        file_path: Union[str, Path],
+        protocol: Union[str, MultipartProtocol] = "s3",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> APIResponse:
+        """Upload a file in parts with a part based protocol ("s3", "azure" or
+        a MultipartProtocol instance), see swagcli.transfer.upload_multipart
+        """
+        if not self.session:
+            raise RuntimeError(
+                "Client session not initialized. Use async with context."
+            )
+
+        url = f"{self.base_url}{path}"
+        start_time = time.time()
+
+        response = await upload_multipart(
+            self.session,
+            url,
+            Path(file_path),
+            protocol,
+            part_size=self.config.transfer.part_size,
+            max_concurrency=self.config.transfer.max_concurrency,
+            max_retries=self.config.max_retries,
+            # Each request is signed on its own
+            sign=self.auth.headers,
+            headers=headers,
+            ssl=self.config.verify_ssl,
+        )
+        body = await response.text()
+        return APIResponse(
+            status_code=response.status,
+            data=body,
+            headers=self._headers_to_dict(response.headers),
+            elapsed=time.time() - start_time,
+        )
+
     async def get(
         self,
         path: str,
@@ -274,6 +725,7 @@ class APIClient:
         headers: Optional[Dict[str, str]] = None,
         show_progress: bool = False,
         use_cache: bool = True,
+        memory_limit: Optional[int] = None,
     ) -> APIResponse:
         return await self._make_request(
             "GET",
@@ -282,6 +734,7 @@ class APIClient:
             headers=headers,
             show_progress=show_progress,
             use_cache=use_cache,
+            memory_limit=memory_limit,
         )
 
     async def post(
@@ -290,9 +743,17 @@ class APIClient:
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
         show_progress: bool = False,
+        body: Optional[FileBody] = None,
+        memory_limit: Optional[int] = None,
     ) -> APIResponse:
         return await self._make_request(
-            "POST", path, data=data, headers=headers, show_progress=show_progress
+            "POST",
+            path,
+            data=data,
+            headers=headers,
+            show_progress=show_progress,
+            body=body,
+            memory_limit=memory_limit,
         )
 
     async def put(
@@ -301,9 +762,17 @@ class APIClient:
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
         show_progress: bool = False,
+        body: Optional[FileBody] = None,
+        memory_limit: Optional[int] = None,
     ) -> APIResponse:
         return await self._make_request(
-            "PUT", path, data=data, headers=headers, show_progress=show_progress
+            "PUT",
+            path,
+            data=data,
+            headers=headers,
+            show_progress=show_progress,
+            body=body,
+            memory_limit=memory_limit,
         )
 
     async def delete(
@@ -312,7 +781,13 @@ class APIClient:
         params: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
         show_progress: bool = False,
+        memory_limit: Optional[int] = None,
     ) -> APIResponse:
         return await self._make_request(
-            "DELETE", path, params=params, headers=headers, show_progress=show_progress
+            "DELETE",
+            path,
+            params=params,
+            headers=headers,
+            show_progress=show_progress,
+            memory_limit=memory_limit,
         )
@@ -140,6 +140,26 @@ class CommandStore:
         for node in PreOrderIter(self.root, **kwargs):
             yield node
 
+    def select(self, method=None, tags=(), pattern=None):
+        """
+        Provides an iterator over the commands with the given request method,
+        one of the given swagger tags and a request url matching the regex
+        pattern, any of them when not given
+        """
+        tags = set(tags)
+        for node in self.iterate():
+            # nodes of paths ending in an argument are groups that carry
+            # the request too, so go by the request method
+            if node.request_method is None:
+                continue
+            if method and node.request_method.lower() != method.lower():
+                continue
+            if tags and not tags.intersection((node.config or {}).get("tags", [])):
+                continue
+            if pattern and re.search(pattern, node.request_url or "") is None:
+                continue
+            yield node
+
     def print(self):
         """
         Prints the tree state in CommandStore in a pretty way
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import aiohttp
+
+from .config import ConcurrencyConfig
+
+# Responses that mean the backend is shedding load
+DROP_STATUSES = (429, 503)
+
+
+class Slot:
+    """One request's claim on the limiter, a no-op without a limiter."""
+
+    def __init__(self, limiter: Optional["AdaptiveLimiter"]) -> None:
+        self.limiter = limiter
+        self.status: Optional[int] = None
+        self.start = 0.0
+
+    async def __aenter__(self) -> "Slot":
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        if self.limiter is None:
+            return
+        rtt = time.monotonic() - self.start
+        if exc_type is None:
+            self.limiter.release(rtt, dropped=self.status in DROP_STATUSES)
+        elif isinstance(exc_val, asyncio.TimeoutError) or (
+            isinstance(exc_val, aiohttp.ClientResponseError)
+            and exc_val.status in DROP_STATUSES
+        ):
+            self.limiter.release(rtt, dropped=True)
+        else:
+            # Unrelated failures (DNS, refused connections, ...) say nothing
+            # about the backend's capacity
+            self.limiter.release(None)
+
+
+class AdaptiveLimiter:
+    """Adaptive in-flight request limit.
+
+    The limit grows additively while latency stays within `latency_tolerance`
+    times the lowest observed latency, and is cut by `backoff_ratio` on
+    timeouts, 429/503 responses or latency inflation. Decreases are applied at
+    most once per round trip so a burst of failing in-flight requests only
+    counts as one congestion signal.
+    """
+
+    def __init__(self, config: ConcurrencyConfig) -> None:
+        self.config = config
+        self.limit = float(config.initial_limit)
+        self.in_flight = 0
+        self.min_rtt: Optional[float] = None
+        self.smoothed_rtt: Optional[float] = None
+        self.drops = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def slot(self) -> Slot:
+        return Slot(self)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot but nobody will use it
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, rtt: Optional[float], dropped: bool = False) -> None:
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if dropped:
+            self.drops += 1
+            self._decrease()
+        elif rtt is not None:
+            self._on_sample(rtt, in_flight)
+        self._wake()
+
+    def _on_sample(self, rtt: float, in_flight: int) -> None:
+        if self.min_rtt is None:
+            self.min_rtt = rtt
+        else:
+            # Let the baseline drift up slowly so that a permanent change in
+            # backend latency does not pin the limit at its minimum forever
+            self.min_rtt = min(rtt, self.min_rtt * (1 + self.config.baseline_drift))
+        if self.smoothed_rtt is None:
+            self.smoothed_rtt = rtt
+        else:
+            self.smoothed_rtt += self.config.smoothing * (rtt - self.smoothed_rtt)
+
+        if rtt > self.min_rtt * self.config.latency_tolerance:
+            self._decrease()
+        elif in_flight * 2 >= self.limit:
+            # Only grow when the current limit is actually being used
+            self.limit = min(
+                float(self.config.max_limit), self.limit + self.config.increase
+            )
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.smoothed_rtt or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(
+            float(self.config.min_limit), self.limit * self.config.backoff_ratio
+        )
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "min_rtt": self.min_rtt,
+            "smoothed_rtt": self.smoothed_rtt,
+            "drops": self.drops,
+        }
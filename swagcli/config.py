@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional
 
 from pydantic import BaseModel, Field, SecretStr
 from rich.console import Console
@@ -22,18 +22,99 @@ class AuthConfig(BaseModel):
 class CacheConfig(BaseModel):
     enabled: bool = True
     ttl: int = 300  # 5 minutes
-    max_size: int = 1000
+    max_size: int = 1000  # entries
+    max_bytes: int = 256 * 1024 * 1024
+    # Cached bodies larger than compression_threshold bytes are compressed,
+    # zstd requires the zstandard package
+    compression: Literal["none", "gzip", "zstd"] = "gzip"
+    compression_threshold: int = 16 * 1024
+    eviction_policy: Literal["lru", "lfu", "ttl"] = "lru"  # ttl: closest to expiry
     storage_path: Path = Path.home() / ".swagcli" / "cache"
+    # "disk" keeps entries under storage_path, "redis" in a Redis-protocol
+    # server that processes and machines share
+    backend: Literal["disk", "redis"] = "disk"
+    redis_url: str = "redis://localhost:6379/0"
+    redis_namespace: str = "swagcli"  # prefix of every key
+    redis_timeout: float = 5.0
+    # In-process LRU in front of the disk cache, 0 entries disables it
+    memory_entries: int = 256
+    memory_bytes: int = 16 * 1024 * 1024
+    # Follow Cache-Control and Expires instead of ttl, which then only applies
+    # to responses without either, and revalidate stale entries that have an
+    # ETag or Last-Modified with conditional requests
+    http_semantics: bool = False
+    stale_ttl: int = 24 * 3600  # how long stale entries with validators are kept
+    shared: bool = False  # a shared cache does not store private responses
+    # Seconds after expiry during which a stale response is served while one
+    # background request refreshes it, and served when the backend fails
+    stale_while_revalidate: int = 0
+    stale_if_error: int = 0
+    max_refreshes: int = 16  # background refreshes in flight per client
+    # Successful POST, PUT, PATCH and DELETE requests drop the cached GETs of
+    # their resource, of the resources below it and of its parent collection
+    invalidate_on_write: bool = True
+    # Store bodies of dedup_threshold bytes and more once per content,
+    # referenced by every entry with that body (disk backend only)
+    dedup: bool = True
+    dedup_threshold: int = 1024
+    # Run the backend reads and writes of APIClient on a dedicated thread
+    # instead of the event loop
+    offload_io: bool = True
+
+
+class ConcurrencyConfig(BaseModel):
+    enabled: bool = False
+    initial_limit: int = 10
+    min_limit: int = 1
+    max_limit: int = 200
+    increase: float = 1.0
+    backoff_ratio: float = 0.5
+    latency_tolerance: float = 2.0  # multiple of the lowest observed latency
+    smoothing: float = 0.2
+    baseline_drift: float = 0.001
+
+
+class TransferConfig(BaseModel):
+    chunk_size: int = 1024 * 1024  # read/write buffer for streamed transfers
+    min_segment_size: int = 8 * 1024 * 1024
+    max_segments: int = 8
+    part_size: int = 8 * 1024 * 1024  # multipart uploads
+    max_concurrency: int = 4  # parts in flight, bounds upload memory
+    zero_copy: bool = True  # sendfile/mmap for file bodies
+
+
+class DNSConfig(BaseModel):
+    # auto/threaded use getaddrinfo, async requires aiodns
+    resolver: Literal["auto", "threaded", "async"] = "auto"
+    cache: bool = True
+    default_ttl: int = 60  # seconds, used when the resolver reports no TTL
+    min_ttl: int = 0
+    max_ttl: int = 3600
+    hosts: Dict[str, str] = {}  # static host -> IP pins, like /etc/hosts
+    happy_eyeballs_delay: Optional[float] = 0.25
+    interleave: Optional[int] = None
+
+
+class ResponseConfig(BaseModel):
+    memory_limit: int = 16 * 1024 * 1024  # larger bodies spill to a temp file
+    # Per operation limits, keyed by "METHOD /path" or "/path"
+    operation_limits: Dict[str, int] = {}
 
 
 class Config(BaseModel):
     base_url: str
     auth: Optional[AuthConfig] = None
     cache: CacheConfig = CacheConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    transfer: TransferConfig = TransferConfig()
+    response: ResponseConfig = ResponseConfig()
+    dns: DNSConfig = DNSConfig()
     timeout: int = 30
     max_retries: int = 3
     verify_ssl: bool = True
     output_format: str = "table"  # table, json, yaml
+    # Skip per-request spinners, None enables it when stdout is not a terminal
+    headless: Optional[bool] = None
     debug: bool = False
 
     @classmethod
@@ -0,0 +1,345 @@
+"""
+Warm daemon mode for Swagcli.
+
+A long running process keeps the parsed spec, the generated click tree and a
+keep-alive HTTP session in memory. Short lived CLI invocations forward their
+argv over a Unix domain socket and only pay for one IPC round trip plus the
+actual API request. When no daemon is listening the caller falls back to
+in-process execution.
+
+This module deliberately only imports the standard library at module level so
+that the forwarding path stays cheap.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DAEMON_DIR = Path.home() / ".swagcli" / "daemon"
+DISABLE_ENV = "SWAGCLI_NO_DAEMON"
+SERVE_ENV = "SWAGCLI_DAEMON"
+TIMEOUT_ENV = "SWAGCLI_DAEMON_TIMEOUT"
+
+# Seconds a call waits to connect to the daemon and for it to start the
+# command, it runs in-process after that. A wedged daemon never answers.
+CONNECT_TIMEOUT = 2.0
+# Seconds a call waits for a busy daemon before running in-process
+BUSY_TIMEOUT = 0.5
+# Default seconds to wait for the result of a command the daemon started
+RESULT_TIMEOUT = 600.0
+
+
+def socket_path(config_url: str) -> Path:
+    """
+    Returns the socket path used by the daemon serving `config_url`
+    """
+    digest = hashlib.sha256(config_url.encode()).hexdigest()[:16]
+    return DAEMON_DIR / f"{digest}.sock"
+
+
+def _describe(value: Any, depth: int = 0) -> Any:
+    """JSON-able description of a constructor argument that is the same in
+    every process, functions are described by their qualified name"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if depth > 8:  # cycles, e.g. objects referencing their owner
+        return "..."
+    depth += 1
+    if isinstance(value, dict):
+        return sorted([str(key), _describe(item, depth)] for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_describe(item, depth) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(json.dumps(_describe(item, depth)) for item in value)
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{value.__module__}.{value.__qualname__}"
+    kind = f"{type(value).__module__}.{type(value).__qualname__}"
+    if hasattr(value, "__dict__"):
+        return [kind, _describe(vars(value), depth)]
+    return [kind, repr(value)]
+
+
+def config_fingerprint(config_url: str, kwargs: Dict[str, Any]) -> str:
+    """
+    Digest of everything a Swagcli instance is built from: the spec URL and
+    the constructor arguments, such as auth, hooks and path filters
+    """
+    document = json.dumps([config_url, _describe(kwargs)], sort_keys=True)
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+def _is_listening(path: Path) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+def _result_timeout() -> float:
+    try:
+        return float(os.environ.get(TIMEOUT_ENV, RESULT_TIMEOUT))
+    except ValueError:
+        return RESULT_TIMEOUT
+
+
+def _send(path: Path, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Sends a single JSON line to the daemon and reads back its reply. Returns
+    None if no daemon on `path` started the command within CONNECT_TIMEOUT,
+    nothing was executed then.
+    """
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        try:
+            stream.write(json.dumps(message).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+        except OSError:  # including timeouts
+            return None
+        if not line:
+            return None
+        response = json.loads(line)
+        if not response.get("accepted"):
+            return response
+
+        # The command runs, retrying it in-process could run it twice
+        timeout = _result_timeout()
+        sock.settimeout(timeout)
+        try:
+            line = stream.readline()
+        except OSError:
+            line = b""
+    if not line:
+        return {
+            "exit_code": 1,
+            "stdout": "",
+            "stderr": f"Error: the swagcli daemon did not reply within {timeout}s\n",
+        }
+    return json.loads(line)
+
+
+def forward(
+    config_url: str,
+    argv: List[str],
+    path: Optional[Path] = None,
+    fingerprint: Optional[str] = None,
+) -> Optional[Tuple[int, str, str]]:
+    """
+    Forwards `argv` with the caller's working directory and environment to a
+    running daemon, returns (exit_code, stdout, stderr) or None when the
+    command has to be executed in-process: no daemon, a busy one, or one
+    built from another config than `fingerprint`, see config_fingerprint
+    """
+    if os.environ.get(DISABLE_ENV):
+        return None
+    message = {
+        "argv": argv,
+        "fingerprint": fingerprint or config_fingerprint(config_url, {}),
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+    }
+    response = _send(path or socket_path(config_url), message)
+    if response is None or "refused" in response:
+        return None
+    return response["exit_code"], response["stdout"], response["stderr"]
+
+
+def shutdown(config_url: str, path: Optional[Path] = None) -> bool:
+    """
+    Asks the daemon serving `config_url` to exit, returns False if none runs
+    """
+    return _send(path or socket_path(config_url), {"shutdown": True}) is not None
+
+
+@contextlib.contextmanager
+def _chdir(path: str) -> Iterator[None]:
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def _environ(env: Dict[str, str]) -> Iterator[None]:
+    previous = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(previous)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # A thread per connection, so busy and shutdown replies are not queued
+    # behind a running command
+    daemon_threads = True
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def _reply(self, response: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        message = json.loads(line)
+        swagcli_daemon = self.server.swagcli_daemon
+        if message.get("shutdown"):
+            response = {"exit_code": 0, "stdout": "", "stderr": ""}
+            # shutdown() blocks until serve_forever returns, so it cannot
+            # be called from the serving thread itself
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif message.get("fingerprint") != swagcli_daemon.fingerprint:
+            response = {"refused": "built from another config"}
+        elif not swagcli_daemon.lock.acquire(timeout=BUSY_TIMEOUT):
+            response = {"refused": "busy"}
+        else:
+            try:
+                self._reply({"accepted": True})
+                response = swagcli_daemon.execute(
+                    message.get("argv", []), message.get("cwd"), message.get("env")
+                )
+            finally:
+                swagcli_daemon.lock.release()
+        self._reply(response)
+
+
+class SwagcliDaemon:
+    """
+    Serves a fully built Swagcli instance over a Unix domain socket.
+
+    Commands run one at a time: each one gets the caller's working directory
+    and environment, and stdout/stderr are process wide and captured per
+    call. A call arriving while another runs is refused after BUSY_TIMEOUT
+    and the caller runs it in-process instead of queueing.
+    """
+
+    def __init__(self, swagcli, path: Optional[Path] = None):
+        self.swagcli = swagcli
+        self.fingerprint = swagcli.fingerprint
+        self.path = path or socket_path(swagcli.config_url)
+        self.server: Optional[socketserver.UnixStreamServer] = None
+        self.lock = threading.Lock()
+
+    def execute(
+        self,
+        argv: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Runs the click tree with `argv` in `cwd` with the environment `env`,
+        and returns the captured result
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        exit_code = 0
+        with contextlib.ExitStack() as stack:
+            if cwd is not None:
+                stack.enter_context(_chdir(cwd))
+            if env is not None:
+                stack.enter_context(_environ(env))
+            stack.enter_context(contextlib.redirect_stdout(stdout))
+            stack.enter_context(contextlib.redirect_stderr(stderr))
+            try:
+                self.swagcli.command_store.root.cmdfunc.main(
+                    args=argv, prog_name=self.swagcli.prog_name
+                )
+            except SystemExit as err:
+                if isinstance(err.code, int):
+                    exit_code = err.code
+                elif err.code is not None:
+                    print(err.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception as err:  # pylint: disable=broad-except
+                print(f"Error: {err}", file=sys.stderr)
+                exit_code = 1
+        return {
+            "exit_code": exit_code,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+    def bind(self) -> None:
+        """
+        Creates the listening socket, only readable by the current user
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        if self.path.exists():
+            if _is_listening(self.path):
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+            # stale socket left behind by a daemon that died
+            self.path.unlink()
+
+        old_umask = os.umask(0o177)
+        try:
+            self.server = _Server(str(self.path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.swagcli_daemon = self
+
+    def serve_forever(self) -> None:
+        """
+        Serves requests until shutdown() is received
+        """
+        if self.server is None:
+            self.bind()
+        try:
+            self.server.serve_forever(poll_interval=0.1)
+        finally:
+            self.server.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+
+
+def exit_with(result: Tuple[int, str, str]) -> None:
+    """
+    Replays a forwarded result on the local stdout/stderr and exits
+    """
+    exit_code, out, err = result
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    sys.exit(exit_code)
+
+
+def run(url: str, **kwargs) -> None:
+    """
+    Lightweight front end: forwards to a running daemon for `url` if there is
+    one, otherwise builds Swagcli in-process and runs it. Unlike
+    `Swagcli(url).run()` the forwarding path does not import click, requests
+    or the rest of swagcli.
+    """
+    if not os.environ.get(SERVE_ENV):
+        result = forward(url, sys.argv[1:], fingerprint=config_fingerprint(url, kwargs))
+        if result is not None:
+            exit_with(result)
+
+    from .cli import Swagcli
+
+    Swagcli(url, **kwargs).run()
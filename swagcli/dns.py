@@ -0,0 +1,160 @@
+import asyncio
+import inspect
+import socket
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+try:
+    from aiohttp.abc import ResolveResult
+except ImportError:  # aiohttp < 3.10 resolvers return plain dicts
+    ResolveResult = dict  # type: ignore
+
+from .config import DNSConfig
+
+try:
+    import aiodns
+except ImportError:  # optional, pip install swagcli[dns]
+    aiodns = None
+
+_NUMERIC = socket.AI_NUMERICHOST | socket.AI_NUMERICSERV
+_RECORD_TYPES = {socket.AF_INET: ("A",), socket.AF_INET6: ("AAAA",)}
+
+
+def _result(hostname: str, address: str, port: int) -> ResolveResult:
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    return ResolveResult(
+        hostname=hostname,
+        host=address,
+        port=port,
+        family=family,
+        proto=0,
+        flags=_NUMERIC,
+    )
+
+
+class CachingResolver(AbstractResolver):
+    """Resolver with static host pins and an in-process cache.
+
+    By default the system resolver runs in a thread, so /etc/hosts, search
+    domains and nsswitch apply, and results are cached for `default_ttl`
+    since getaddrinfo does not report TTLs. The "async" resolver (requires
+    aiodns) sends A/AAAA queries directly and caches them for the TTL of the
+    records. Concurrent lookups of the same name share one query.
+    """
+
+    def __init__(self, config: DNSConfig) -> None:
+        self.config = config
+        use_async = config.resolver == "async"
+        if use_async and aiodns is None:
+            raise RuntimeError("The async resolver requires aiodns")
+        self._dns = aiodns.DNSResolver() if use_async else None
+        self._threaded = None if use_async else aiohttp.ThreadedResolver()
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[ResolveResult]]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def resolve(
+        self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET
+    ) -> List[ResolveResult]:
+        if host in self.config.hosts:
+            return [_result(host, self.config.hosts[host], port)]
+
+        key = (host, family)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return [dict(result, port=port) for result in cached[1]]  # type: ignore
+
+        if key not in self._pending:
+            future = asyncio.ensure_future(self._lookup(host, family))
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shielded so one cancelled caller does not fail the others
+        results = await asyncio.shield(self._pending[key])
+        return [dict(result, port=port) for result in results]  # type: ignore
+
+    async def _lookup(
+        self, host: str, family: socket.AddressFamily
+    ) -> List[ResolveResult]:
+        if self._dns is not None:
+            results, ttl = await self._query(host, family)
+        else:
+            results = await self._threaded.resolve(host, 0, family)
+            ttl = self.config.default_ttl
+        if self.config.cache:
+            ttl = min(max(ttl, self.config.min_ttl), self.config.max_ttl)
+            self._cache[(host, family)] = (time.monotonic() + ttl, results)
+        return results
+
+    async def _query(
+        self, host: str, family: socket.AddressFamily
+    ) -> Tuple[List[ResolveResult], int]:
+        record_types = _RECORD_TYPES.get(family, ("AAAA", "A"))
+        answers = await asyncio.gather(
+            *(self._dns.query(host, record_type) for record_type in record_types),
+            return_exceptions=True,
+        )
+        records = [
+            record
+            for answer in answers
+            if not isinstance(answer, BaseException)
+            for record in answer
+        ]
+        if not records:
+            error = next(a for a in answers if isinstance(a, BaseException))
+            raise OSError(None, f"DNS lookup failed for {host}: {error}")
+        results = [_result(host, record.host, 0) for record in records]
+        return results, min(record.ttl for record in records)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    async def close(self) -> None:
+        if self._dns is not None and hasattr(self._dns, "close"):
+            await self._dns.close()
+        if self._threaded is not None:
+            await self._threaded.close()
+
+
+def create_connector(
+    config: DNSConfig, resolver: AbstractResolver
+) -> aiohttp.TCPConnector:
+    kwargs: Dict[str, Any] = {
+        "resolver": resolver,
+        # The resolver caches by record TTL, the connector's cache is fixed
+        "use_dns_cache": False,
+    }
+    parameters = inspect.signature(aiohttp.TCPConnector).parameters
+    if "happy_eyeballs_delay" in parameters:  # aiohttp >= 3.10
+        kwargs["happy_eyeballs_delay"] = config.happy_eyeballs_delay
+        kwargs["interleave"] = config.interleave
+    return aiohttp.TCPConnector(**kwargs)
+
+
+def timing_trace() -> aiohttp.TraceConfig:
+    """Records DNS and connect durations into the dict passed as a request's
+    `trace_request_ctx`."""
+    trace = aiohttp.TraceConfig()
+
+    def start(name: str) -> Any:
+        async def handler(session: Any, context: SimpleNamespace, params: Any) -> None:
+            setattr(context, name, time.perf_counter())
+
+        return handler
+
+    def end(name: str) -> Any:
+        async def handler(session: Any, context: SimpleNamespace, params: Any) -> None:
+            timings = context.trace_request_ctx
+            if isinstance(timings, dict):
+                elapsed = time.perf_counter() - getattr(context, name)
+                timings[name] = timings.get(name, 0.0) + elapsed
+
+        return handler
+
+    trace.on_dns_resolvehost_start.append(start("dns"))
+    trace.on_dns_resolvehost_end.append(end("dns"))
+    trace.on_connection_create_start.append(start("connect"))
+    trace.on_connection_create_end.append(end("connect"))
+    return trace
@@ -1,6 +1,8 @@
 from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
+
+from .body import ResponseBody
 
 
 class SwaggerParameter(BaseModel):
@@ -32,7 +34,14 @@ class SwaggerDefinition(BaseModel):
 
 
 class APIResponse(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     status_code: int
-    data: Union[Dict[str, Any], List[Any], str]
+    # Bodies over the configured memory limit are left undecoded on disk
+    data: Union[Dict[str, Any], List[Any], str, ResponseBody]
     headers: Dict[str, str]
     elapsed: float
+    # Phase durations in seconds, e.g. "dns" and "connect" for new connections
+    timings: Dict[str, float] = {}
+    # Served from the cache after a 304, no body was transferred
+    revalidated: bool = False
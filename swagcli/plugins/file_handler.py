@@ -1,19 +1,111 @@
 import mimetypes
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
 
 import aiofiles
+from aiohttp import payload
 
 from ..plugins import Plugin
 
-plugin = Plugin(
+
+class FileHandlerPlugin(Plugin):
+    """Runs the hooks below once registered with the plugin manager."""
+
+    def on_request(  # type: ignore[override]
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        data: Optional[Dict[str, Any]],
+    ) -> Awaitable[Optional[Dict[str, Any]]]:
+        return on_request(method, url, params, data)
+
+    def on_response(  # type: ignore[override]
+        self, response: Dict[str, Any]
+    ) -> Awaitable[None]:
+        return on_response(response)
+
+
+# Not registered by default, as it uploads any field naming a local file
+plugin = FileHandlerPlugin(
     name="file_handler",
     description="Handles file uploads and downloads",
     version="1.0.0",
     author="SwagCli Team",
 )
 
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+ProgressCallback = Callable[[int, int], None]
+
+settings: Dict[str, Any] = {
+    "chunk_size": DEFAULT_CHUNK_SIZE,
+    "progress_callback": None,
+}
+
+
+def configure(
+    chunk_size: Optional[int] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> None:
+    """Configure how uploads are streamed from disk."""
+    if chunk_size is not None:
+        settings["chunk_size"] = chunk_size
+    if progress_callback is not None:
+        settings["progress_callback"] = progress_callback
+
+
+class FileStreamPayload(payload.Payload):
+    """Request body part that streams a file from disk in fixed-size chunks.
+
+    Only one chunk is held in memory at a time, the file is re-opened on every
+    write so a retried request sends it again from the start.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress_callback: Optional[ProgressCallback] = None,
+        content_type: Optional[str] = None,
+    ) -> None:
+        self.path = Path(path)
+        super().__init__(self.path, content_type=content_type, filename=self.path.name)
+        self._size = self.path.stat().st_size
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.sent = 0
+
+    def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        raise TypeError("File streams are not decoded into memory")
+
+    async def as_bytes(self, encoding: str = "utf-8", errors: str = "strict") -> bytes:
+        async with aiofiles.open(self.path, "rb") as f:
+            return await f.read()
+
+    async def write(self, writer: Any) -> None:
+        await self.write_with_length(writer, None)
+
+    async def write_with_length(
+        self, writer: Any, content_length: Optional[int]
+    ) -> None:
+        remaining = self._size
+        if content_length is not None:
+            remaining = min(remaining, content_length)
+
+        self.sent = 0
+        async with aiofiles.open(self.path, "rb") as f:
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                await writer.write(chunk)
+                remaining -= len(chunk)
+                self.sent += len(chunk)
+                if self.progress_callback:
+                    self.progress_callback(self.sent, self._size)
+
 
 async def on_request(
     method: str, url: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None
@@ -28,14 +120,18 @@ async def on_request(
         if isinstance(value, (str, Path)) and os.path.isfile(value):
             file_path = Path(value)
             mime_type, _ = mimetypes.guess_type(str(file_path))
+            mime_type = mime_type or "application/octet-stream"
 
-            async with aiofiles.open(file_path, "rb") as f:
-                content = await f.read()
-                files[key] = (
-                    file_path.name,
-                    content,
-                    mime_type or "application/octet-stream",
-                )
+            files[key] = (
+                file_path.name,
+                FileStreamPayload(
+                    file_path,
+                    chunk_size=settings["chunk_size"],
+                    progress_callback=settings["progress_callback"],
+                    content_type=mime_type,
+                ),
+                mime_type,
+            )
 
     if files:
         return {"files": files}
@@ -53,8 +149,11 @@ async def on_response(response: Dict[str, Any]) -> None:
         download_dir.mkdir(parents=True, exist_ok=True)
 
         file_path = download_dir / data["file_name"]
+        content = data["file_content"]
+        if isinstance(content, str):  # decoded from a JSON body
+            content = content.encode()
         async with aiofiles.open(file_path, "wb") as f:
-            await f.write(data["file_content"])
+            await f.write(content)
 
         # Remove file content from response to avoid memory issues
         data.pop("file_content", None)
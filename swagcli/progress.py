@@ -0,0 +1,80 @@
+import time
+from typing import Any, Dict, Optional
+
+from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    ProgressColumn,
+    Task,
+    TextColumn,
+    TimeElapsedColumn,
+)
+from rich.text import Text
+
+
+class _RateColumn(ProgressColumn):
+    def render(self, task: Task) -> Text:
+        elapsed = task.elapsed or 0.0
+        rate = task.completed / elapsed if elapsed else 0.0
+        errors = task.fields.get("errors", 0)
+        error_rate = errors / task.completed if task.completed else 0.0
+        return Text(f"{rate:.1f} req/s, {errors} errors ({error_rate:.1%})")
+
+
+class BatchProgress:
+    """One aggregated progress display for a batch of requests.
+
+    Shows the completed count, request rate and error rate instead of a
+    spinner per request. Without a terminal nothing is rendered and only the
+    counters are kept.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        total: Optional[int] = None,
+        description: str = "Requests",
+        render: bool = True,
+    ) -> None:
+        self.completed = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self._progress: Optional[Progress] = None
+        self._task: Any = None
+        if render and console.is_terminal:
+            self._progress = Progress(
+                TextColumn("{task.description}"),
+                BarColumn(),
+                MofNCompleteColumn(),
+                _RateColumn(),
+                TimeElapsedColumn(),
+                console=console,
+            )
+            self._task = self._progress.add_task(description, total=total, errors=0)
+
+    def __enter__(self) -> "BatchProgress":
+        if self._progress is not None:
+            self._progress.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        if self._progress is not None:
+            self._progress.stop()
+
+    def advance(self, error: bool = False) -> None:
+        self.completed += 1
+        if error:
+            self.errors += 1
+        if self._progress is not None:
+            self._progress.update(self._task, advance=1, errors=self.errors)
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.start
+        return {
+            "completed": self.completed,
+            "errors": self.errors,
+            "rate": self.completed / elapsed if elapsed else 0.0,
+            "error_rate": self.errors / self.completed if self.completed else 0.0,
+        }
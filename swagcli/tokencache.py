@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows, processes are not coordinated
+    fcntl = None
+
+TokenFetcher = Callable[[], Awaitable[Tuple[str, Optional[float]]]]
+
+
+class TokenCache:
+    """Access tokens shared by every swagcli process of the user.
+
+    Each token is a JSON file readable only by its owner. Writes go to a
+    temporary file that atomically replaces the old one, so readers never
+    see a partial token. Refreshes hold an exclusive lock on a sidecar lock
+    file: processes that find the same expired token wait for the first one
+    and then read its result instead of asking the identity provider again.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        refresh_margin: float = 60.0,
+    ) -> None:
+        self.path = Path(path or Path.home() / ".swagcli" / "tokens")
+        self.refresh_margin = refresh_margin
+        self.path.mkdir(parents=True, exist_ok=True)
+        os.chmod(self.path, 0o700)
+
+    @staticmethod
+    def key(**parts: Optional[str]) -> str:
+        """Cache key from e.g. token_url, client_id, tenant and scope"""
+        document = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(document.encode()).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """The token and its remaining lifetime, None if missing or about to
+        expire"""
+        try:
+            with open(self._file(key)) as f:
+                entry = json.load(f)
+            token, issued_at = entry["access_token"], entry["issued_at"]
+            expires_in = entry["expires_in"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if expires_in is None:
+            return token, None
+        remaining = issued_at + expires_in - time.time()
+        # Short lived tokens are refreshed half way through their lifetime,
+        # as in RefreshingCredentials, so they are still shared
+        if remaining <= min(self.refresh_margin, expires_in / 2):
+            return None
+        return token, remaining
+
+    def set(self, key: str, token: str, expires_in: Optional[float]) -> None:
+        entry: Dict[str, Any] = {
+            "access_token": token,
+            "issued_at": time.time(),
+            "expires_in": expires_in,
+        }
+        # mkstemp creates the file with mode 0o600
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def delete(self, key: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            self._file(key).unlink()
+
+    @contextlib.contextmanager
+    def _locked(self, key: str) -> Iterator[None]:
+        fd = os.open(self.path / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    async def get_or_fetch(
+        self, key: str, fetch: TokenFetcher
+    ) -> Tuple[str, Optional[float]]:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        lock = self._locked(key)
+        # flock blocks, wait for other processes off the event loop
+        acquire = loop.run_in_executor(None, lock.__enter__)
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # the executor thread still takes the lock, release it then
+            def release(future: "asyncio.Future[None]") -> None:
+                if not future.cancelled() and future.exception() is None:
+                    lock.__exit__(None, None, None)
+
+            acquire.add_done_callback(release)
+            raise
+        try:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            token, expires_in = await fetch()
+            self.set(key, token, expires_in)
+            return token, expires_in
+        finally:
+            lock.__exit__(None, None, None)
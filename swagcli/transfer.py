@@ -0,0 +1,836 @@
+import asyncio
+import base64
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import aiofiles
+import aiohttp
+from aiohttp import payload
+from aiohttp.http_writer import StreamWriter
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# Auth headers of one request from its method, url, query parameters and
+# payload_hash keyword, e.g. APIClient.auth.headers
+RequestSigner = Callable[..., Awaitable[Dict[str, str]]]
+
+
+async def _signed(
+    sign: Optional[RequestSigner],
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    request_kwargs: Dict[str, Any],
+    data: Optional[Union[bytes, str]] = None,
+) -> Dict[str, Any]:
+    """`request_kwargs` with the auth headers of this very request, signatures
+    cover the method, query and `data` so they cannot be shared between
+    requests. The caller's headers take precedence, as in APIClient."""
+    if sign is None:
+        return request_kwargs
+    payload_hash = None
+    if data is not None:
+        if isinstance(data, str):
+            data = data.encode()
+        payload_hash = hashlib.sha256(data).hexdigest()
+    headers = dict(await sign(method, url, params, payload_hash=payload_hash))
+    headers.update(request_kwargs.get("headers") or {})
+    return {**request_kwargs, "headers": headers}
+
+
+class DownloadState:
+    """Sidecar files of an unfinished download.
+
+    `<name>.part` holds the bytes received so far and `<name>.part.json` the
+    validators of the representation they belong to, so that a later attempt
+    can resume with a Range request instead of starting from zero. A
+    segmented download preallocates the part file and records the
+    `[position, end]` range each segment still has to fetch in `segments`.
+    """
+
+    def __init__(self, destination: Path, url: str) -> None:
+        self.destination = destination
+        self.url = url
+        self.part = destination.with_name(destination.name + ".part")
+        self.meta_path = destination.with_name(destination.name + ".part.json")
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.total: Optional[int] = None
+        self.segments: Optional[List[List[int]]] = None
+
+    def load(self) -> int:
+        """Returns the offset to resume from, 0 if there is nothing to resume
+        or the part file belongs to a segmented download"""
+        if not self.part.exists() or not self.meta_path.exists():
+            self.reset()
+            return 0
+        try:
+            meta = json.loads(self.meta_path.read_text())
+        except ValueError:
+            meta = {}
+        if meta.get("url") != self.url:
+            self.reset()
+            return 0
+        self.etag = meta.get("etag")
+        self.last_modified = meta.get("last_modified")
+        self.total = meta.get("total")
+        self.segments = meta.get("segments")
+        if self.segments is not None:
+            return 0
+        return self.part.stat().st_size
+
+    def save(self) -> None:
+        self.meta_path.write_text(
+            json.dumps(
+                {
+                    "url": self.url,
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
+                    "total": self.total,
+                    "segments": self.segments,
+                }
+            )
+        )
+
+    def reset(self) -> None:
+        self.etag = self.last_modified = self.total = None
+        self.segments = None
+        for path in (self.part, self.meta_path):
+            if path.exists():
+                path.unlink()
+
+    def finish(self) -> None:
+        self.part.replace(self.destination)
+        if self.meta_path.exists():
+            self.meta_path.unlink()
+
+    def range_headers(self, offset: int) -> Dict[str, str]:
+        headers = {"Range": f"bytes={offset}-"}
+        # If-Range only accepts strong validators, without one the returned
+        # Content-Range total is checked against the recorded one instead
+        if self.etag and not self.etag.startswith("W/"):
+            headers["If-Range"] = self.etag
+        elif self.last_modified:
+            headers["If-Range"] = self.last_modified
+        return headers
+
+
+def _total_from(response: Any) -> Optional[int]:
+    content_range = response.headers.get("Content-Range")
+    if content_range:
+        match = CONTENT_RANGE.match(content_range)
+        if match and match.group(3) != "*":
+            return int(match.group(3))
+        return None
+    if response.content_length is not None:
+        return int(response.content_length)
+    return None
+
+
+async def download_file(
+    session: aiohttp.ClientSession,
+    url: str,
+    destination: Path,
+    chunk_size: int,
+    resume: bool = True,
+    **request_kwargs: Any,
+) -> Dict[str, Any]:
+    """Streams `url` into `destination` with a bounded buffer.
+
+    An existing `.part` file from an interrupted attempt is resumed with a
+    Range request. The partial data is discarded when the server reports a
+    different ETag or size, or ignores the Range header. The finished file is
+    checked against the announced size before it is moved into place. On
+    failure the `.part` file is kept so the next attempt continues from there.
+    """
+    state = DownloadState(destination, url)
+    offset = state.load() if resume else 0
+    if not resume:
+        state.reset()
+
+    headers = dict(request_kwargs.pop("headers", None) or {})
+    # Byte ranges and lengths must refer to the bytes written to disk
+    headers.setdefault("Accept-Encoding", "identity")
+    if offset:
+        headers.update(state.range_headers(offset))
+
+    async with session.get(
+        url, headers=headers, raise_for_status=False, **request_kwargs
+    ) as response:
+        if response.status == 416 and offset and offset == state.total:
+            # Everything was already received before the interruption
+            state.finish()
+            return {"status": response.status, "size": offset, "resumed_from": offset}
+        if response.status == 416:
+            state.reset()
+            raise aiohttp.ClientPayloadError(
+                f"Range {offset}- not satisfiable for {url}, partial data discarded"
+            )
+        response.raise_for_status()
+
+        etag = response.headers.get("ETag")
+        total = _total_from(response)
+        mode = "wb"
+        resumed_from = 0
+        if response.status == 206:
+            match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            changed = (
+                (state.etag and etag and etag != state.etag)
+                or (state.total is not None and total != state.total)
+                or not match
+                or int(match.group(1)) != offset
+            )
+            if changed:
+                state.reset()
+                raise aiohttp.ClientPayloadError(
+                    f"{url} changed while resuming, partial data discarded"
+                )
+            mode, resumed_from = "ab", offset
+        else:
+            # Full representation, either a fresh download or the server
+            # ignored the Range / If-Range did not match
+            offset = 0
+
+        state.etag = etag
+        state.last_modified = response.headers.get("Last-Modified")
+        state.total = total
+        state.save()
+
+        received = offset
+        async with aiofiles.open(state.part, mode) as f:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                await f.write(chunk)
+                received += len(chunk)
+
+    if total is not None and received != total:
+        raise aiohttp.ClientPayloadError(
+            f"Received {received} of {total} bytes from {url}"
+        )
+    state.finish()
+    return {"status": response.status, "size": received, "resumed_from": resumed_from}
+
+
+def segment_count(size: int, min_segment_size: int, max_segments: int) -> int:
+    """Number of ranges to fetch concurrently for an object of `size` bytes"""
+    wanted = -(-size // max(min_segment_size, 1))
+    return max(1, min(max_segments, wanted))
+
+
+def split_ranges(size: int, segments: int) -> List[Tuple[int, int]]:
+    """Splits [0, size) into `segments` inclusive byte ranges"""
+    step = -(-size // segments)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+class _PositionalWriter:
+    """Writes chunks at absolute offsets of a preallocated file.
+
+    Uses os.pwrite where available so concurrent segments never share a file
+    position, otherwise falls back to seek + write under a lock. Writes run on
+    a private executor which is drained before the file is closed.
+    """
+
+    def __init__(self, path: Path, size: int, workers: int) -> None:
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self.fd, size)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _write(self, data: bytes, offset: int) -> None:
+        if hasattr(os, "pwrite"):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self.fd, view, offset)
+                view, offset = view[written:], offset + written
+            return
+        with self._lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            os.write(self.fd, data)
+
+    async def write(self, data: bytes, offset: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write, data, offset)
+
+    async def close(self) -> None:
+        """Waits for the pending writes off the event loop, then closes"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        os.close(self.fd)
+
+
+async def probe(
+    session: aiohttp.ClientSession,
+    url: str,
+    sign: Optional[RequestSigner] = None,
+    **request_kwargs: Any,
+) -> Dict[str, Any]:
+    """HEAD request telling the size and range support of `url`.
+
+    Asks for the identity encoding, as ranges and Content-Length then refer
+    to the stored bytes. Servers refusing HEAD with 405 or 501 report an
+    unknown size without range support, other errors are raised.
+    """
+    headers = dict(request_kwargs.pop("headers", None) or {})
+    headers["Accept-Encoding"] = "identity"
+    request_kwargs = await _signed(
+        sign,
+        "HEAD",
+        url,
+        request_kwargs.get("params"),
+        {**request_kwargs, "headers": headers},
+    )
+    try:
+        async with session.head(
+            url, raise_for_status=True, allow_redirects=True, **request_kwargs
+        ) as response:
+            return {
+                "size": response.content_length,
+                "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+                "etag": response.headers.get("ETag"),
+            }
+    except aiohttp.ClientResponseError as e:
+        # Other errors, such as 401 or 404, would fail the GET just the same
+        if e.status not in (405, 501):
+            raise
+        return {"size": None, "ranges": False, "etag": None}
+
+
+async def _fetch_segment(
+    session: aiohttp.ClientSession,
+    url: str,
+    writer: _PositionalWriter,
+    segment: List[int],
+    etag: Optional[str],
+    chunk_size: int,
+    max_retries: int,
+    sign: Optional[RequestSigner] = None,
+    **request_kwargs: Any,
+) -> None:
+    """Fetches the `[position, end]` range of `segment`, advancing its
+    position as the bytes reach the file"""
+    headers = dict(request_kwargs.pop("headers", None) or {})
+    headers["Accept-Encoding"] = "identity"
+    position, end = segment
+    start = position
+
+    for attempt in range(max_retries):
+        headers["Range"] = f"bytes={position}-{end}"
+        if etag and not etag.startswith("W/"):
+            headers["If-Range"] = etag
+        try:
+            # Signed per attempt, signatures are only valid for a while
+            kwargs = await _signed(
+                sign,
+                "GET",
+                url,
+                request_kwargs.get("params"),
+                {**request_kwargs, "headers": headers},
+            )
+            async with session.get(url, raise_for_status=True, **kwargs) as response:
+                match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+                if response.status != 206 or not match:
+                    raise ValueError(f"{url} changed during segmented download")
+                if int(match.group(1)) != position:
+                    raise ValueError(f"{url} returned an unexpected range")
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    await writer.write(chunk, position)
+                    position += len(chunk)
+                    segment[0] = position
+            if position != end + 1:
+                raise aiohttp.ClientPayloadError(
+                    f"Segment {start}-{end} ended at {position}"
+                )
+            return
+        except aiohttp.ClientError:
+            # Only this segment is retried, continuing where it stopped
+            if attempt == max_retries - 1:
+                raise
+            await asyncio.sleep(2**attempt)
+
+
+async def download_segmented(
+    session: aiohttp.ClientSession,
+    url: str,
+    destination: Path,
+    chunk_size: int,
+    min_segment_size: int,
+    max_segments: int,
+    max_retries: int,
+    segments: Optional[int] = None,
+    sign: Optional[RequestSigner] = None,
+    **request_kwargs: Any,
+) -> Dict[str, Any]:
+    """Fetches `url` as concurrent byte ranges into a preallocated file.
+
+    Returns None in "segments" when the server does not announce a size and
+    range support, the caller should then fall back to a single stream.
+    `sign` supplies the auth headers of each request. A failed download
+    keeps its part file and the progress of each segment, the next call for
+    the same representation (size and strong ETag) only fetches what is
+    missing.
+    """
+    info = await probe(session, url, sign, **request_kwargs)
+    size = info["size"]
+    if not info["ranges"] or not size:
+        return {"size": size, "segments": None}
+
+    state = DownloadState(destination, url)
+    state.load()
+    etag = info["etag"]
+    resumable = etag is not None and not etag.startswith("W/")
+    if not (
+        resumable
+        and state.segments is not None
+        and state.total == size
+        and state.etag == etag
+    ):
+        state.reset()
+        if segments is None:
+            segments = segment_count(size, min_segment_size, max_segments)
+        state.segments = [[start, end] for start, end in split_ranges(size, segments)]
+        state.total = size
+        state.etag = etag
+    pending = [segment for segment in state.segments if segment[0] <= segment[1]]
+
+    if resumable:
+        state.save()
+    writer = _PositionalWriter(state.part, size, workers=max(1, len(pending)))
+    tasks = [
+        asyncio.ensure_future(
+            _fetch_segment(
+                session,
+                url,
+                writer,
+                segment,
+                etag,
+                chunk_size,
+                max_retries,
+                sign,
+                **request_kwargs,
+            )
+        )
+        for segment in pending
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await writer.close()
+        if resumable:
+            # Keep what arrived, with how far each segment got
+            state.save()
+        else:
+            state.reset()
+        raise
+    await writer.close()
+    state.finish()
+    return {"size": size, "segments": len(state.segments)}
+
+
+class MultipartProtocol:
+    """Part based upload protocol of a storage API.
+
+    Subclasses implement the three calls of the protocol: `initiate` returns a
+    context shared by the other calls, `upload_part` returns whatever
+    `complete` needs to reference the part. Each call passes its request
+    through `signed`, which adds the auth headers of that request when
+    upload_multipart was given a signer.
+    """
+
+    sign: Optional[RequestSigner] = None
+
+    async def signed(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        request_kwargs: Dict[str, Any],
+        data: Optional[Union[bytes, str]] = None,
+    ) -> Dict[str, Any]:
+        return await _signed(self.sign, method, url, params, request_kwargs, data)
+
+    async def initiate(
+        self, session: aiohttp.ClientSession, url: str, **request_kwargs: Any
+    ) -> Dict[str, Any]:
+        return {}
+
+    async def upload_part(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        context: Dict[str, Any],
+        number: int,
+        data: bytes,
+        **request_kwargs: Any,
+    ) -> str:
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        context: Dict[str, Any],
+        parts: List[Tuple[int, str]],
+        **request_kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        raise NotImplementedError
+
+    async def abort(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        context: Dict[str, Any],
+        **request_kwargs: Any,
+    ) -> None:
+        return None
+
+
+def _find_text(document: bytes, tag: str) -> Optional[str]:
+    for element in ET.fromstring(document).iter():
+        # Ignore XML namespaces
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text
+    return None
+
+
+class S3MultipartProtocol(MultipartProtocol):
+    """S3 CreateMultipartUpload / UploadPart / CompleteMultipartUpload"""
+
+    async def initiate(self, session, url, **request_kwargs):
+        params = {"uploads": ""}
+        request_kwargs = await self.signed("POST", url, params, request_kwargs)
+        async with session.post(
+            url, params=params, raise_for_status=True, **request_kwargs
+        ) as response:
+            upload_id = _find_text(await response.read(), "UploadId")
+        if not upload_id:
+            raise ValueError(f"No UploadId returned for {url}")
+        return {"upload_id": upload_id}
+
+    async def upload_part(self, session, url, context, number, data, **request_kwargs):
+        params = {"partNumber": str(number), "uploadId": context["upload_id"]}
+        request_kwargs = await self.signed("PUT", url, params, request_kwargs, data)
+        async with session.put(
+            url, params=params, data=data, raise_for_status=True, **request_kwargs
+        ) as response:
+            return response.headers["ETag"]
+
+    async def complete(self, session, url, context, parts, **request_kwargs):
+        body = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in parts
+        )
+        document = f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>"
+        params = {"uploadId": context["upload_id"]}
+        request_kwargs = await self.signed(
+            "POST", url, params, request_kwargs, document
+        )
+        async with session.post(
+            url,
+            params=params,
+            data=document,
+            raise_for_status=True,
+            **request_kwargs,
+        ) as response:
+            await response.read()
+            return response
+
+    async def abort(self, session, url, context, **request_kwargs):
+        params = {"uploadId": context["upload_id"]}
+        request_kwargs = await self.signed("DELETE", url, params, request_kwargs)
+        async with session.delete(url, params=params, **request_kwargs):
+            pass
+
+
+class AzureBlockBlobProtocol(MultipartProtocol):
+    """Azure Blob Put Block / Put Block List"""
+
+    @staticmethod
+    def block_id(number: int) -> str:
+        # Block ids must all have the same length within a blob
+        return base64.b64encode(f"{number:08d}".encode()).decode()
+
+    async def upload_part(self, session, url, context, number, data, **request_kwargs):
+        block_id = self.block_id(number)
+        params = {"comp": "block", "blockid": block_id}
+        request_kwargs = await self.signed("PUT", url, params, request_kwargs, data)
+        async with session.put(
+            url, params=params, data=data, raise_for_status=True, **request_kwargs
+        ):
+            return block_id
+
+    async def complete(self, session, url, context, parts, **request_kwargs):
+        body = "".join(f"<Latest>{block_id}</Latest>" for _, block_id in parts)
+        document = (
+            f'<?xml version="1.0" encoding="utf-8"?><BlockList>{body}</BlockList>'
+        )
+        params = {"comp": "blocklist"}
+        request_kwargs = await self.signed("PUT", url, params, request_kwargs, document)
+        async with session.put(
+            url,
+            params=params,
+            data=document,
+            raise_for_status=True,
+            **request_kwargs,
+        ) as response:
+            await response.read()
+            return response
+
+
+MULTIPART_PROTOCOLS = {
+    "s3": S3MultipartProtocol,
+    "azure": AzureBlockBlobProtocol,
+}
+
+
+async def _read_part(path: Path, offset: int, size: int) -> bytes:
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(offset)
+        return bytes(await f.read(size))
+
+
+async def upload_multipart(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: Path,
+    protocol: Union[str, MultipartProtocol],
+    part_size: int,
+    max_concurrency: int,
+    max_retries: int,
+    sign: Optional[RequestSigner] = None,
+    **request_kwargs: Any,
+) -> aiohttp.ClientResponse:
+    """Uploads `path` in parts of `part_size` bytes with a part protocol.
+
+    At most `max_concurrency` parts are read from disk and in flight at once,
+    which bounds memory to `max_concurrency * part_size`. Each part is retried
+    on its own, the upload is aborted if a part keeps failing. `sign`
+    supplies the auth headers of each request.
+    """
+    if isinstance(protocol, str):
+        protocol = MULTIPART_PROTOCOLS[protocol]()
+    if sign is not None:
+        protocol.sign = sign
+    size = path.stat().st_size
+    offsets = list(range(0, size, part_size)) or [0]
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    context = await protocol.initiate(session, url, **request_kwargs)
+
+    async def send(number: int, offset: int) -> Tuple[int, str]:
+        async with semaphore:
+            data = await _read_part(path, offset, part_size)
+            for attempt in range(max_retries):
+                try:
+                    token = await protocol.upload_part(
+                        session, url, context, number, data, **request_kwargs
+                    )
+                    return number, token
+                except aiohttp.ClientError:
+                    if attempt == max_retries - 1:
+                        raise
+                    await asyncio.sleep(2**attempt)
+        raise RuntimeError(f"Failed to upload part {number}")
+
+    tasks = [
+        asyncio.ensure_future(send(number, offset))
+        for number, offset in enumerate(offsets, start=1)
+    ]
+    try:
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await protocol.abort(session, url, context, **request_kwargs)
+        raise
+
+    return await protocol.complete(
+        session, url, context, sorted(parts), **request_kwargs
+    )
+
+
+FileBody = Union[str, Path, IO[bytes]]
+
+
+class FileBodyPayload(payload.Payload):
+    """Raw request body backed by a file path or an open binary file.
+
+    On a plain (non TLS, non chunked, uncompressed) connection the file is
+    handed to `loop.sendfile` so the kernel copies it straight into the
+    socket. Otherwise the file is memory mapped and written in slices of
+    `chunk_size`, and files that cannot be mapped are read in chunks. An open
+    file is sent from `offset`, by default its position at construction
+    time, and is not closed. Sending moves the file position, so a retry
+    passes the offset recorded before the first attempt.
+    """
+
+    def __init__(
+        self,
+        source: FileBody,
+        chunk_size: int = 1024 * 1024,
+        zero_copy: bool = True,
+        content_type: str = "application/octet-stream",
+        offset: Optional[int] = None,
+    ) -> None:
+        super().__init__(source, content_type=content_type)
+        if isinstance(source, (str, Path)):
+            self.path: Optional[Path] = Path(source)
+            self.file: Optional[IO[bytes]] = None
+            self.offset = 0
+            self._size = self.path.stat().st_size
+        else:
+            self.path = None
+            self.file = source
+            self.offset = source.tell() if offset is None else offset
+            self._size = os.fstat(source.fileno()).st_size - self.offset
+        self.chunk_size = chunk_size
+        self.zero_copy = zero_copy
+        # How the last write sent the file: "sendfile", "mmap" or "read"
+        self.mode: Optional[str] = None
+
+    def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        raise TypeError("File bodies are not decoded into memory")
+
+    async def as_bytes(self, encoding: str = "utf-8", errors: str = "strict") -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_all)
+
+    def _read_all(self) -> bytes:
+        f = self._open()
+        try:
+            f.seek(self.offset)
+            return f.read(self.length)
+        finally:
+            self._release(f)
+
+    @property
+    def length(self) -> int:
+        """Bytes sent, from `offset` to the end of the file"""
+        return self._size or 0
+
+    def _open(self) -> IO[bytes]:
+        if self.file is not None:
+            return self.file
+        assert self.path is not None
+        return open(self.path, "rb")
+
+    def _release(self, f: IO[bytes]) -> None:
+        if f is not self.file:
+            f.close()
+
+    async def write(self, writer: Any) -> None:
+        await self.write_with_length(writer, None)
+
+    async def write_with_length(
+        self, writer: Any, content_length: Optional[int]
+    ) -> None:
+        count = self.length
+        if content_length is not None:
+            count = min(count, content_length)
+        if count <= 0:
+            return
+
+        f = self._open()
+        try:
+            if self.zero_copy and _can_sendfile(writer):
+                try:
+                    await self._sendfile(writer, f, count)
+                    return
+                except asyncio.SendfileNotAvailableError:
+                    pass
+            if self.zero_copy:
+                try:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError):
+                    # Pipes, sockets and the like cannot be mapped
+                    pass
+                else:
+                    await self._write_mapped(writer, mapped, count)
+                    return
+            await self._write_read(writer, f, count)
+        finally:
+            self._release(f)
+
+    async def _sendfile(self, writer: StreamWriter, f: IO[bytes], count: int) -> None:
+        # aiohttp >= 3.11 buffers the headers until the first body write,
+        # flush them before the kernel takes over the socket
+        send_headers = getattr(writer, "send_headers", None)
+        if send_headers is not None:
+            send_headers()
+        await writer.drain()
+        transport = writer.transport
+        if not isinstance(transport, asyncio.WriteTransport):
+            raise asyncio.SendfileNotAvailableError()
+        loop = asyncio.get_running_loop()
+        await loop.sendfile(transport, f, self.offset, count, fallback=False)
+        writer.output_size += count
+        self.mode = "sendfile"
+
+    async def _write_mapped(self, writer: Any, mapped: mmap.mmap, count: int) -> None:
+        view = memoryview(mapped)
+        try:
+            position = self.offset
+            end = self.offset + count
+            while position < end:
+                chunk_end = min(position + self.chunk_size, end)
+                await writer.write(view[position:chunk_end])
+                position = chunk_end
+            self.mode = "mmap"
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                # The transport still buffers a slice, the mapping is released
+                # with its last reference
+                pass
+
+    async def _write_read(self, writer: Any, f: IO[bytes], count: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, f.seek, self.offset)
+        remaining = count
+        while remaining > 0:
+            chunk = await loop.run_in_executor(
+                None, f.read, min(self.chunk_size, remaining)
+            )
+            if not chunk:
+                break
+            await writer.write(chunk)
+            remaining -= len(chunk)
+        self.mode = "read"
+
+
+def _can_sendfile(writer: Any) -> bool:
+    """Whether `writer` is a plain aiohttp StreamWriter that `_sendfile` can
+    bypass. The attributes are looked up defensively, anything missing or
+    unexpected in an aiohttp release selects the write() path instead."""
+    if not isinstance(writer, StreamWriter):
+        return False
+    if getattr(writer, "chunked", True) or not isinstance(
+        getattr(writer, "output_size", None), int
+    ):
+        return False
+    if getattr(writer, "_compress", None) is not None:
+        return False
+    # Headers buffered without a way to flush them would follow the body
+    if hasattr(writer, "_headers_buf") and not callable(
+        getattr(writer, "send_headers", None)
+    ):
+        return False
+    transport = getattr(writer, "transport", None)
+    return (
+        transport is not None
+        and transport.get_extra_info("sslcontext") is None
+        and transport.get_extra_info("socket") is not None
+    )
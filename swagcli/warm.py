@@ -0,0 +1,167 @@
+"""
+Cache warm-up for Swagcli.
+
+Fetches GET operations ahead of time, after a cache clear or on a fresh CI
+runner, so the first real calls are cache hits. Operations are given as a
+list of paths with parameter sets, or selected from a CommandStore by tag
+or path pattern. Requests run with bounded concurrency and, optionally, a
+bounded rate.
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .body import ResponseBody
+from .client import APIClient
+from .commandstore import CommandStore
+from .models import APIResponse
+
+# A GET operation to warm, its path relative to the client's base url and
+# its query parameters
+Target = Tuple[str, Optional[Dict[str, Any]]]
+
+PLACEHOLDER = re.compile(r"{([^}]+)}")
+
+
+def expand(path: str, params: Optional[Dict[str, Any]] = None) -> Target:
+    """Fill the `{name}` placeholders of `path` from `params`, the remaining
+    parameters are sent as query parameters. Raises KeyError for a
+    placeholder without a value."""
+    query = dict(params or {})
+
+    def substitute(match: "re.Match[str]") -> str:
+        return str(query.pop(match.group(1)))
+
+    path = PLACEHOLDER.sub(substitute, path)
+    return path, query or None
+
+
+def load_targets(operations: Sequence[Dict[str, Any]]) -> List[Target]:
+    """Targets of a list of operations such as
+    `[{"path": "/pets/{petId}", "params": [{"petId": 1}, {"petId": 2}]}]`.
+    An operation without `params` is fetched once without parameters."""
+    targets = []
+    for operation in operations:
+        for params in operation.get("params") or [None]:
+            try:
+                targets.append(expand(operation["path"], params))
+            except KeyError as e:
+                raise ValueError(
+                    f"No value for {e} in {operation['path']} with {params}"
+                ) from e
+    return targets
+
+
+def select_targets(
+    store: CommandStore,
+    base_url: str,
+    tags: Iterable[str] = (),
+    pattern: Optional[str] = None,
+) -> Tuple[List[Target], List[str]]:
+    """Targets of the GET commands in `store` with one of `tags` and a url
+    matching `pattern`, and the urls of the selected commands that cannot be
+    warmed: outside `base_url`, or with a path parameter without default."""
+    base_url = base_url.rstrip("/")
+    targets: List[Target] = []
+    skipped: List[str] = []
+    for node in store.select("get", tags, pattern):
+        url = node.request_url
+        defaults = {
+            param["name"]: param["default"]
+            for param in node.parameters
+            if param.get("in") == "path" and "default" in param
+        }
+        if not url.startswith(base_url):
+            skipped.append(url)
+            continue
+        try:
+            targets.append(expand(url[len(base_url) :], defaults))
+        except KeyError:
+            skipped.append(url)
+    return targets, skipped
+
+
+def _body_size(response: APIResponse) -> int:
+    if response.revalidated:
+        return 0  # the 304 carried no body
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit():
+        return int(length)
+    if isinstance(response.data, ResponseBody):
+        return response.data.size
+    if isinstance(response.data, str):
+        return len(response.data.encode())
+    return len(json.dumps(response.data).encode())
+
+
+async def warm_cache(
+    client: APIClient,
+    targets: Sequence[Target],
+    concurrency: int = 8,
+    rate: float = 0.0,
+) -> Dict[str, Any]:
+    """Fetch `targets` into the client's cache, at most `concurrency` at a
+    time and `rate` requests per second (0 for no limit). Targets with a
+    fresh cache entry count as hits and are not fetched.
+
+    Returns the number of operations, hits, misses (fetched, including
+    stale entries that were revalidated), revalidated, errors, the body
+    bytes of the fetched responses and the elapsed seconds. "failures"
+    lists the path, params and error message of each failed target.
+    """
+    report: Dict[str, Any] = {
+        "operations": len(targets),
+        "hits": 0,
+        "misses": 0,
+        "errors": 0,
+        "bytes": 0,
+        "failures": [],
+    }
+    revalidations = client.cache.revalidations
+    pending = iter(targets)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_start = time.monotonic()
+
+    async def throttle() -> None:
+        # Spaces request starts `interval` apart
+        nonlocal next_start
+        now = time.monotonic()
+        delay, next_start = next_start - now, max(now, next_start) + interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def worker() -> None:
+        for path, params in pending:
+            try:
+                response = await client.prefetch(
+                    path, params, throttle=throttle if interval else None
+                )
+            except Exception as e:
+                # One failing target, e.g. a body the cache cannot store, must
+                # not abort the others
+                report["errors"] += 1
+                report["failures"].append(
+                    {"path": path, "params": params, "error": str(e) or repr(e)}
+                )
+                batch.advance(error=True)
+                continue
+            if response is None:
+                report["hits"] += 1
+            else:
+                report["misses"] += 1
+                report["bytes"] += _body_size(response)
+                if isinstance(response.data, ResponseBody):
+                    response.data.close()
+            batch.advance()
+
+    start = time.perf_counter()
+    with client.batch(len(targets), "Warming cache") as batch:
+        await asyncio.gather(
+            *(worker() for _ in range(max(1, min(concurrency, len(targets)))))
+        )
+    report["revalidated"] = client.cache.revalidations - revalidations
+    report["elapsed"] = time.perf_counter() - start
+    return report
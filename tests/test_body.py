@@ -0,0 +1,133 @@
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from swagcli.body import ResponseBody
+from swagcli.client import APIClient
+from swagcli.config import Config
+
+ITEMS = [{"id": i, "name": f"item-{i}"} for i in range(5000)]
+
+
+async def _items(request):
+    return web.json_response(ITEMS)
+
+
+async def _chunked(request):
+    response = web.StreamResponse(headers={"Content-Type": "application/json"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(b'{"ok": ')
+    await response.write(b"true}")
+    return response
+
+
+async def _chunked_text(request):
+    response = web.StreamResponse(headers={"Content-Type": request.query["type"]})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(request.query["body"].encode())
+    return response
+
+
+async def _sized_text(request):
+    return web.Response(
+        body=request.query["body"].encode(),
+        headers={"Content-Type": request.query["type"]},
+    )
+
+
+@pytest.fixture
+async def config(tmp_path):
+    app = web.Application()
+    app.router.add_get("/items", _items)
+    app.router.add_get("/chunked", _chunked)
+    app.router.add_get("/text", _chunked_text)
+    app.router.add_get("/sized", _sized_text)
+    server = TestServer(app)
+    await server.start_server()
+    yield Config(
+        base_url=str(server.make_url("")),
+        cache={"enabled": True, "storage_path": tmp_path / "cache"},
+        response={"memory_limit": 64 * 1024},
+    )
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_large_body_spills_to_disk(config):
+    async with APIClient(config) as client:
+        response = await client.get("/items", use_cache=False)
+
+    body = response.data
+    assert isinstance(body, ResponseBody)
+    assert body.spilled
+    assert body.size > 64 * 1024
+    assert body.json() == ITEMS
+    assert json.load(body.open()) == ITEMS
+    assert body.mmap()[:8] == b'[{"id": '
+    body.close()
+
+
+@pytest.mark.asyncio
+async def test_large_body_is_cached_and_mapped(config):
+    async with APIClient(config) as client:
+        fetched = await client.get("/items")
+        cached = await client.get("/items")
+        assert client.cache.stats()["disk_hits"] == 1
+
+    assert fetched.data.json() == ITEMS
+    body = cached.data
+    assert isinstance(body, ResponseBody)
+    assert body.size == fetched.data.size
+    # read in place from the cache file of the deduplicated body
+    assert body.open().name.startswith(str(config.cache.storage_path))
+    assert body.open().tell() == 0
+    assert bytes(body.mmap()) == fetched.data.read_bytes()
+    assert body.json() == ITEMS
+    body.close()
+    fetched.data.close()
+
+
+@pytest.mark.asyncio
+async def test_small_streamed_body_is_decoded(config):
+    async with APIClient(config) as client:
+        response = await client.get("/chunked")
+
+    assert response.data == {"ok": True}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/text", "/sized"])  # streamed, Content-Length
+async def test_json_contract_of_both_read_paths(config, path):
+    config.max_retries = 1
+    async with APIClient(config) as client:
+        empty = await client.get(path, params={"type": "application/json", "body": " "})
+        with pytest.raises(aiohttp.ContentTypeError):
+            await client.get(path, params={"type": "text/plain", "body": "ok"})
+
+    assert empty.data == ""
+
+
+@pytest.mark.asyncio
+async def test_memory_limit_per_operation(config):
+    config.response.operation_limits = {"GET /items": 1024 * 1024}
+    async with APIClient(config) as client:
+        configured = await client.get("/items", use_cache=False)
+        overridden = await client.get("/items", use_cache=False, memory_limit=1024)
+
+    assert configured.data == ITEMS
+    assert isinstance(overridden.data, ResponseBody)
+
+
+def test_response_body_in_memory():
+    body = ResponseBody(memory_limit=1024, charset="utf-8")
+    body._write(b'{"a": 1}')
+
+    assert not body.spilled
+    assert body.json() == {"a": 1}
+    assert bytes(body.mmap()) == b'{"a": 1}'
+    assert "in memory" in repr(body)
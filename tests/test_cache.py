@@ -1,9 +1,14 @@
+import asyncio
+import json
+import os
+import threading
 import time
 from pathlib import Path
 
 import pytest
 
-from swagcli.cache import Cache
+from swagcli.body import ResponseBody
+from swagcli.cache import AsyncCache, Cache
 from swagcli.config import CacheConfig
 from swagcli.models import APIResponse
 
@@ -122,3 +127,502 @@ def test_cache_disabled(cache_config):
 
     cache.set(method, url, api_response)
     assert cache.get(method, url) is None
+
+
+def _response(value="value"):
+    return APIResponse(
+        status_code=200,
+        data={"key": value},
+        headers={"Content-Type": "application/json"},
+        elapsed=0.1,
+    )
+
+
+def test_cache_tiers(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    url = "https://api.example.com/test"
+
+    cache.set("GET", url, _response())
+    assert cache.get("GET", url).data == {"key": "value"}
+    cache.memory.clear()  # as in a new process
+    assert cache.get("GET", url).data == {"key": "value"}
+    assert cache.get("GET", url).data == {"key": "value"}
+    assert cache.get("GET", url + "/other") is None
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (2, 1, 1)
+    assert stats["memory_hit_rate"] == 0.5
+    assert stats["hit_rate"] == 0.75
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=2))
+    for i in range(3):
+        cache.set("GET", f"https://api.example.com/{i}", _response(str(i)))
+    assert len(cache.memory) == 2
+
+    # the evicted entry is still on disk
+    assert cache.get("GET", "https://api.example.com/0").data == {"key": "0"}
+    assert cache.stats()["disk_hits"] == 1
+
+    size = cache.memory.size
+    cache.memory.max_bytes = size // 2 + 16
+    cache.set("GET", "https://api.example.com/3", _response("3"))
+    assert len(cache.memory) == 1
+
+
+def test_memory_tier_respects_ttl(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, ttl=1))
+    url = "https://api.example.com/test"
+    cache.set("GET", url, _response())
+    time.sleep(1.1)
+    assert cache.get("GET", url) is None
+    assert len(cache.memory) == 0
+
+
+def test_cached_response_is_a_copy(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    url = "https://api.example.com/test"
+    response = _response()
+    cache.set("GET", url, response)
+    response.data["key"] = "changed"
+    assert cache.get("GET", url).data == {"key": "value"}
+
+
+@pytest.mark.parametrize("promoted", [False, True])
+def test_memory_hits_are_not_shared(tmp_path, promoted):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    url = "https://api.example.com/test"
+    cache.set("GET", url, _response())
+    if promoted:
+        cache.memory.clear()
+    cache.get("GET", url).data["key"] = "changed"
+    cache.get("GET", url).headers["X-Changed"] = "1"
+    response = cache.get("GET", url)
+    assert response.data == {"key": "value"}
+    assert "X-Changed" not in response.headers
+    assert cache.stats()["memory_hits"] == (2 if promoted else 3)
+
+
+def _http_cache(tmp_path, **kwargs):
+    return Cache(
+        CacheConfig(storage_path=tmp_path, http_semantics=True, ttl=300, **kwargs)
+    )
+
+
+def _with_headers(**headers):
+    return APIResponse(
+        status_code=200, data={"key": "value"}, headers=headers, elapsed=0
+    )
+
+
+def test_http_semantics_freshness(tmp_path):
+    cache = _http_cache(tmp_path)
+    url = "https://api.example.com/test"
+
+    cache.set("GET", url + "/max-age", _with_headers(**{"Cache-Control": "max-age=60"}))
+    entry = cache.lookup("GET", url + "/max-age")
+    assert 59 < entry.fresh_until - entry.stored_at <= 60
+
+    cache.set(
+        "GET",
+        url + "/expires",
+        _with_headers(
+            Date="Mon, 01 Jan 2024 00:00:00 GMT",
+            Expires="Mon, 01 Jan 2024 00:02:00 GMT",
+        ),
+    )
+    entry = cache.lookup("GET", url + "/expires")
+    assert entry.fresh_until - entry.stored_at == pytest.approx(120)
+
+    cache.set("GET", url + "/none", _with_headers())
+    entry = cache.lookup("GET", url + "/none")
+    assert entry.fresh_until - entry.stored_at == pytest.approx(300)
+
+    cache.set("GET", url + "/no-store", _with_headers(**{"cache-control": "no-store"}))
+    assert cache.lookup("GET", url + "/no-store") is None
+
+
+def test_private_responses_are_not_shared(tmp_path):
+    response = _with_headers(**{"Cache-Control": "private, max-age=60"})
+    private = _http_cache(tmp_path / "private")
+    shared = _http_cache(tmp_path / "shared", shared=True)
+    private.set("GET", "https://api.example.com/me", response)
+    shared.set("GET", "https://api.example.com/me", response)
+    assert private.get("GET", "https://api.example.com/me") is not None
+    assert shared.get("GET", "https://api.example.com/me") is None
+
+
+def test_stale_entries_with_validators_are_kept(tmp_path):
+    cache = _http_cache(tmp_path)
+    url = "https://api.example.com/test"
+    cache.set(
+        "GET", url, _with_headers(**{"Cache-Control": "no-cache", "ETag": '"v1"'})
+    )
+    cache.set("GET", url + "/plain", _with_headers(**{"Cache-Control": "no-cache"}))
+
+    assert cache.get("GET", url) is None
+    cache.memory.clear()
+    entry = cache.lookup("GET", url)
+    assert not entry.fresh
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+    assert cache.lookup("GET", url + "/plain") is None
+
+    not_modified = APIResponse(
+        status_code=304,
+        data="",
+        headers={"Cache-Control": "max-age=60", "ETag": '"v1"'},
+        elapsed=0.01,
+    )
+    response = cache.revalidate("GET", url, entry, not_modified)
+    assert response.status_code == 200
+    assert response.data == {"key": "value"}
+    assert response.headers["Cache-Control"] == "max-age=60"
+    assert cache.get("GET", url).data == {"key": "value"}
+    assert cache.stats()["revalidations"] == 1
+
+
+def _filled(tmp_path, policy, count=10, **kwargs):
+    cache = Cache(
+        CacheConfig(
+            storage_path=tmp_path,
+            memory_entries=0,
+            eviction_policy=policy,
+            **kwargs,
+        )
+    )
+    for i in range(count):
+        cache.set("GET", f"https://api.example.com/{i}", _response(str(i)))
+    return cache
+
+
+def _cached(cache, count=10):
+    return [i for i in range(count) if cache.get("GET", f"https://api.example.com/{i}")]
+
+
+def test_max_size_evicts_least_recently_used(tmp_path):
+    cache = _filled(tmp_path, "lru", count=9, max_size=10)
+    cache.get("GET", "https://api.example.com/0")
+    cache.set("GET", "https://api.example.com/9", _response("9"))
+    cache.set("GET", "https://api.example.com/10", _response("10"))
+
+    # down to 90% of the limit, the least recently used entries first
+    assert _cached(cache, 11) == [0, 3, 4, 5, 6, 7, 8, 9, 10]
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["entries"] == 9
+
+
+def test_max_size_evicts_least_frequently_used(tmp_path):
+    cache = _filled(tmp_path, "lfu", count=10, max_size=10)
+    for _ in range(2):
+        cache.get("GET", "https://api.example.com/1")
+        cache.get("GET", "https://api.example.com/2")
+    cache.set("GET", "https://api.example.com/10", _response("10"))
+    assert {1, 2} <= set(_cached(cache, 11))
+    assert cache.stats()["evictions"] == 2
+
+
+def test_ttl_policy_evicts_closest_to_expiry(tmp_path):
+    cache = Cache(
+        CacheConfig(
+            storage_path=tmp_path,
+            memory_entries=0,
+            eviction_policy="ttl",
+            http_semantics=True,
+            max_size=3,
+        )
+    )
+    for i, max_age in enumerate([300, 60, 600, 120]):
+        cache.set(
+            "GET",
+            f"https://api.example.com/{i}",
+            _with_headers(**{"Cache-Control": f"max-age={max_age}"}),
+        )
+    assert _cached(cache, 4) == [0, 2]
+
+
+def test_max_bytes(tmp_path):
+    cache = _filled(tmp_path, "lru", count=1)
+    entry_size = cache.stats()["bytes"]
+    cache = _filled(tmp_path / "limited", "lru", count=20, max_bytes=entry_size * 10)
+    stats = cache.stats()
+    assert stats["bytes"] <= entry_size * 10
+    assert stats["evictions"] >= 10
+    assert len(_cached(cache, 20)) == stats["entries"]
+
+
+def test_memory_tier_entries_are_evicted_last(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=2, max_size=4))
+    for i in range(4):
+        cache.set("GET", f"https://api.example.com/{i}", _response(str(i)))
+    # 2 and 3 are in memory, their disk access times are the oldest
+    cache.backend.cache.get(cache.key_for("GET", "https://api.example.com/0"))
+    cache.backend.cache.get(cache.key_for("GET", "https://api.example.com/1"))
+    cache.set("GET", "https://api.example.com/4", _response("4"))
+    assert 3 in _cached(cache, 5)
+
+
+def test_unknown_eviction_policy(tmp_path):
+    with pytest.raises(ValueError, match="eviction_policy"):
+        CacheConfig(storage_path=tmp_path, eviction_policy="random")
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip", "zstd"])
+def test_records_are_compressed_above_threshold(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    cache = Cache(
+        CacheConfig(
+            storage_path=tmp_path,
+            compression=compression,
+            compression_threshold=1024,
+            memory_entries=0,
+            dedup=False,
+        )
+    )
+    large = APIResponse(
+        status_code=200,
+        data={"items": [{"id": i, "name": "item"} for i in range(1000)]},
+        headers={"Content-Type": "application/json", "Set-Cookie": "session=1"},
+        elapsed=0.1,
+    )
+    cache.set("GET", "https://api.example.com/large", large)
+    cache.set("GET", "https://api.example.com/small", _response())
+
+    value = cache.backend.cache.get(
+        cache.key_for("GET", "https://api.example.com/large")
+    )
+    raw_size = len(json.dumps(large.data, separators=(",", ":")))
+    if compression == "none":
+        assert len(value) > raw_size
+    else:
+        assert len(value) < raw_size / 5
+
+    response = cache.get("GET", "https://api.example.com/large")
+    assert response.data == large.data
+    # per-connection and sensitive headers are not stored
+    assert response.headers == {"Content-Type": "application/json"}
+    assert cache.get("GET", "https://api.example.com/small").data == {"key": "value"}
+
+
+def test_text_bodies_and_lazy_decoding(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=0))
+    url = "https://api.example.com/text"
+    text = APIResponse(status_code=200, data="plain text", headers={}, elapsed=0)
+    cache.set("GET", url, text)
+
+    entry = cache.lookup("GET", url)
+    assert entry._response is None
+    assert entry.fresh
+    assert entry.response.data == "plain text"
+
+
+def test_old_entries_are_misses(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    url = "https://api.example.com/test"
+    key = cache.key_for("GET", url)
+    cache.backend.cache.set(key, (time.time(), _response().model_dump()))
+    assert cache.get("GET", url) is None
+    assert key not in cache.backend.cache
+
+
+@pytest.mark.parametrize("size", [100, 1024 * 1024])
+def test_raw_bodies_are_stored_as_they_are(tmp_path, size):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    url = "https://api.example.com/export"
+    content = (bytes(range(256)) * (size // 256 + 1))[:size]
+    body = ResponseBody(-1, "application/octet-stream")
+    body._write(content)
+    response = APIResponse(status_code=200, data=body, headers={}, elapsed=0)
+    cache.set("GET", url, response)
+
+    # never kept in the memory tier, read from the cache file every time
+    assert len(cache.memory) == 0
+    for _ in range(2):
+        cached = cache.get("GET", url).data
+        assert isinstance(cached, ResponseBody)
+        assert cached.size == size
+        assert cached.content_type == "application/octet-stream"
+        assert cached.read_bytes() == content
+        assert bytes(cached.mmap()[:4]) == content[:4]
+        cached.close()
+    assert cache.stats()["disk_hits"] == 2
+
+
+def test_invalidate_resource_children_and_parent(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    base = "https://API.example.com/v1"
+    urls = [
+        "/items",
+        "/items/3",
+        "/items/3/tags",
+        "/items/30",
+        "/items/4",
+        "/users",
+    ]
+    for url in urls:
+        cache.set("GET", base + url, _response(url))
+    cache.set("GET", base + "/items/3/", _response(), params={"fields": "name"})
+
+    assert cache.invalidate(["https://api.example.com/v1/items/3"]) == 4
+    remaining = [url for url in urls if cache.get("GET", base + url) is not None]
+    assert remaining == ["/items/30", "/items/4", "/users"]
+    assert cache.get("GET", base + "/items/3/", params={"fields": "name"}) is None
+    assert cache.stats()["invalidations"] == 4
+    # gone from the memory tier too
+    assert len(cache.memory) == 3
+    assert cache.invalidate([base + "/orders"]) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("offload_io", [True, False])
+async def test_async_cache_offloads_backend_io(tmp_path, offload_io):
+    cache = Cache(CacheConfig(storage_path=tmp_path, offload_io=offload_io))
+    threads = []
+    get = cache.backend.get
+    cache.backend.get = lambda key: threads.append(threading.get_ident()) or get(key)
+    cache_io = AsyncCache(cache)
+    url = "https://api.example.com/items"
+
+    assert await cache_io.lookup("GET", url) is None
+    await cache_io.set("GET", url, _response())
+    cache.memory.clear()
+    entry = await cache_io.lookup("GET", url)
+    assert entry.response.data == {"key": "value"}
+    # promoted by the I/O thread, served on the loop
+    assert (await cache_io.lookup("GET", url)).response.data == {"key": "value"}
+    assert len(threads) == 2
+    assert (threading.get_ident() not in threads) == offload_io
+
+    assert await cache_io.invalidate([url]) == 1
+    assert await cache_io.lookup("GET", url) is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 2)
+    await cache_io.close()
+
+
+@pytest.mark.asyncio
+async def test_async_cache_close_does_not_block_the_loop(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    cache_io = AsyncCache(cache)
+    url = "https://api.example.com/items"
+    set_ = cache.set
+    cache.set = lambda *args: time.sleep(0.3) or set_(*args)
+
+    write = asyncio.ensure_future(cache_io.set("GET", url, _response()))
+    await asyncio.sleep(0.05)  # the write is running on the I/O thread
+    closing = asyncio.ensure_future(cache_io.close())
+    start = time.perf_counter()
+    await asyncio.sleep(0.01)
+    assert time.perf_counter() - start < 0.2
+
+    await closing
+    await write
+    assert cache.get("GET", url).data == {"key": "value"}
+
+
+def _listing(count=200):
+    return APIResponse(
+        status_code=200,
+        data={"items": [{"id": i, "name": "item"} for i in range(count)]},
+        headers={},
+        elapsed=0.1,
+    )
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=0))
+    url = "https://api.example.com/items"
+    for page in range(3):
+        cache.set("GET", url, _listing(), params={"page": page})
+    cache.set("GET", url + "/empty", _response())  # below dedup_threshold
+
+    stats = cache.stats()
+    assert stats["entries"] == 4
+    assert stats["blobs"] == 1
+    assert stats["dedup_ratio"] == 3.0
+    for page in range(3):
+        assert cache.get("GET", url, params={"page": page}).data == _listing().data
+
+    # the blob goes with the last entry referencing it
+    cache.set("GET", url, _listing(100), params={"page": 0})
+    assert cache.stats()["blobs"] == 2
+    assert cache.backend.delete([cache.key_for("GET", url, {"page": 1})]) == 1
+    assert cache.stats()["blobs"] == 2
+    cache.invalidate([url])
+    stats = cache.stats()
+    assert (stats["entries"], stats["blobs"], stats["blob_bytes"]) == (0, 0, 0)
+    assert stats["dedup_ratio"] == 1.0
+
+
+def test_deduplicated_raw_bodies(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path))
+    content = bytes(range(256)) * 1024
+    for name in ("a", "b"):
+        body = ResponseBody(-1, "application/octet-stream")
+        body._write(content)
+        response = APIResponse(status_code=200, data=body, headers={}, elapsed=0)
+        cache.set("GET", f"https://api.example.com/{name}", response)
+    assert cache.stats()["blobs"] == 1
+    assert cache.stats()["dedup_ratio"] == 2.0
+    for name in ("a", "b"):
+        cached = cache.get("GET", f"https://api.example.com/{name}").data
+        assert cached.read_bytes() == content
+        cached.close()
+
+
+def test_expired_entries_release_their_blobs(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, ttl=1, max_size=2))
+    cache.set("GET", "https://api.example.com/a", _listing())
+    cache.set("GET", "https://api.example.com/b", _listing())
+    time.sleep(1.1)
+    cache.set("GET", "https://api.example.com/c", _listing(100))
+    stats = cache.stats()
+    assert stats["expirations"] == 2
+    assert (stats["entries"], stats["blobs"]) == (1, 1)
+
+
+def test_entries_without_their_blob_are_misses(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=0))
+    url = "https://api.example.com/items"
+    cache.set("GET", url, _listing())
+    get_blob = cache.backend.get_blob
+
+    def replaced(digest):
+        # another process stores a new body between the two reads
+        cache.set("GET", url, _listing(300))
+        return get_blob(digest)
+
+    cache.backend.get_blob = replaced
+    assert cache.get("GET", url) is None
+    cache.backend.get_blob = get_blob
+    stats = cache.stats()
+    assert (stats["misses"], stats["entries"], stats["blobs"]) == (1, 1, 1)
+    # the new entry was not deleted with the old one
+    assert cache.get("GET", url).data == _listing(300).data
+
+
+def test_clear_drops_blobs(tmp_path):
+    cache = Cache(CacheConfig(storage_path=tmp_path, memory_entries=0))
+    cache.set("GET", "https://api.example.com/items", _listing())
+    cache.clear()
+    stats = cache.stats()
+    assert (stats["entries"], stats["blobs"], stats["bytes"]) == (0, 0, 0)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+@pytest.mark.parametrize("dedup", [True, False])
+def test_promoted_file_records_hold_no_descriptors(tmp_path, dedup):
+    cache = Cache(CacheConfig(storage_path=tmp_path, dedup=dedup, compression="none"))
+    url = "https://api.example.com/items"
+    for i in range(50):  # large enough to be stored as files
+        cache.set("GET", url, _listing(2000 + i), params={"page": i})
+    cache.memory.clear()
+    before = len(os.listdir("/proc/self/fd"))
+
+    for i in range(50):
+        assert cache.get("GET", url, params={"page": i}).data == _listing(2000 + i).data
+
+    assert len(cache.memory) == 50
+    assert len(os.listdir("/proc/self/fd")) - before < 5
@@ -0,0 +1,313 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from swagcli.body import ResponseBody
+from swagcli.cache import Cache
+from swagcli.cachebackend import (
+    CacheBackend,
+    DiskBackend,
+    RedisBackend,
+    RedisConnection,
+    RedisError,
+    cache_backend,
+)
+from swagcli.config import CacheConfig
+from swagcli.models import APIResponse
+
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """In-process server speaking enough of the Redis protocol for
+    RedisBackend: strings with expiry, hashes, sorted sets and counters"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.password = password
+        self.strings = {}  # key -> (value, expires_at)
+        self.hashes = {}
+        self.zsets = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def string(self, key):
+        value, expires_at = self.strings.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.strings[key]
+            return None
+        return value
+
+    def run(self, name, args):
+        if name == "PING":
+            return "PONG"
+        if name == "AUTH":
+            if args[-1].decode() != self.password:
+                return RedisError("WRONGPASS invalid password")
+            return "OK"
+        if name == "SELECT":
+            return "OK"
+        if name == "GET":
+            return self.string(args[0])
+        if name == "SET":
+            expires_at = None
+            if len(args) > 2 and args[2].upper() == b"PX":
+                expires_at = time.time() + int(args[3]) / 1000
+            self.strings[args[0]] = (args[1], expires_at)
+            return "OK"
+        if name == "DEL":
+            deleted = 0
+            for key in args:
+                for store in (self.strings, self.hashes, self.zsets):
+                    deleted += store.pop(key, None) is not None
+            return deleted
+        if name == "INCRBY":
+            value = int(self.string(args[0]) or 0) + int(args[1])
+            self.strings[args[0]] = (str(value).encode(), None)
+            return value
+        if name.startswith("H"):
+            table = self.hashes.setdefault(args[0], {})
+            if name == "HGET":
+                return table.get(args[1])
+            if name == "HMGET":
+                return [table.get(field) for field in args[1:]]
+            if name == "HSET":
+                added = args[1] not in table
+                table[args[1]] = args[2]
+                return int(added)
+            if name == "HDEL":
+                return sum(table.pop(field, None) is not None for field in args[1:])
+            if name == "HLEN":
+                return len(table)
+            if name == "HKEYS":
+                return list(table)
+        if name.startswith("Z"):
+            zset = self.zsets.setdefault(args[0], {})
+            ordered = sorted(zset, key=lambda member: (zset[member], member))
+            if name == "ZADD":
+                added = args[2] not in zset
+                zset[args[2]] = float(args[1])
+                return int(added)
+            if name == "ZREM":
+                return sum(zset.pop(member, None) is not None for member in args[1:])
+            if name == "ZRANGE":
+                return ordered[int(args[1]) : int(args[2]) + 1]
+            if name == "ZRANGEBYSCORE":
+                low, high = float(args[1]), float(args[2])
+                return [m for m in ordered if low <= zset[m] <= high]
+            if name == "ZRANGEBYLEX":
+                return [m for m in ordered if _in_lex_range(m, args[1], args[2])]
+        return RedisError(f"ERR unknown command '{name}'")
+
+
+def _in_lex_range(member, low, high):
+    above = member >= low[1:] if low[:1] == b"[" else member > low[1:]
+    below = member <= high[1:] if high[:1] == b"[" else member < high[1:]
+    return above and below
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write(self, reply):
+        if isinstance(reply, RedisError):
+            self.wfile.write(b"-%s\r\n" % str(reply).encode())
+        elif isinstance(reply, str):
+            self.wfile.write(b"+%s\r\n" % reply.encode())
+        elif isinstance(reply, int):
+            self.wfile.write(b":%d\r\n" % reply)
+        elif reply is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(reply, list):
+            self.wfile.write(b"*%d\r\n" % len(reply))
+            for item in reply:
+                self.write(item)
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(reply), reply))
+
+    def handle(self):
+        server = self.server
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            with server.lock:
+                self.write(server.run(command[0].decode().upper(), command[1:]))
+
+
+@pytest.fixture
+def redis_server():
+    server = StandInRedis()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["disk", "redis"])
+def config(request, tmp_path):
+    config = CacheConfig(storage_path=tmp_path, backend=request.param)
+    if request.param == "redis":
+        server = request.getfixturevalue("redis_server")
+        config.redis_url = server.url
+    return config
+
+
+def _response(data):
+    return APIResponse(status_code=200, data=data, headers={}, elapsed=0.1)
+
+
+def test_backend_selection(tmp_path):
+    assert isinstance(cache_backend(CacheConfig(storage_path=tmp_path)), DiskBackend)
+    config = CacheConfig(storage_path=tmp_path, backend="redis")
+    assert isinstance(cache_backend(config), RedisBackend)
+
+
+def test_incomplete_backends_are_rejected():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        GetOnly()
+
+
+def test_set_get_and_stats(config):
+    cache = Cache(config)
+    cache.set("GET", "https://api.example.com/items", _response({"key": "value"}))
+    cache.memory.clear()
+    assert cache.get("GET", "https://api.example.com/items").data == {"key": "value"}
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] > 0
+    assert stats["disk_hits"] == 1
+    cache.clear()
+    assert cache.get("GET", "https://api.example.com/items") is None
+    assert cache.stats()["entries"] == cache.stats()["bytes"] == 0
+
+
+def test_backend_invalidation(config):
+    cache = Cache(config)
+    base = "https://api.example.com"
+    for path in ("/items", "/items/1", "/items/1/tags", "/items/10", "/users"):
+        cache.set("GET", base + path, _response(path))
+    assert cache.invalidate([base + "/items/1"]) == 3
+    assert cache.stats()["entries"] == 2
+    assert cache.get("GET", base + "/items/10").data == "/items/10"
+
+
+def test_backend_eviction(config):
+    config.max_size = 10
+    config.memory_entries = 0
+    cache = Cache(config)
+    for i in range(11):
+        cache.set("GET", f"https://api.example.com/{i}", _response(str(i)))
+    stats = cache.stats()
+    assert stats["entries"] == 9
+    assert stats["evictions"] == 2
+
+
+def test_backend_expiry(config):
+    config.ttl = 1
+    config.max_size = 5
+    cache = Cache(config)
+    for i in range(5):
+        cache.set("GET", f"https://api.example.com/old/{i}", _response("old"))
+    time.sleep(1.1)
+    cache.set("GET", "https://api.example.com/new", _response("new"))
+    stats = cache.stats()
+    assert stats["expirations"] == 5
+    assert stats["evictions"] == 0
+    assert stats["entries"] == 1
+
+
+def test_raw_bodies(config):
+    cache = Cache(config)
+    body = ResponseBody(-1, "application/octet-stream")
+    body._write(b"x" * 100_000)
+    cache.set("GET", "https://api.example.com/export", _response(body))
+    cached = cache.get("GET", "https://api.example.com/export").data
+    assert cached.read_bytes() == b"x" * 100_000
+    cached.close()
+
+
+def test_processes_share_a_redis_cache(redis_server, tmp_path):
+    config = CacheConfig(
+        storage_path=tmp_path, backend="redis", redis_url=redis_server.url
+    )
+    writer, reader = Cache(config), Cache(config)
+    writer.set("GET", "https://api.example.com/items", _response([1, 2]))
+    assert reader.get("GET", "https://api.example.com/items").data == [1, 2]
+    reader.invalidate(["https://api.example.com/items"])
+    writer.memory.clear()
+    assert writer.get("GET", "https://api.example.com/items") is None
+
+
+def test_writes_are_pipelined(redis_server, tmp_path, monkeypatch):
+    config = CacheConfig(
+        storage_path=tmp_path, backend="redis", redis_url=redis_server.url
+    )
+    cache = Cache(config)
+    cache.set("GET", "https://api.example.com/items", _response([1]))
+    batches = []
+    execute = cache.backend.redis._execute
+    monkeypatch.setattr(
+        cache.backend.redis,
+        "_execute",
+        lambda commands: batches.append(len(commands)) or execute(commands),
+    )
+    cache.set("GET", "https://api.example.com/items", _response([2]))
+    # the old entry, then all writes in one round trip, then the usage check
+    assert batches == [1, 7, 2]
+
+    batches.clear()
+    for i in range(5):
+        cache.set("GET", f"https://api.example.com/items/{i}", _response(str(i)))
+    batches.clear()
+    cache.invalidate(["https://api.example.com/items"])
+    # the tag lookups, the entries, then the deletes
+    assert batches == [3, 1, 5]
+
+
+def test_redis_connection(redis_server):
+    redis_server.password = "secret"
+    url = redis_server.url.replace("redis://", "redis://:secret@")
+    connection = RedisConnection(url)
+    assert connection.pipeline([["SET", "a", b"1"], ["GET", "a"], ["GET", "b"]]) == [
+        "OK",
+        b"1",
+        None,
+    ]
+    with pytest.raises(RedisError, match="unknown command"):
+        connection.pipeline([["NOPE"], ["GET", "a"]])
+    # the connection is still in sync
+    assert connection.execute("GET", "a") == b"1"
+
+    # reconnects when the server dropped the connection
+    connection._sock.shutdown(2)
+    assert connection.execute("PING") == "PONG"
+    connection.close()
+
+    with pytest.raises(RedisError, match="WRONGPASS"):
+        RedisConnection(redis_server.url.replace("redis://", "redis://:x@")).execute(
+            "PING"
+        )
@@ -1,10 +1,14 @@
+import asyncio
 import os
 import shutil
 import tempfile
+import time
 from unittest.mock import AsyncMock, patch
 
 import aiohttp
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
 from swagcli.client import APIClient
 from swagcli.config import AuthConfig, Config
@@ -135,3 +139,212 @@ async def test_post_request(client):
         response = await client.post("/test", data={"name": "test"})
         assert response.status_code == 201
         assert response.data == {"id": 1}
+
+
+@pytest.mark.asyncio
+async def test_headless_skips_rendering(config):
+    config.headless = True
+    mock_response = AsyncMock()
+    mock_response.__aenter__.return_value.status = 200
+    mock_response.__aenter__.return_value.json = AsyncMock(return_value={"id": 1})
+    mock_response.__aenter__.return_value.headers = {"Content-Type": "application/json"}
+
+    async with APIClient(config) as client:
+        with patch.object(client.console, "status") as status, patch(
+            "aiohttp.ClientSession.request", return_value=mock_response
+        ):
+            await client.get("/test", use_cache=False, show_progress=True)
+        assert not status.called
+
+
+def test_headless_follows_terminal(config):
+    with patch("swagcli.client.Console") as console:
+        console.return_value.is_terminal = True
+        assert APIClient(config).headless is False
+        console.return_value.is_terminal = False
+        assert APIClient(config).headless is True
+
+    config.headless = False
+    with patch("swagcli.client.Console") as console:
+        console.return_value.is_terminal = False
+        assert APIClient(config).headless is False
+
+
+@pytest.mark.asyncio
+async def test_batch_counts_completed_and_errors(config):
+    config.max_retries = 1
+    mock_response = AsyncMock()
+    mock_response.__aenter__.return_value.status = 200
+    mock_response.__aenter__.return_value.json = AsyncMock(return_value={"id": 1})
+    mock_response.__aenter__.return_value.headers = {"Content-Type": "application/json"}
+
+    async with APIClient(config) as client:
+        with patch(
+            "aiohttp.ClientSession.request",
+            side_effect=[mock_response, aiohttp.ClientError("boom"), mock_response],
+        ):
+            with client.batch(total=3) as batch:
+                for _ in range(3):
+                    try:
+                        await client.get("/test", use_cache=False)
+                    except aiohttp.ClientError:
+                        pass
+        assert client._batch is None
+
+    stats = batch.stats()
+    assert stats["completed"] == 3
+    assert stats["errors"] == 1
+    assert stats["error_rate"] == pytest.approx(1 / 3)
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_revalidated(config):
+    requests = []
+
+    async def reference(request):
+        requests.append(dict(request.headers))
+        headers = {"ETag": '"v1"', "Cache-Control": "max-age=0"}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers=headers)
+        return web.json_response({"items": [1, 2, 3]}, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/reference", reference)
+    server = TestServer(app)
+    await server.start_server()
+
+    config.base_url = str(server.make_url(""))
+    config.cache.http_semantics = True
+    async with APIClient(config) as client:
+        first = await client.get("/reference")
+        second = await client.get("/reference")
+    await server.close()
+
+    assert first.data == second.data == {"items": [1, 2, 3]}
+    assert second.status_code == 200
+    assert "If-None-Match" not in requests[0]
+    assert requests[1]["If-None-Match"] == '"v1"'
+    assert client.cache.stats()["revalidations"] == 1
+
+
+class VersionedBackend:
+    """Returns an increasing version, or fails with `status`"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.requests = 0
+        self.status = 200
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        return web.json_response({"version": self.requests})
+
+
+@pytest.fixture
+async def versioned(config):
+    backend = VersionedBackend()
+    app = web.Application()
+    app.router.add_get("/item", backend.handle)
+    server = TestServer(app)
+    await server.start_server()
+    config.base_url = str(server.make_url(""))
+    config.cache.ttl = 0  # every entry is stale right away
+    config.max_retries = 1
+    yield backend
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(config, versioned):
+    config.cache.stale_while_revalidate = 60
+    async with APIClient(config) as client:
+        await client.get("/item")
+        versioned.delay = 0.2
+        start = time.monotonic()
+        responses = await asyncio.gather(*(client.get("/item") for _ in range(5)))
+        assert time.monotonic() - start < 0.2
+        assert all(r.data == {"version": 1} for r in responses)
+    # one refresh, awaited when the client closed
+    assert versioned.requests == 2
+    assert client.cache.stats()["background_refreshes"] == 1
+
+    async with APIClient(config) as client:
+        assert (await client.get("/item")).data == {"version": 2}
+
+
+@pytest.mark.asyncio
+async def test_background_refreshes_are_bounded(config, versioned):
+    config.cache.stale_while_revalidate = 60
+    config.cache.max_refreshes = 0
+    async with APIClient(config) as client:
+        await client.get("/item")
+        assert (await client.get("/item")).data == {"version": 2}
+    assert client.cache.stats()["background_refreshes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_if_error(config, versioned):
+    config.cache.stale_if_error = 60
+    async with APIClient(config) as client:
+        await client.get("/item")
+        versioned.status = 503
+        assert (await client.get("/item")).data == {"version": 1}
+        assert client.cache.stats()["stale_if_error_hits"] == 1
+
+        client.cache.clear()
+        with pytest.raises(aiohttp.ClientResponseError):
+            await client.get("/item")
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_cached_reads(config):
+    items = {"1": "one", "2": "two"}
+
+    async def list_items(request):
+        return web.json_response(items)
+
+    async def get_item(request):
+        return web.json_response({"name": items[request.match_info["id"]]})
+
+    async def put_item(request):
+        items[request.match_info["id"]] = (await request.json())["name"]
+        return web.json_response({})
+
+    async def create_item(request):
+        items["3"] = (await request.json())["name"]
+        return web.json_response({}, status=201, headers={"Location": "/items/3"})
+
+    app = web.Application()
+    app.router.add_get("/items", list_items)
+    app.router.add_post("/items", create_item)
+    app.router.add_get("/items/{id}", get_item)
+    app.router.add_put("/items/{id}", put_item)
+    server = TestServer(app)
+    await server.start_server()
+    config.base_url = str(server.make_url(""))
+    async with APIClient(config) as client:
+        await client.get("/items")
+        await client.get("/items/1")
+        await client.get("/items/2")
+
+        await client.put("/items/1", data={"name": "uno"})
+        assert (await client.get("/items/1")).data == {"name": "uno"}
+        assert (await client.get("/items")).data["1"] == "uno"
+        # other resources stay cached
+        assert client.cache.lookup("GET", f"{client.base_url}/items/2").fresh
+
+        # and the collection's members go with it
+        await client.post("/items", data={"name": "three"})
+        assert (await client.get("/items")).data["3"] == "three"
+        assert client.cache.lookup("GET", f"{client.base_url}/items/2") is None
+        # PUT: /items/1 and /items, POST: /items, /items/1 and /items/2
+        assert client.cache.stats()["invalidations"] == 5
+
+        await client.get("/items/2")
+        config.cache.invalidate_on_write = False
+        await client.put("/items/2", data={"name": "dos"})
+        assert (await client.get("/items/2")).data == {"name": "two"}
+    await server.close()
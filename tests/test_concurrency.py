@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from swagcli.client import APIClient
+from swagcli.concurrency import AdaptiveLimiter
+from swagcli.config import ConcurrencyConfig, Config
+
+
+class Backend:
+    """Local server whose latency grows with load and which sheds load with a
+    503 once more than `capacity` requests are in flight."""
+
+    def __init__(self, capacity: int, latency: float = 0.02, per_request=0.0):
+        self.capacity = capacity
+        self.latency = latency
+        self.per_request = per_request
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+
+    async def handle(self, request):
+        if self.active >= self.capacity:
+            self.rejected += 1
+            return web.json_response({"error": "overloaded"}, status=503)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency + self.per_request * self.active)
+        finally:
+            self.active -= 1
+        return web.json_response({"ok": True})
+
+
+@pytest.fixture
+async def backend_factory(tmp_path):
+    servers = []
+
+    async def start(backend):
+        app = web.Application()
+        app.router.add_get("/work", backend.handle)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        config = Config(
+            base_url=str(server.make_url("")),
+            max_retries=1,
+            cache={"enabled": False, "storage_path": tmp_path / "cache"},
+            concurrency=ConcurrencyConfig(enabled=True, initial_limit=4),
+        )
+        return config
+
+    yield start
+    for server in servers:
+        await server.close()
+
+
+async def _fire(client, count):
+    return await asyncio.gather(
+        *(client.get("/work", use_cache=False) for _ in range(count)),
+        return_exceptions=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_on_healthy_backend(backend_factory):
+    backend = Backend(capacity=1000)
+    config = await backend_factory(backend)
+
+    async with APIClient(config) as client:
+        results = await _fire(client, 200)
+
+    assert all(not isinstance(r, Exception) for r in results)
+    assert client.limiter.metrics()["limit"] > 4
+    assert backend.peak > 4
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_on_overload(backend_factory):
+    backend = Backend(capacity=3)
+    config = await backend_factory(backend)
+    config.concurrency.initial_limit = 32
+
+    async with APIClient(config) as client:
+        await _fire(client, 200)
+
+    metrics = client.limiter.metrics()
+    assert metrics["drops"] > 0
+    assert metrics["limit"] < 32
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_on_latency_inflation(backend_factory):
+    backend = Backend(capacity=1000, latency=0.01, per_request=0.005)
+    config = await backend_factory(backend)
+    config.concurrency.initial_limit = 40
+
+    async with APIClient(config) as client:
+        # learn the unloaded latency first
+        for _ in range(5):
+            await client.get("/work", use_cache=False)
+        await _fire(client, 200)
+
+    assert client.limiter.metrics()["drops"] == 0
+    assert client.limiter.metrics()["limit"] < 40
+
+
+@pytest.mark.asyncio
+async def test_queue_depth():
+    limiter = AdaptiveLimiter(ConcurrencyConfig(initial_limit=1))
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.metrics()["queue_depth"] == 1
+    assert limiter.metrics()["in_flight"] == 1
+
+    limiter.release(0.01)
+    await waiter
+    assert limiter.metrics()["queue_depth"] == 0
+    assert limiter.metrics()["in_flight"] == 1
+
+
+def test_drop_halves_limit():
+    limiter = AdaptiveLimiter(ConcurrencyConfig(initial_limit=16, min_limit=2))
+    limiter.in_flight = 1
+    limiter.release(0.01, dropped=True)
+    assert limiter.metrics()["limit"] == 8
+    assert limiter.metrics()["drops"] == 1
@@ -0,0 +1,186 @@
+import os
+import socket
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from swagcli import daemon
+from swagcli.cli import Swagcli
+
+SPEC = {
+    "swagger": "2.0",
+    "host": "api.example.com",
+    "basePath": "/v1",
+    "paths": {
+        "/pets": {
+            "get": {
+                "summary": "List pets",
+                "parameters": [{"name": "limit", "in": "query", "type": "integer"}],
+                "responses": {},
+            }
+        }
+    },
+}
+
+
+@pytest.fixture
+def socket_file(tmp_path):
+    return tmp_path / "swagcli.sock"
+
+
+@pytest.fixture
+def running_daemon(socket_file):
+    swag = Swagcli("https://api.example.com/swagger.json", prog_name="petstore")
+    swag.config = SPEC
+    response = MagicMock(status_code=200)
+    response.json.return_value = [{"name": "rex"}]
+    swag.make_request = MagicMock(return_value=response)
+
+    swag._parse_paths()
+    swag._build()
+    server = daemon.SwagcliDaemon(swag, socket_file)
+    server.bind()
+    swag.served_by = server
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield swag
+    daemon.shutdown(swag.config_url, socket_file)
+    thread.join(timeout=5)
+
+
+def test_socket_path_depends_on_url():
+    assert daemon.socket_path("http://a/spec") != daemon.socket_path("http://b/spec")
+    assert daemon.socket_path("http://a/spec").suffix == ".sock"
+
+
+def test_forward_without_daemon(socket_file):
+    assert daemon.forward("http://a/spec", ["pets"], socket_file) is None
+
+
+def test_forward_runs_command(running_daemon, socket_file):
+    exit_code, out, _ = daemon.forward(
+        running_daemon.config_url,
+        ["pets", "--limit", "2"],
+        socket_file,
+        running_daemon.fingerprint,
+    )
+
+    assert exit_code == 0
+    assert "rex" in out
+    method, url = running_daemon.make_request.call_args[0]
+    assert (method, url) == ("get", "https://api.example.com/v1/pets")
+    assert running_daemon.make_request.call_args[1]["params"] == {"limit": 2}
+
+    # the spec is only loaded once, every call reuses the built tree
+    daemon.forward(
+        running_daemon.config_url, ["pets"], socket_file, running_daemon.fingerprint
+    )
+    assert running_daemon.make_request.call_count == 2
+
+
+def test_forward_reports_usage_errors(running_daemon, socket_file):
+    exit_code, _, err = daemon.forward(
+        running_daemon.config_url, ["unknown"], socket_file, running_daemon.fingerprint
+    )
+    assert exit_code == 2
+    assert "No such command" in err
+
+
+def test_daemon_refuses_second_instance(running_daemon, socket_file):
+    with pytest.raises(RuntimeError):
+        daemon.SwagcliDaemon(running_daemon, socket_file).bind()
+
+
+def test_shutdown_removes_socket(running_daemon, socket_file):
+    assert daemon.shutdown(running_daemon.config_url, socket_file) is True
+    for _ in range(50):
+        if not socket_file.exists():
+            break
+        threading.Event().wait(0.1)
+    assert not socket_file.exists()
+    assert (
+        daemon.forward(
+            running_daemon.config_url,
+            ["pets"],
+            socket_file,
+            running_daemon.fingerprint,
+        )
+        is None
+    )
+
+
+def test_fingerprint_covers_constructor_arguments():
+    url = "https://api.example.com/swagger.json"
+
+    def hook(request):
+        return request
+
+    plain = Swagcli(url).fingerprint
+    assert Swagcli(url).fingerprint == plain
+    assert Swagcli(url, auth=("user", "secret")).fingerprint != plain
+    assert Swagcli(url, prehooks=[hook]).fingerprint != plain
+    assert Swagcli(url, include_path_regex="^/pets").fingerprint != plain
+
+
+def test_daemon_refuses_other_config(running_daemon, socket_file):
+    other = Swagcli(running_daemon.config_url, auth=("user", "secret"))
+    assert (
+        daemon.forward(other.config_url, ["pets"], socket_file, other.fingerprint)
+        is None
+    )
+    assert running_daemon.make_request.call_count == 0
+
+
+def test_forward_applies_cwd_and_env(running_daemon, socket_file, tmp_path):
+    seen = {}
+    response = running_daemon.make_request.return_value
+
+    def make_request(*args, **kwargs):
+        seen["cwd"] = os.getcwd()
+        seen["token"] = os.environ.get("PETSTORE_TOKEN")
+        return response
+
+    running_daemon.make_request.side_effect = make_request
+    # the daemon shares this process, so the caller's context is sent by hand
+    reply = daemon._send(
+        socket_file,
+        {
+            "argv": ["pets"],
+            "fingerprint": running_daemon.fingerprint,
+            "cwd": str(tmp_path),
+            "env": {"PETSTORE_TOKEN": "from-caller"},
+        },
+    )
+
+    assert reply["exit_code"] == 0
+    assert seen == {"cwd": str(tmp_path), "token": "from-caller"}
+    # restored for the next call
+    assert os.getcwd() != str(tmp_path)
+    assert "PETSTORE_TOKEN" not in os.environ
+
+
+def test_busy_daemon_is_not_waited_for(running_daemon, socket_file):
+    with running_daemon.served_by.lock:  # another call is running
+        start = time.monotonic()
+        result = daemon.forward(
+            running_daemon.config_url,
+            ["pets"],
+            socket_file,
+            running_daemon.fingerprint,
+        )
+    assert result is None
+    assert time.monotonic() - start < daemon.CONNECT_TIMEOUT
+    assert running_daemon.make_request.call_count == 0
+
+
+def test_wedged_daemon_times_out(socket_file, monkeypatch):
+    monkeypatch.setattr(daemon, "CONNECT_TIMEOUT", 0.2)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_file))
+    listener.listen(1)  # accepts connections but never answers
+    with listener:
+        start = time.monotonic()
+        assert daemon.forward("http://a/spec", ["pets"], socket_file) is None
+    assert time.monotonic() - start < 2
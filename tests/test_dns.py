@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pydantic import ValidationError
+
+from swagcli import dns
+from swagcli.client import APIClient
+from swagcli.config import Config, DNSConfig
+
+
+def _threaded_resolver(**config):
+    resolver = dns.CachingResolver(DNSConfig(resolver="threaded", **config))
+    resolver._threaded = AsyncMock()
+    resolver._threaded.resolve.return_value = [dns._result("api.test", "10.0.0.1", 0)]
+    return resolver
+
+
+@pytest.mark.asyncio
+async def test_pinned_host_and_timings(tmp_path):
+    async def ok(request):
+        return web.json_response({"host": request.host})
+
+    app = web.Application()
+    app.router.add_get("/", ok)
+    server = TestServer(app)
+    await server.start_server()
+    port = server.port
+    config = Config(
+        base_url=f"http://pinned.test:{port}",
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+        dns={"hosts": {"pinned.test": "127.0.0.1"}},
+    )
+
+    async with APIClient(config) as client:
+        first = await client.get("/")
+        second = await client.get("/")
+    await server.close()
+
+    assert first.data == {"host": f"pinned.test:{port}"}
+    assert set(first.timings) == {"dns", "connect"}
+    assert first.timings["dns"] <= first.timings["connect"]
+    # the pooled connection is reused, no lookup
+    assert second.timings == {}
+
+
+@pytest.mark.asyncio
+async def test_cache_and_single_flight():
+    resolver = _threaded_resolver(default_ttl=60)
+
+    results = await asyncio.gather(
+        *(resolver.resolve("api.test", 443, socket.AF_INET) for _ in range(10))
+    )
+    await resolver.resolve("api.test", 80, socket.AF_INET)
+
+    assert resolver._threaded.resolve.call_count == 1
+    assert results[0][0]["host"] == "10.0.0.1"
+    assert results[0][0]["port"] == 443
+
+
+@pytest.mark.asyncio
+async def test_cache_expires():
+    resolver = _threaded_resolver(default_ttl=0)
+
+    await resolver.resolve("api.test", 443)
+    await resolver.resolve("api.test", 443)
+
+    assert resolver._threaded.resolve.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_async_lookup_respects_record_ttl():
+    resolver = _threaded_resolver(max_ttl=120)
+    resolver._dns = SimpleNamespace(
+        query=AsyncMock(
+            side_effect=lambda host, record_type: {
+                "A": [SimpleNamespace(host="10.0.0.2", ttl=30)],
+                "AAAA": [SimpleNamespace(host="::2", ttl=600)],
+            }[record_type]
+        )
+    )
+
+    results = await resolver.resolve("api.test", 443, socket.AF_UNSPEC)
+
+    assert [r["host"] for r in results] == ["::2", "10.0.0.2"]
+    assert results[0]["family"] == socket.AF_INET6
+    expires, _ = resolver._cache[("api.test", socket.AF_UNSPEC)]
+    assert 25 < expires - time.monotonic() <= 30
+
+
+@pytest.mark.skipif(dns.aiodns is not None, reason="aiodns is installed")
+def test_async_resolver_requires_aiodns():
+    with pytest.raises(RuntimeError):
+        dns.CachingResolver(DNSConfig(resolver="async"))
+
+
+def test_unknown_resolver_is_rejected():
+    with pytest.raises(ValidationError):
+        DNSConfig(resolver="aiodns")
+
+
+@pytest.mark.asyncio
+async def test_auto_resolver_uses_the_system_resolver(monkeypatch):
+    monkeypatch.setattr(dns, "aiodns", SimpleNamespace(DNSResolver=object))
+
+    assert dns.CachingResolver(DNSConfig())._dns is None
+    assert dns.CachingResolver(DNSConfig(resolver="async"))._dns is not None
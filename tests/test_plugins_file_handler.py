@@ -1,9 +1,21 @@
 import os
 from pathlib import Path
+from unittest.mock import patch
 
+import aiohttp
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
-from swagcli.plugins.file_handler import on_request, on_response, plugin
+from swagcli.client import APIClient
+from swagcli.config import Config
+from swagcli.plugins import PluginManager, file_handler
+from swagcli.plugins.file_handler import (
+    FileStreamPayload,
+    on_request,
+    on_response,
+    plugin,
+)
 
 
 @pytest.fixture
@@ -24,10 +36,117 @@ async def test_file_upload_hook(test_file):
 
     filename, content, mime_type = result["files"]["file"]
     assert filename == "test.txt"
-    assert content == b"test content"
+    assert isinstance(content, FileStreamPayload)
+    assert content.size == len(b"test content")
+    assert await content.as_bytes() == b"test content"
     assert mime_type == "text/plain"
 
 
+@pytest.fixture
+async def upload_server():
+    received = {}
+
+    async def handle(request):
+        if request.content_type == "application/json":
+            received["json"] = await request.json()
+            return web.json_response({"ok": True})
+        reader = await request.multipart()
+        async for part in reader:
+            size = 0
+            while chunk := await part.read_chunk(64 * 1024):
+                size += len(chunk)
+            received[part.name] = (part.filename, size)
+        return web.json_response({"ok": True})
+
+    app = web.Application(client_max_size=1024**3)
+    app.router.add_post("/upload", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, received
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_file_upload_streams_in_chunks(tmp_path, upload_server):
+    server, received = upload_server
+    big_file = tmp_path / "big.bin"
+    big_file.write_bytes(os.urandom(5 * 1024 * 1024 + 123))
+
+    progress = []
+    stream = FileStreamPayload(
+        big_file,
+        chunk_size=1024 * 1024,
+        progress_callback=lambda *p: progress.append(p),
+    )
+    form = aiohttp.FormData()
+    form.add_field("file", stream, filename="big.bin")
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(server.make_url("/upload"), data=form) as response:
+            assert response.status == 200
+
+    assert received["file"] == ("big.bin", big_file.stat().st_size)
+    assert len(progress) == 6
+    assert progress[-1] == (big_file.stat().st_size, big_file.stat().st_size)
+
+
+@pytest.mark.asyncio
+async def test_client_uploads_through_hook(tmp_path, test_file, upload_server):
+    server, received = upload_server
+    config = Config(
+        base_url=str(server.make_url("")),
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+    )
+
+    def execute_plugin_hook(hook, *args):
+        if hook == "on_request":
+            return [on_request(*args)]
+        return []
+
+    with patch(
+        "swagcli.client.plugin_manager.execute_plugin_hook", execute_plugin_hook
+    ):
+        async with APIClient(config) as client:
+            response = await client.post(
+                "/upload", data={"file": str(test_file), "note": "hi"}
+            )
+
+    assert response.data == {"ok": True}
+    assert received["file"] == ("test.txt", len(b"test content"))
+    assert "note" in received
+
+
+@pytest.mark.asyncio
+async def test_registered_plugin_uploads(
+    monkeypatch, tmp_path, test_file, upload_server
+):
+    server, received = upload_server
+    config = Config(
+        base_url=str(server.make_url("")),
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+    )
+    manager = PluginManager()
+    monkeypatch.setattr("swagcli.client.plugin_manager", manager)
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+
+    async with APIClient(config) as client:
+        # Sent as JSON before the plugin is registered
+        await client.post("/upload", data={"file": str(test_file)})
+        assert received == {"json": {"file": str(test_file)}}
+
+        manager.register_plugin(plugin)
+        response = await client.post("/upload", data={"file": str(test_file)})
+
+    assert response.data == {"ok": True}
+    assert received["file"] == ("test.txt", len(b"test content"))
+
+
+def test_configure_sets_chunk_size(monkeypatch):
+    monkeypatch.setattr(file_handler, "settings", dict(file_handler.settings))
+    file_handler.configure(chunk_size=4096)
+    assert file_handler.settings["chunk_size"] == 4096
+
+
 @pytest.mark.asyncio
 async def test_file_download_hook(tmp_path):
     response = {
@@ -47,6 +166,18 @@ async def test_file_download_hook(tmp_path):
     download_dir.rmdir()
 
 
+@pytest.mark.asyncio
+async def test_file_download_hook_text_content(monkeypatch, tmp_path):
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    response = {"data": {"file_name": "notes.txt", "file_content": "héllo"}}
+
+    await on_response(response)
+
+    downloaded_file = tmp_path / ".swagcli" / "downloads" / "notes.txt"
+    assert downloaded_file.read_text(encoding="utf-8") == "héllo"
+    assert response["data"]["file_path"] == str(downloaded_file)
+
+
 def test_plugin_metadata():
     assert plugin.name == "file_handler"
     assert plugin.description == "Handles file uploads and downloads"
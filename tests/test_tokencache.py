@@ -0,0 +1,183 @@
+import asyncio
+import multiprocessing
+import os
+import stat
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pydantic import SecretStr
+
+from swagcli.auth import AzureADAuth, OAuth2Auth
+from swagcli.tokencache import TokenCache, fcntl
+
+
+def _refresh_in_process(path, log, key, expires_in=3600):
+    async def fetch():
+        with open(log, "a") as f:
+            f.write("fetch\n")
+        await asyncio.sleep(0.3)
+        return "shared-token", expires_in
+
+    token, _ = asyncio.run(TokenCache(path).get_or_fetch(key, fetch))
+    assert token == "shared-token"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TokenCache(tmp_path / "tokens")
+
+
+@pytest.mark.asyncio
+async def test_token_is_cached_with_private_permissions(cache):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return "abc", 3600
+
+    key = TokenCache.key(client_id="c", scope="s")
+    assert await cache.get_or_fetch(key, fetch) == ("abc", 3600)
+    token, remaining = await cache.get_or_fetch(key, fetch)
+
+    assert token == "abc"
+    assert 3590 < remaining <= 3600
+    assert len(calls) == 1
+    assert stat.S_IMODE(cache.path.stat().st_mode) == 0o700
+    assert stat.S_IMODE((cache.path / f"{key}.json").stat().st_mode) == 0o600
+
+
+@pytest.mark.asyncio
+async def test_expiring_token_is_refreshed(cache, monkeypatch):
+    key = TokenCache.key(client_id="c")
+    now = time.time()
+    with monkeypatch.context() as patch:
+        # issued an hour ago, 30s left are within the refresh margin
+        patch.setattr(time, "time", lambda: now - 3570)
+        cache.set(key, "old", 3600)
+
+    async def fetch():
+        return "new", 3600
+
+    assert (await cache.get_or_fetch(key, fetch))[0] == "new"
+    assert cache.get(key)[0] == "new"
+
+
+def test_key_depends_on_client_and_scope():
+    assert TokenCache.key(client_id="a", scope="x") != TokenCache.key(
+        client_id="a", scope="y"
+    )
+    assert TokenCache.key(client_id="a", tenant="t") == TokenCache.key(
+        tenant="t", client_id="a"
+    )
+
+
+@pytest.mark.parametrize("expires_in", [3600, 45])
+def test_processes_refresh_once(cache, tmp_path, expires_in):
+    log = tmp_path / "fetches.log"
+    key = TokenCache.key(client_id="shared")
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(
+            target=_refresh_in_process, args=(cache.path, log, key, expires_in)
+        )
+        for _ in range(6)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=20)
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert log.read_text().count("fetch") == 1
+    assert cache.get(key)[0] == "shared-token"
+    assert not list(cache.path.glob("*.tmp"))
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+@pytest.mark.asyncio
+async def test_cancelled_refresh_releases_the_lock(cache, monkeypatch):
+    key = TokenCache.key(client_id="cancelled")
+    events = []
+    locked = cache._locked
+
+    class Lock:
+        def __init__(self, key):
+            self.lock = locked(key)
+
+        def __enter__(self):
+            self.lock.__enter__()
+            events.append("acquired")
+
+        def __exit__(self, *exc_info):
+            events.append("released")
+            self.lock.__exit__(*exc_info)
+
+    monkeypatch.setattr(cache, "_locked", Lock)
+    fd = os.open(cache.path / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX)  # another process is refreshing
+
+    async def fetch():
+        return "token", 3600
+
+    waiting = asyncio.ensure_future(cache.get_or_fetch(key, fetch))
+    await asyncio.sleep(0.1)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    os.close(fd)
+
+    token, _ = await asyncio.wait_for(cache.get_or_fetch(key, fetch), 5)
+    assert token == "token"
+    assert events == ["acquired", "released"] * 2
+
+
+@pytest.mark.asyncio
+async def test_auth_classes_share_the_cache(cache):
+    issued = []
+
+    async def token(request):
+        issued.append(1)
+        return web.json_response(
+            {"access_token": f"token-{len(issued)}", "expires_in": 3600}
+        )
+
+    app = web.Application()
+    app.router.add_post("/token", token)
+    server = TestServer(app)
+    await server.start_server()
+    url = str(server.make_url("/token"))
+
+    # separate instances, as in separate CLI invocations
+    for _ in range(3):
+        auth = OAuth2Auth(url, "client", SecretStr("secret"), token_cache=cache)
+        assert (await auth.fetch_token())[0] == "token-1"
+    for _ in range(3):
+        auth = AzureADAuth(
+            client_id="client",
+            client_secret="secret",
+            tenant_id="tenant",
+            token_endpoint=url,
+            token_cache=cache,
+        )
+        assert (await auth.fetch_token())[0] == "token-2"
+    await server.close()
+
+    assert len(issued) == 2
+
+
+@pytest.mark.asyncio
+async def test_short_lived_token_is_reused(cache):
+    key = TokenCache.key(client_id="short")
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.1)
+        return "token", 45  # shorter than the refresh margin
+
+    results = await asyncio.gather(*(cache.get_or_fetch(key, fetch) for _ in range(5)))
+
+    assert len(fetches) == 1
+    assert {token for token, _ in results} == {"token"}
@@ -0,0 +1,590 @@
+import asyncio
+import hashlib
+import os
+import re
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.http_writer import StreamWriter
+from aiohttp.test_utils import TestServer
+
+from swagcli.auth import CredentialProvider
+from swagcli.client import APIClient
+from swagcli.config import Config
+from swagcli.transfer import (
+    AzureBlockBlobProtocol,
+    FileBodyPayload,
+    S3MultipartProtocol,
+    _can_sendfile,
+    segment_count,
+    split_ranges,
+)
+
+
+class RangeBackend:
+    """Serves `body` with Range/If-Range support, optionally dropping the
+    connection half way through the first `fail_first` responses."""
+
+    def __init__(
+        self, body: bytes, etag: str = '"v1"', fail_first: int = 0, fail_ranges=()
+    ):
+        self.body = body
+        self.etag = etag
+        self.fail_first = fail_first
+        self.fail_ranges = set(fail_ranges)
+        self.requests = []
+        self.heads = []
+
+    async def handle(self, request):
+        headers = {"ETag": self.etag, "Accept-Ranges": "bytes"}
+        if request.method == "HEAD":
+            self.heads.append(dict(request.headers))
+            headers["Content-Length"] = str(len(self.body))
+            return web.Response(headers=headers)
+
+        self.requests.append(dict(request.headers))
+        start, end = 0, len(self.body) - 1
+        status = 200
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range", self.etag) == self.etag:
+            first, last = range_header.split("=")[1].split("-")
+            start = int(first)
+            end = int(last) if last else end
+            if start >= len(self.body):
+                return web.Response(
+                    status=416, headers={"Content-Range": f"bytes */{len(self.body)}"}
+                )
+            status = 206
+
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(self.body)}"
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = end + 1 - start
+        await response.prepare(request)
+
+        fail = start in self.fail_ranges
+        self.fail_ranges.discard(start)
+        if self.fail_first or fail:
+            self.fail_first = max(0, self.fail_first - 1)
+            half = start + (end + 1 - start) // 2
+            await response.write(self.body[start:half])
+            # give the client time to consume what was sent before the drop
+            await asyncio.sleep(0.1)
+            request.transport.close()
+            return response
+
+        await response.write(self.body[start : end + 1])
+        return response
+
+
+class PartBackend:
+    """Stub of the S3 multipart and Azure block blob part protocols, failing
+    the parts in `fail_parts` once."""
+
+    def __init__(self, fail_parts=()):
+        self.fail_parts = set(fail_parts)
+        self.parts = {}
+        self.attempts = []
+        self.in_flight = 0
+        self.peak = 0
+        self.body = None
+        self.aborted = False
+
+    async def handle(self, request):
+        query = request.query
+        if request.method == "POST" and "uploads" in query:
+            return web.Response(
+                text="<InitiateMultipartUploadResult><UploadId>u1</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            )
+        if request.method == "DELETE":
+            self.aborted = True
+            return web.Response(status=204)
+        if request.method == "PUT" and ("partNumber" in query or "blockid" in query):
+            key = query.get("partNumber") or query["blockid"]
+            self.attempts.append(key)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                data = await request.read()
+                await asyncio.sleep(0.01)
+            finally:
+                self.in_flight -= 1
+            if key in self.fail_parts:
+                self.fail_parts.discard(key)
+                return web.Response(status=500)
+            self.parts[key] = data
+            return web.Response(headers={"ETag": f'"etag-{key}"'})
+
+        # completion, assemble in the order the client listed the parts
+        document = await request.text()
+        if "uploadId" in query:
+            keys = re.findall(r"<PartNumber>(\d+)</PartNumber>", document)
+            etags = re.findall(r"<ETag>(.*?)</ETag>", document)
+            assert etags == [f'"etag-{key}"' for key in keys]
+        else:
+            keys = re.findall(r"<Latest>(.*?)</Latest>", document)
+        self.body = b"".join(self.parts[key] for key in keys)
+        return web.Response(text="<Done/>")
+
+
+@pytest.fixture
+async def serve(tmp_path):
+    servers = []
+
+    async def start(backend, max_retries=1):
+        app = web.Application()
+        app.router.add_route("*", "/blob", backend.handle)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        return Config(
+            base_url=str(server.make_url("")),
+            max_retries=max_retries,
+            cache={"enabled": False, "storage_path": tmp_path / "cache"},
+            transfer={"chunk_size": 64 * 1024},
+        )
+
+    yield start
+    for server in servers:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_download_streams_to_file(serve, tmp_path):
+    body = os.urandom(1024 * 1024 + 17)
+    config = await serve(RangeBackend(body))
+    destination = tmp_path / "out" / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download("/blob", destination)
+
+    assert destination.read_bytes() == body
+    assert response.data["size"] == len(body)
+    assert response.data["resumed_from"] == 0
+    assert not destination.with_name("blob.bin.part").exists()
+    assert not destination.with_name("blob.bin.part.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_resumes(serve, tmp_path):
+    body = os.urandom(1024 * 1024)
+    backend = RangeBackend(body, fail_first=1)
+    config = await serve(backend)
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await client.download("/blob", destination)
+
+        part = destination.with_name("blob.bin.part")
+        assert 0 < part.stat().st_size < len(body)
+        offset = part.stat().st_size
+
+        response = await client.download("/blob", destination)
+
+    assert destination.read_bytes() == body
+    assert response.status_code == 206
+    assert response.data["resumed_from"] == offset
+    assert backend.requests[-1]["Range"] == f"bytes={offset}-"
+    assert backend.requests[-1]["If-Range"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_changed_resource_restarts_from_zero(serve, tmp_path):
+    body = os.urandom(256 * 1024)
+    backend = RangeBackend(body, fail_first=1)
+    config = await serve(backend)
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await client.download("/blob", destination)
+
+        # The object is replaced, If-Range no longer matches
+        backend.body = os.urandom(300 * 1024)
+        backend.etag = '"v2"'
+        response = await client.download("/blob", destination)
+
+    assert response.status_code == 200
+    assert response.data["resumed_from"] == 0
+    assert destination.read_bytes() == backend.body
+
+
+@pytest.mark.asyncio
+async def test_retry_resumes_within_one_call(serve, tmp_path):
+    body = os.urandom(512 * 1024)
+    backend = RangeBackend(body, fail_first=1)
+    config = await serve(backend, max_retries=2)
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download("/blob", destination)
+
+    assert destination.read_bytes() == body
+    assert response.data["resumed_from"] > 0
+    assert len(backend.requests) == 2
+
+
+def test_segment_count_adapts_to_size():
+    mib = 1024 * 1024
+    assert segment_count(1, 8 * mib, 8) == 1
+    assert segment_count(20 * mib, 8 * mib, 8) == 3
+    assert segment_count(1024 * mib, 8 * mib, 8) == 8
+    assert split_ranges(10, 3) == [(0, 3), (4, 7), (8, 9)]
+
+
+@pytest.mark.asyncio
+async def test_segmented_download(serve, tmp_path):
+    body = os.urandom(1024 * 1024 + 5)
+    backend = RangeBackend(body)
+    config = await serve(backend)
+    config.transfer.min_segment_size = 256 * 1024
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download_segmented("/blob", destination)
+
+    assert destination.read_bytes() == body
+    assert response.data["segments"] == 5
+    assert len(backend.requests) == 5
+    assert all(r["If-Range"] == '"v1"' for r in backend.requests)
+    assert backend.heads[0]["Accept-Encoding"] == "identity"
+
+
+@pytest.mark.asyncio
+async def test_failed_segment_is_retried_alone(serve, tmp_path):
+    body = os.urandom(1024 * 1024)
+    # the second of four segments drops half way through once
+    backend = RangeBackend(body, fail_ranges={256 * 1024})
+    config = await serve(backend, max_retries=2)
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download_segmented("/blob", destination, segments=4)
+
+    assert destination.read_bytes() == body
+    assert response.data["segments"] == 4
+    assert len(backend.requests) == 5
+    # the retry continues from where the segment stopped
+    retry = backend.requests[-1]["Range"]
+    assert int(retry.split("=")[1].split("-")[0]) > 256 * 1024
+    assert retry.endswith(f"-{512 * 1024 - 1}")
+
+
+@pytest.mark.asyncio
+async def test_failed_segmented_download_resumes(serve, tmp_path):
+    body = os.urandom(1024 * 1024)
+    # the second of four segments drops half way through, without retries
+    backend = RangeBackend(body, fail_ranges={256 * 1024})
+    config = await serve(backend)
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await client.download_segmented("/blob", destination, segments=4)
+        assert destination.with_name("blob.bin.part").exists()
+        backend.requests.clear()
+
+        response = await client.download_segmented("/blob", destination)
+
+    assert destination.read_bytes() == body
+    assert response.data["segments"] == 4
+    # only the rest of the failed segment is fetched again
+    (request,) = backend.requests
+    first, last = request["Range"].split("=")[1].split("-")
+    assert 256 * 1024 < int(first) and int(last) == 512 * 1024 - 1
+    assert not destination.with_name("blob.bin.part").exists()
+    assert not destination.with_name("blob.bin.part.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_segmented_raises_head_errors(serve, tmp_path):
+    gets = []
+
+    async def forbidden_head(request):
+        if request.method == "HEAD":
+            raise web.HTTPForbidden()
+        gets.append(request)
+        return web.Response(body=b"data")
+
+    config = await serve(RangeBackend(b""))
+    app = web.Application()
+    app.router.add_route("*", "/blob", forbidden_head)
+    server = TestServer(app)
+    await server.start_server()
+    config.base_url = str(server.make_url(""))
+
+    async with APIClient(config) as client:
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await client.download_segmented("/blob", tmp_path / "blob.bin")
+    await server.close()
+
+    assert error.value.status == 403
+    assert not gets
+
+
+@pytest.mark.asyncio
+async def test_segmented_falls_back_without_ranges(serve, tmp_path):
+    body = os.urandom(64 * 1024)
+
+    async def no_ranges(request):
+        return web.Response(body=body)
+
+    config = await serve(RangeBackend(body))
+    app = web.Application()
+    app.router.add_get("/plain", no_ranges)
+    server = TestServer(app)
+    await server.start_server()
+    config.base_url = str(server.make_url(""))
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download_segmented("/plain", destination)
+    await server.close()
+
+    assert destination.read_bytes() == body
+    assert "segments" not in response.data
+
+
+@pytest.mark.asyncio
+async def test_segmented_falls_back_when_head_is_refused(serve, tmp_path):
+    body = os.urandom(64 * 1024)
+
+    async def plain(request):
+        return web.Response(body=body)
+
+    config = await serve(RangeBackend(body))
+    app = web.Application()
+    app.router.add_get("/plain", plain, allow_head=False)  # HEAD gets a 405
+    server = TestServer(app)
+    await server.start_server()
+    config.base_url = str(server.make_url(""))
+    destination = tmp_path / "blob.bin"
+
+    async with APIClient(config) as client:
+        response = await client.download_segmented("/plain", destination)
+    await server.close()
+
+    assert destination.read_bytes() == body
+    assert "segments" not in response.data
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_s3(serve, tmp_path):
+    body = os.urandom(1024 * 1024 + 3)
+    source = tmp_path / "upload.bin"
+    source.write_bytes(body)
+    backend = PartBackend(fail_parts={"3"})
+    config = await serve(backend, max_retries=2)
+    config.transfer.part_size = 128 * 1024
+    config.transfer.max_concurrency = 3
+
+    async with APIClient(config) as client:
+        response = await client.upload_multipart("/blob", source, "s3")
+
+    assert response.status_code == 200
+    assert backend.body == body
+    assert len(backend.parts) == 9
+    # only the failing part is sent twice
+    assert backend.attempts.count("3") == 2
+    assert len(backend.attempts) == 10
+    assert backend.peak <= 3
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_azure(serve, tmp_path):
+    body = os.urandom(300 * 1024)
+    source = tmp_path / "upload.bin"
+    source.write_bytes(body)
+    backend = PartBackend()
+    config = await serve(backend)
+    config.transfer.part_size = 100 * 1024
+
+    async with APIClient(config) as client:
+        await client.upload_multipart("/blob", source, AzureBlockBlobProtocol())
+
+    assert backend.body == body
+    assert sorted(backend.parts) == [
+        AzureBlockBlobProtocol.block_id(n) for n in (1, 2, 3)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_aborts_on_failure(serve, tmp_path):
+    source = tmp_path / "upload.bin"
+    source.write_bytes(os.urandom(256 * 1024))
+    backend = PartBackend(fail_parts={"2"})
+    config = await serve(backend, max_retries=1)
+    config.transfer.part_size = 64 * 1024
+
+    async with APIClient(config) as client:
+        with pytest.raises(aiohttp.ClientResponseError):
+            await client.upload_multipart("/blob", source, S3MultipartProtocol())
+
+    assert backend.aborted
+    assert backend.body is None
+
+
+async def _echo(request):
+    digest, size = hashlib.sha256(), 0
+    async for chunk in request.content.iter_any():
+        digest.update(chunk)
+        size += len(chunk)
+    return web.json_response({"size": size, "sha256": digest.hexdigest()})
+
+
+@pytest.fixture
+async def echo_url():
+    app = web.Application()
+    app.router.add_route("*", "/upload", _echo)
+    server = TestServer(app)
+    await server.start_server()
+    yield str(server.make_url("/upload"))
+    await server.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options, mode",
+    [
+        ({}, "sendfile"),
+        # chunked encoding rules out sendfile
+        ({"chunked": True}, "mmap"),
+        ({"zero_copy": False}, "read"),
+    ],
+)
+async def test_file_body_modes(echo_url, tmp_path, options, mode):
+    body = os.urandom(3 * 1024 * 1024 + 11)
+    source = tmp_path / "body.bin"
+    source.write_bytes(body)
+    chunked = options.pop("chunked", None)
+    file_body = FileBodyPayload(source, chunk_size=256 * 1024, **options)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.put(echo_url, data=file_body, chunked=chunked) as response:
+            result = await response.json()
+
+    assert file_body.mode == mode
+    assert result == {"size": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+
+
+def test_sendfile_needs_the_writer_internals():
+    # as if an aiohttp release dropped the attributes sendfile relies on
+    writer = StreamWriter.__new__(StreamWriter)
+    assert not _can_sendfile(writer)
+
+
+@pytest.mark.asyncio
+async def test_file_body_as_bytes(tmp_path):
+    source = tmp_path / "body.bin"
+    source.write_bytes(b"header" + b"body")
+    with open(source, "rb") as f:
+        f.seek(6)
+        assert await FileBodyPayload(f).as_bytes() == b"body"
+
+
+@pytest.mark.asyncio
+async def test_client_sends_open_file_from_position(echo_url, tmp_path):
+    body = os.urandom(512 * 1024)
+    source = tmp_path / "body.bin"
+    source.write_bytes(b"header" + body)
+    config = Config(
+        base_url=echo_url.rsplit("/", 1)[0],
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+    )
+
+    async with APIClient(config) as client:
+        with open(source, "rb") as f:
+            f.seek(len(b"header"))
+            response = await client.post("/upload", body=f)
+            assert not f.closed
+
+        with pytest.raises(ValueError):
+            await client.put("/upload", data={"a": 1}, body=source)
+
+    assert response.data["size"] == len(body)
+    assert response.data["sha256"] == hashlib.sha256(body).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_retry_resends_open_file_from_start_position(tmp_path):
+    received = []
+
+    async def flaky(request):
+        received.append(await request.read())
+        if len(received) == 1:
+            return web.Response(status=503)
+        return web.json_response({"size": len(received[-1])})
+
+    app = web.Application()
+    app.router.add_post("/upload", flaky)
+    server = TestServer(app)
+    await server.start_server()
+    body = os.urandom(256 * 1024)
+    source = tmp_path / "body.bin"
+    source.write_bytes(b"header" + body)
+    config = Config(
+        base_url=str(server.make_url("")),
+        max_retries=2,
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+    )
+
+    try:
+        async with APIClient(config) as client:
+            with open(source, "rb") as f:
+                f.seek(len(b"header"))
+                response = await client.post("/upload", body=f)
+    finally:
+        await server.close()
+
+    assert received == [body, body]
+    assert response.data == {"size": len(body)}
+
+
+class RequestSignature(CredentialProvider):
+    """Header naming the method and query of the request it was made for"""
+
+    async def headers(self, method, url, params=None, payload_hash=None):
+        query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return {"X-Signature": f"{method} ?{query}"}
+
+
+@pytest.mark.asyncio
+async def test_transfers_sign_every_request(tmp_path):
+    body = os.urandom(512 * 1024)
+    ranges, parts = RangeBackend(body), PartBackend()
+    signatures = []
+
+    @web.middleware
+    async def check(request, handler):
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query.items()))
+        expected = f"{request.method} ?{query}"
+        signatures.append(request.headers.get("X-Signature") == expected)
+        return await handler(request)
+
+    app = web.Application(middlewares=[check])
+    app.router.add_route("*", "/blob", ranges.handle)
+    app.router.add_route("*", "/parts", parts.handle)
+    server = TestServer(app)
+    await server.start_server()
+    config = Config(
+        base_url=str(server.make_url("")),
+        cache={"enabled": False, "storage_path": tmp_path / "cache"},
+        transfer={"part_size": 128 * 1024},
+    )
+    source = tmp_path / "upload.bin"
+    source.write_bytes(body)
+
+    try:
+        async with APIClient(config, auth=RequestSignature()) as client:
+            await client.download_segmented("/blob", tmp_path / "out", segments=4)
+            await client.upload_multipart("/parts", source, "s3")
+    finally:
+        await server.close()
+
+    # HEAD and 4 ranges, then initiate, 4 parts and complete
+    assert len(signatures) == 11
+    assert all(signatures)
+    assert parts.body == body
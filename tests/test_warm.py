@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from swagcli.client import APIClient
+from swagcli.commandstore import CommandStore
+from swagcli.config import Config
+from swagcli.warm import expand, load_targets, select_targets, warm_cache
+
+
+class Backend:
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def item(self, request):
+        self.requests.append(request.path_qs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if request.match_info["id"] == "broken":
+            raise web.HTTPInternalServerError()
+        if request.match_info["id"] == "tagged":
+            headers = {"ETag": '"v1"', "Cache-Control": "max-age=0"}
+            if request.headers.get("If-None-Match") == '"v1"':
+                raise web.HTTPNotModified(headers=headers)
+            return web.json_response({"id": "tagged"}, headers=headers)
+        return web.json_response({"id": request.match_info["id"]})
+
+
+@pytest.fixture
+async def backend(tmp_path):
+    backend = Backend()
+    app = web.Application()
+    app.router.add_get("/items/{id}", backend.item)
+    server = TestServer(app)
+    await server.start_server()
+    backend.config = Config(
+        base_url=str(server.make_url("")),
+        cache={"storage_path": tmp_path / "cache"},
+        max_retries=1,
+    )
+    yield backend
+    await server.close()
+
+
+def test_load_targets():
+    operations = [
+        {"path": "/items/{id}", "params": [{"id": 1}, {"id": 2, "fields": "name"}]},
+        {"path": "/items"},
+    ]
+    assert load_targets(operations) == [
+        ("/items/1", None),
+        ("/items/2", {"fields": "name"}),
+        ("/items", None),
+    ]
+    with pytest.raises(ValueError, match="id"):
+        load_targets([{"path": "/items/{id}", "params": [{"fields": "name"}]}])
+
+
+@pytest.mark.asyncio
+async def test_warm_cache(backend):
+    targets = [expand("/items/{id}", {"id": i}) for i in range(20)]
+    async with APIClient(backend.config) as client:
+        report = await warm_cache(client, targets + [("/items/broken", None)], 4)
+        assert report["operations"] == 21
+        assert report["misses"] == 20
+        assert report["hits"] == 0
+        assert report["errors"] == 1
+        assert report["failures"][0]["path"] == "/items/broken"
+        assert report["bytes"] > 0
+        assert backend.max_in_flight <= 4
+
+        again = await warm_cache(client, targets, 4)
+        assert again["hits"] == 20
+        assert again["misses"] == again["bytes"] == 0
+        assert len(backend.requests) == 21
+
+        assert (await client.get("/items/3")).data == {"id": "3"}
+        assert len(backend.requests) == 21
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_revalidation_transfers_no_body(backend):
+    backend.config.cache.http_semantics = True
+    async with APIClient(backend.config) as client:
+        first = await warm_cache(client, [("/items/tagged", None)])
+        again = await warm_cache(client, [("/items/tagged", None)])
+
+    assert first["bytes"] > 0
+    assert again["misses"] == again["revalidated"] == 1
+    assert again["bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_records_unexpected_errors(backend, monkeypatch):
+    targets = [(f"/items/{i}", None) for i in range(4)]
+    async with APIClient(backend.config) as client:
+        prefetch = client.prefetch
+
+        async def failing(path, params, **kwargs):
+            if path == "/items/2":
+                raise ValueError("cannot store the body")
+            return await prefetch(path, params, **kwargs)
+
+        monkeypatch.setattr(client, "prefetch", failing)
+        report = await warm_cache(client, targets, 2)
+
+    assert report["misses"] == 3
+    assert report["errors"] == 1
+    assert report["failures"] == [
+        {"path": "/items/2", "params": None, "error": "cannot store the body"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_rate(backend):
+    targets = [(f"/items/{i}", None) for i in range(6)]
+    async with APIClient(backend.config) as client:
+        report = await warm_cache(client, targets, concurrency=6, rate=50)
+    assert report["misses"] == 6
+    # 6 starts spaced 20 ms apart
+    assert report["elapsed"] >= 0.1
+
+
+def test_select_targets():
+    store = CommandStore()
+    base = "https://api.example.com/v1"
+    get = {"tags": ["items"], "parameters": []}
+    store.add_path("/items/get", f"{base}/items", "get", get)
+    store.add_path("/items/post", f"{base}/items", "post", get)
+    store.add_path(
+        "/orders/{id}",
+        f"{base}/orders/{{id}}",
+        "get",
+        {"tags": ["items"], "parameters": [{"name": "id", "in": "path"}]},
+    )
+    store.add_path(
+        "/users/{id}",
+        f"{base}/users/{{id}}",
+        "get",
+        {
+            "tags": ["users"],
+            "parameters": [{"name": "id", "in": "path", "default": "me"}],
+        },
+    )
+
+    targets, skipped = select_targets(store, base, tags=["items"])
+    assert targets == [("/items", None)]
+    assert skipped == [f"{base}/orders/{{id}}"]
+
+    targets, skipped = select_targets(store, base, pattern="/users/")
+    assert targets == [("/users/me", None)]
+    assert skipped == []
+
+    targets, skipped = select_targets(store, "https://other.example.com")
+    assert targets == []
+    assert len(skipped) == 3